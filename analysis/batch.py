@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import csv
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+import httpx
+
+"""
+Modo por lotes de los scripts de análisis (police_all_incidents.py, incident_all_states.py).
+
+Las peticiones a la API salen de un solo httpx.AsyncClient con conexiones reutilizadas y
+a lo más --concurrency peticiones en vuelo; los errores de red y las respuestas 429/5xx se
+reintentan con espera exponencial (respetando Retry-After). Cada gráfica se genera en un
+ProcessPoolExecutor de --workers procesos mientras se siguen descargando los datos de los
+siguientes IDs, y al final se escribe un CSV con un renglón por ID (incluidos los que
+fallaron, con su error).
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def add_batch_arguments(parser: argparse.ArgumentParser) -> None:
+    """Argumentos comunes: IDs (lista o archivo), concurrencia, reintentos, procesos y CSV."""
+    parser.add_argument("ids", nargs="*", help="IDs a analizar (separados por espacio o coma)")
+    parser.add_argument("--ids-file", help="Archivo con un ID por renglón (se ignoran vacíos y los que empiezan con #)")
+    parser.add_argument("--output-dir", default="./outputs", help="Directorio de las gráficas y del CSV")
+    parser.add_argument("--summary", help="Ruta del CSV consolidado (por defecto <output-dir>/<nombre>_summary.csv)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Peticiones a la API en vuelo")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos que generan las gráficas")
+    parser.add_argument("--retries", type=int, default=3, help="Reintentos por petición")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Timeout por petición en segundos")
+
+
+def read_ids(values: Sequence[str], ids_file: Optional[str] = None) -> List[int]:
+    """
+    IDs de la línea de comandos y/o de un archivo, sin repetir y en el orden dado.
+
+    Raises:
+    - ValueError: If an ID is not an integer.
+    """
+    entries = [value for argument in values for value in argument.split(",")]
+    if ids_file:
+        with open(ids_file) as file:
+            entries += [line.split("#", 1)[0] for line in file]
+    return list(dict.fromkeys(int(entry) for entry in entries if entry.strip()))
+
+
+async def get_with_retries(
+    client: httpx.AsyncClient, url: str, params: Optional[Dict[str, Any]] = None, retries: int = 3
+) -> httpx.Response:
+    """
+    GET que reintenta los errores de red y las respuestas 429/5xx.
+
+    Raises:
+    - httpx.HTTPError: The last error once the retries are exhausted, or right away for
+      other 4xx responses (404 and the like will not change on retry).
+    """
+    for attempt in range(retries + 1):
+        try:
+            response = await client.get(url, params=params)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                response.raise_for_status()
+                return response
+            retry_after = response.headers.get("Retry-After", "")
+            delay = float(retry_after) if retry_after.isdigit() else None
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+            delay = None
+        # Exponential backoff with jitter so the retries of many IDs do not arrive together
+        await asyncio.sleep(delay if delay is not None else min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random()))
+    raise AssertionError("unreachable")
+
+
+def _error_message(error: BaseException) -> str:
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code}: {error.response.text[:200]}"
+    return f"{type(error).__name__}: {error}"
+
+
+def _init_worker() -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+async def run_batch(
+    ids: Iterable[int],
+    fetch: Callable[[httpx.AsyncClient, int], Awaitable[tuple]],
+    render: Callable[..., Dict[str, Any]],
+    summarize: Callable[[int, Dict[str, Any]], Dict[str, Any]],
+    base_url: str,
+    concurrency: int = 16,
+    workers: int = 1,
+    timeout: float = 60.0,
+    prepare: Optional[Callable[[httpx.AsyncClient, List[int]], Awaitable[None]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Descarga y analiza varios IDs a la vez.
+
+    Parámetros:
+    -----------
+    fetch : async (client, id) -> tuple
+        Descarga los datos de un ID; la tupla son los argumentos de render después del ID.
+    render : (id, *datos) -> Dict
+        Función de módulo (se ejecuta en otro proceso) que calcula y guarda la gráfica.
+    summarize : (id, resultado de render) -> Dict
+        Renglón del CSV de un ID analizado.
+    prepare : async (client, ids) -> None
+        Descargas compartidas por todos los IDs antes de empezar (opcional).
+
+    Returns:
+    --------
+    List[Dict[str, Any]]
+        Un renglón por ID, en el orden de ids, con "error" vacío o con el motivo del fallo.
+    """
+    ids = list(ids)
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    loop = asyncio.get_running_loop()
+    rows: Dict[int, Dict[str, Any]] = {}
+
+    # spawn: the workers do not inherit the event loop or the client's sockets
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker) as pool:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+            if prepare is not None:
+                await prepare(client, ids)
+
+            async def analyze(item_id: int) -> None:
+                try:
+                    async with semaphore:
+                        data = await fetch(client, item_id)
+                    # The semaphore is free while the chart renders: the next downloads go on
+                    result = await loop.run_in_executor(pool, render, item_id, *data)
+                    rows[item_id] = {**summarize(item_id, result), "error": result.get("error", "")}
+                except Exception as error:
+                    rows[item_id] = {"error": _error_message(error)}
+                print(f"[{len(rows)}/{len(ids)}] {item_id}: {rows[item_id]['error'] or 'ok'}")
+
+            await asyncio.gather(*(analyze(item_id) for item_id in ids))
+    return [rows[item_id] for item_id in ids]
+
+
+def write_summary(path: str, id_field: str, ids: Sequence[int], rows: Sequence[Dict[str, Any]]) -> None:
+    """CSV consolidado: una columna por campo que aparezca en algún renglón, error al final."""
+    fields = [id_field]
+    for row in rows:
+        fields += [field for field in row if field not in fields and field != "error"]
+    fields.append("error")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        for item_id, row in zip(ids, rows):
+            writer.writerow({id_field: item_id, **row})
+    failed = sum(1 for row in rows if row["error"])
+    print(f"Resumen de {len(rows)} IDs ({failed} con error) guardado en {path}")
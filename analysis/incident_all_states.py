@@ -1,17 +1,21 @@
+import argparse
+import asyncio
 import requests
-import pandas as pd
+import pyarrow as pa
 import matplotlib.pyplot as plt
 from datetime import datetime
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import sys
 from pathlib import Path
-from settings import settings  # Import settings
 
 # Add the project root to sys.path
 project_root = Path(__file__).resolve().parent.parent
 sys.path.append(str(project_root))
 
+from settings import settings  # Import settings
+from analysis.batch import add_batch_arguments, get_with_retries, read_ids, run_batch, write_summary
+
 BASE_URL = settings.API_URL   # URL de la API.
 
 def analyze_incident_states(incident_id: int, output_dir: str = "./outputs") -> Dict[str, Any]:
@@ -23,6 +27,10 @@ def analyze_incident_states(incident_id: int, output_dir: str = "./outputs") ->
     Se ejecuta:
     -----------
     python analysis/incident_all_states.py <incident_id>
+
+    o por lotes (ver main()):
+
+    python analysis/incident_all_states.py --ids-file incidentes.txt --concurrency 32 --workers 8
     
     Parámetros:
     -----------
@@ -36,31 +44,53 @@ def analyze_incident_states(incident_id: int, output_dir: str = "./outputs") ->
     Dict[str, Any]
         Analysis results including the time spent in each status and the path to the generated plot.
     """
-    # Ensure output directory exists
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Query API para obtener lista de tracking states del incident_id.
+    # Query API para obtener los tracking states del incident_id como Arrow IPC (columnas con tipo,
+    # created_at ya como timestamp UTC; no hay que parsear JSON renglón por renglón).
     try:
-        response = requests.get(f"{BASE_URL}/incident_tracking_states/{incident_id}")
+        response = requests.get(
+            f"{BASE_URL}/incident_tracking_states/export",
+            params={"incident_id": incident_id, "format": "arrow"}
+        )
         response.raise_for_status()
-        tracking_states = response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error retrieving tracking states: {e}")
         return {"error": f"Failed to retrieve tracking states: {str(e)}"}
 
-    # Tomamos solo los campos reuqeridos: status_id and created_at
-    data = [{"status_id": item["status_id"], "created_at": item["created_at"]} for item in tracking_states]
+    # Hacemos otro query a la API para obtener el mapping de status_id a status_name.
+    try:
+        mapping_response = requests.get(f"{BASE_URL}/status_incidents")
+        mapping_response.raise_for_status()
+        status_id_name_mapping = mapping_response.json()
+    except requests.exceptions.RequestException as e:
+        print(f"Error retrieving status ID to name mapping: {e}")
+        return {"error": f"Failed to retrieve status ID to name mapping: {str(e)}"}
+
+    return plot_incident_states(incident_id, response.content, status_id_name_mapping, output_dir)
+
+def plot_incident_states(incident_id: int, arrow_stream: bytes, status_id_name_mapping: Dict[str, str],
+                         output_dir: str = "./outputs") -> Dict[str, Any]:
+    """
+    Calcula el tiempo por status y guarda la gráfica de un incidente a partir de las respuestas de la API.
+
+    Parámetros:
+    -----------
+    arrow_stream : bytes
+        Body of GET /incident_tracking_states/export?incident_id=...&format=arrow.
+    status_id_name_mapping : Dict[str, str]
+        Body of GET /status_incidents.
+    """
+    # Ensure output directory exists
+    os.makedirs(output_dir, exist_ok=True)
 
-    # Conveierte datos a Pandas DataFrame.
-    df = pd.DataFrame(data)
+    # Tomamos solo los campos reuqeridos (status_id and created_at) y los convertimos a Pandas DataFrame.
+    df = pa.ipc.open_stream(arrow_stream).read_all().select(["status_id", "created_at"]).to_pandas()
 
     # Revisamos que no esté vacío el DataFrame.
     if df.empty:
         print(f"No tracking states found for incident_id {incident_id}")
         return {"error": f"No tracking states found for incident_id {incident_id}"}
 
-    # Convertimos created_at a datetime y ordenamos.
-    df['created_at'] = pd.to_datetime(df['created_at'])
+    # Ordenamos por created_at (ya es datetime).
     df = df.sort_values(by='created_at')
 
 # Calculamos el tiempo transcurrido en cada status.
@@ -75,15 +105,6 @@ def analyze_incident_states(incident_id: int, output_dir: str = "./outputs") ->
     total_time = status_time['time_spent'].sum()
     status_time['percentage'] = (status_time['time_spent'] / total_time) * 100
 
-    # Hacemos otro query a la API para obtener el mapping de status_id a status_name.
-    try:
-        mapping_response = requests.get(f"{BASE_URL}/status_incidents")
-        mapping_response.raise_for_status()
-        status_id_name_mapping = mapping_response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Error retrieving status ID to name mapping: {e}")
-        return {"error": f"Failed to retrieve status ID to name mapping: {str(e)}"}
-
     # Revisamos que el mapping sea obtenido.
     status_time['status_id'] = status_time['status_id'].astype(str)  # Convert to string
     status_id_name_mapping = {str(k): v for k, v in status_id_name_mapping.items()}  # Convert keys to string
@@ -163,21 +184,72 @@ def analyze_incident_states(incident_id: int, output_dir: str = "./outputs") ->
         "plot_path": plot_filename
     }
 
-if __name__ == "__main__":
-    # Example usage
-    import sys
+def _summary_row(incident_id: int, result: Dict[str, Any]) -> Dict[str, Any]:
+    statuses = result.get("status_time", [])
+    longest = max(statuses, key=lambda status: status["time_spent"], default={})
+    return {
+        "statuses": len(statuses),
+        "total_time_seconds": sum(status["time_spent"] for status in statuses) if statuses else None,
+        "longest_status": longest.get("status_name", ""),
+        "longest_status_seconds": longest.get("time_spent"),
+        "plot_path": result.get("plot_path", ""),
+    }
 
-    if len(sys.argv) > 1:
-        try:
-            incident_id = int(sys.argv[1])
-            analyze_incident_states(incident_id)
-        except ValueError:
-            print("Error: Incident ID must be an integer")
-            sys.exit(1)
+def analyze_incident_batch(incident_ids: List[int], output_dir: str = "./outputs", summary_path: Optional[str] = None,
+                           concurrency: int = 16, workers: int = 1, retries: int = 3, timeout: float = 60.0) -> List[Dict[str, Any]]:
+    """
+    Analiza varios incidentes a la vez (analysis/batch.py) y escribe el CSV consolidado.
+
+    El catálogo de status se pide una sola vez; los tracking states, uno por incidente con a
+    lo más `concurrency` peticiones en vuelo, y las gráficas se generan en `workers` procesos.
+
+    Returns:
+    --------
+    List[Dict[str, Any]]
+        Los renglones del CSV, en el orden de incident_ids.
+    """
+    status_id_name_mapping: Dict[str, str] = {}
+
+    async def prepare(client, ids):
+        response = await get_with_retries(client, "/status_incidents", retries=retries)
+        status_id_name_mapping.update(response.json())
+
+    async def fetch(client, incident_id):
+        response = await get_with_retries(
+            client, "/incident_tracking_states/export", params={"incident_id": incident_id, "format": "arrow"},
+            retries=retries
+        )
+        return response.content, status_id_name_mapping, output_dir
+
+    rows = asyncio.run(run_batch(
+        incident_ids, fetch, plot_incident_states, _summary_row, BASE_URL,
+        concurrency=concurrency, workers=workers, timeout=timeout, prepare=prepare
+    ))
+    write_summary(summary_path or os.path.join(output_dir, "incident_summary.csv"), "incident_id", incident_ids, rows)
+    return rows
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Tiempo por status de incidentes")
+    add_batch_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        incident_ids = read_ids(args.ids, args.ids_file)
+    except ValueError:
+        print("Error: Incident ID must be an integer")
+        return 1
+
+    if len(incident_ids) == 1 and not args.ids_file and not args.summary:
+        analyze_incident_states(incident_ids[0], args.output_dir)
+    elif incident_ids:
+        analyze_incident_batch(incident_ids, args.output_dir, args.summary, args.concurrency, args.workers, args.retries, args.timeout)
     else:
         # Interactive mode
         try:
             incident_id = int(input("Enter incident ID to analyze: "))
-            analyze_incident_states(incident_id)
+            analyze_incident_states(incident_id, args.output_dir)
         except ValueError:
-            print("Error: Incident ID must be an integer")
\ No newline at end of file
+            print("Error: Incident ID must be an integer")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,10 +1,10 @@
+import argparse
+import asyncio
 import requests
 import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
 from datetime import datetime
 import os
-import json
 from typing import Dict, List, Any, Optional
 
 import sys
@@ -15,6 +15,8 @@ project_root = Path(__file__).resolve().parent.parent
 sys.path.append(str(project_root))
 
 from settings import settings  # Import settings
+from services.attention_time import parse_attention_seconds
+from analysis.batch import add_batch_arguments, get_with_retries, read_ids, run_batch, write_summary
 
 BASE_URL = settings.API_URL   # URL de la API.
 
@@ -25,6 +27,11 @@ def analyze_police_incidents(police_id: int, output_dir: str = "./outputs") -> D
     Se ejecuta:
     -----------
     python analysis/police_all_incidents.py <police_id>
+
+    o por lotes (ver main()):
+
+    python analysis/police_all_incidents.py 203 533 871 --summary resumen.csv
+    python analysis/police_all_incidents.py --ids-file policias.txt --concurrency 32 --workers 8
     
     Parámetros:
     -----------
@@ -38,9 +45,6 @@ def analyze_police_incidents(police_id: int, output_dir: str = "./outputs") -> D
     Dict[str, Any]
         Resultados del análisis, incluyendo estadísticas resumidas y gráficas.
     """
-    # Asegurarse de que el directorio de salida exista
-    os.makedirs(output_dir, exist_ok=True)
-    
     # Obtener detalles del oficial de policía
     try:
         police_response = requests.get(f"{BASE_URL}/security_police/{police_id}")
@@ -52,37 +56,39 @@ def analyze_police_incidents(police_id: int, output_dir: str = "./outputs") -> D
     
     # Obtener todos los incidentes de este oficial de policía
     try:
-        incidents_response = requests.get(f"{BASE_URL}/security_incident/police/{police_id}/analysis")
+        # format=json: the data of the analysis, without rendering the server-side chart
+        incidents_response = requests.get(
+            f"{BASE_URL}/security_incident/police/{police_id}/analysis", params={"format": "json"}
+        )
         incidents_response.raise_for_status()
         analysis_data = incidents_response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error al recuperar incidentes: {e}")
         return {"error": f"No se pudieron recuperar los datos de los incidentes: {str(e)}"}
-    
+
+    return plot_police_incidents(police_id, police_data, analysis_data, output_dir)
+
+def plot_police_incidents(police_id: int, police_data: Dict[str, Any], analysis_data: Dict[str, Any],
+                          output_dir: str = "./outputs") -> Dict[str, Any]:
+    """
+    Calcula las estadísticas y guarda la gráfica de un policía a partir de las respuestas de la API.
+
+    Parámetros:
+    -----------
+    police_data : Dict[str, Any]
+        Respuesta de GET /security_police/{police_id} (o un elemento de GET /security_police?ids=...).
+    analysis_data : Dict[str, Any]
+        Respuesta de GET /security_incident/police/{police_id}/analysis?format=json.
+    """
+    # Asegurarse de que el directorio de salida exista
+    os.makedirs(output_dir, exist_ok=True)
+
     # Extraer datos para el procesamiento
     incidents = pd.DataFrame(analysis_data["incidents"])
     summary_stats = analysis_data["summary_statistics"]
     
-    # Procesar tiempos de atención
-    def time_to_seconds(time_str):
-        if time_str is None or time_str == "null" or pd.isna(time_str):
-            return np.nan
-        
-        if isinstance(time_str, str) and ":" in time_str:
-            # Formato: "HH:MM:SS"
-            parts = time_str.split(":")
-            if len(parts) == 3:
-                h, m, s = map(int, parts)
-                return h * 3600 + m * 60 + s
-        
-        # Intentar convertir como flotante
-        try:
-            return float(time_str)
-        except (ValueError, TypeError):
-            return np.nan
-    
-    # Procesar tiempos de atención en segundos para el análisis
-    incidents['attention_time_seconds'] = incidents['attention_time'].apply(time_to_seconds)
+    # Procesar tiempos de atención en segundos para el análisis (vectorizado sobre toda la columna)
+    incidents['attention_time_seconds'] = parse_attention_seconds(incidents['attention_time'])
     
     # Filtrar valores NaN para graficar
     plot_data = incidents.dropna(subset=['attention_time_seconds'])
@@ -104,7 +110,7 @@ def analyze_police_incidents(police_id: int, output_dir: str = "./outputs") -> D
     
     # Gráfica 1: Gráfico de barras vertical de tiempos de atención
     plt.subplot(2, 1, 1)
-    bars = plt.bar(
+    plt.bar(
         plot_data['incident_id'].astype(str), 
         plot_data['attention_time_seconds'],
         color='skyblue',
@@ -192,21 +198,85 @@ def analyze_police_incidents(police_id: int, output_dir: str = "./outputs") -> D
         "status_distribution": analysis_data.get("status_distribution", {})
     }
 
-if __name__ == "__main__":
-    # Ejemplo de uso
-    import sys
-    
-    if len(sys.argv) > 1:
-        try:
-            police_id = int(sys.argv[1])
-            analyze_police_incidents(police_id)
-        except ValueError:
-            print("Error: El ID de policía debe ser un número entero")
-            sys.exit(1)
+# Officers per GET /security_police?ids=... request in batch mode
+POLICE_BATCH_SIZE = 500
+
+async def _fetch_officers(client, police_ids: List[int], officers: Dict[int, Dict[str, Any]], retries: int) -> None:
+    # One request per POLICE_BATCH_SIZE officers instead of one per officer
+    for start in range(0, len(police_ids), POLICE_BATCH_SIZE):
+        chunk = police_ids[start:start + POLICE_BATCH_SIZE]
+        response = await get_with_retries(
+            client, "/security_police", params={"ids": ",".join(map(str, chunk))}, retries=retries
+        )
+        officers.update({officer["id"]: officer for officer in response.json()})
+
+def _summary_row(police_id: int, result: Dict[str, Any]) -> Dict[str, Any]:
+    summary = result.get("summary_statistics") or result.get("summary") or {}
+    return {
+        "grade": result.get("officer_info", {}).get("grade", ""),
+        "total_incidents": summary.get("total_incidents"),
+        "valid_incidents": summary.get("valid_incidents"),
+        "average_attention_time_seconds": summary.get("average_attention_time_seconds"),
+        "median_attention_time_seconds": summary.get("median_attention_time_seconds"),
+        "plot_path": result.get("plot_path", ""),
+    }
+
+def analyze_police_batch(police_ids: List[int], output_dir: str = "./outputs", summary_path: Optional[str] = None,
+                         concurrency: int = 16, workers: int = 1, retries: int = 3, timeout: float = 60.0) -> List[Dict[str, Any]]:
+    """
+    Analiza varios policías a la vez (analysis/batch.py) y escribe el CSV consolidado.
+
+    Los datos de los policías se piden en lotes a GET /security_police?ids=...; los análisis,
+    uno por policía con a lo más `concurrency` peticiones en vuelo, y las gráficas se generan
+    en `workers` procesos.
+
+    Returns:
+    --------
+    List[Dict[str, Any]]
+        Los renglones del CSV, en el orden de police_ids.
+    """
+    officers: Dict[int, Dict[str, Any]] = {}
+
+    async def prepare(client, ids):
+        await _fetch_officers(client, ids, officers, retries)
+
+    async def fetch(client, police_id):
+        if police_id not in officers:
+            raise LookupError("SecurityPolice record not found")
+        response = await get_with_retries(
+            client, f"/security_incident/police/{police_id}/analysis", params={"format": "json"}, retries=retries
+        )
+        return officers[police_id], response.json(), output_dir
+
+    rows = asyncio.run(run_batch(
+        police_ids, fetch, plot_police_incidents, _summary_row, BASE_URL,
+        concurrency=concurrency, workers=workers, timeout=timeout, prepare=prepare
+    ))
+    write_summary(summary_path or os.path.join(output_dir, "police_summary.csv"), "police_id", police_ids, rows)
+    return rows
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Análisis de tiempos de atención por policía")
+    add_batch_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        police_ids = read_ids(args.ids, args.ids_file)
+    except ValueError:
+        print("Error: El ID de policía debe ser un número entero")
+        return 1
+
+    if len(police_ids) == 1 and not args.ids_file and not args.summary:
+        analyze_police_incidents(police_ids[0], args.output_dir)
+    elif police_ids:
+        analyze_police_batch(police_ids, args.output_dir, args.summary, args.concurrency, args.workers, args.retries, args.timeout)
     else:
         # Modo interactivo
         try:
             police_id = int(input("Ingrese el ID del policía a analizar: "))
-            analyze_police_incidents(police_id)
+            analyze_police_incidents(police_id, args.output_dir)
         except ValueError:
-            print("Error: El ID de policía debe ser un número entero")
\ No newline at end of file
+            print("Error: El ID de policía debe ser un número entero")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,12 +1,17 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, APIRouter
+from fastapi.routing import APIRoute
 from sqlalchemy.orm import relationship
-from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from routes.security_police import router as security_police_router
 from routes.security_incident import router as security_incident_router
 from routes.security_incidenttrackingstate import router as incident_tracking_router
 from routes.security_statusincident import router as status_incident_router
-import orjson
+from starlette.concurrency import run_in_threadpool
+from config.db import init_db
+from services import render_pool, background
+from services.responses import CompactORJSONResponse, ResponseEncodingMiddleware
+from settings import settings
 
 """
 Servicio de Análisis de Datos en FastAPI para DERI.
@@ -14,11 +19,38 @@ Servicio de Análisis de Datos en FastAPI para DERI.
 Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
 """
 
-class PrettyORJSONResponse(ORJSONResponse):
-    def render(self, content: any) -> bytes:
-        return orjson.dumps(content, option=orjson.OPT_INDENT_2)
+def replace_routes(app: FastAPI, router: APIRouter, prefix: str = "") -> None:
+    """
+    Sustituye en su misma posición las rutas de la app que tienen el mismo path y métodos
+    que las del router dado (así se conserva el orden de rutas como /incident_tracking_states/dwell).
+    """
+    replacement = APIRouter()
+    replacement.include_router(router, prefix=prefix)
+    new_routes = {(route.path, frozenset(route.methods)): route for route in replacement.routes}
+    app.router.routes[:] = [
+        new_routes.pop((route.path, frozenset(route.methods)), route) if isinstance(route, APIRoute) else route
+        for route in app.router.routes
+    ]
+    app.router.routes.extend(new_routes.values())
 
-app = FastAPI(default_response_class=PrettyORJSONResponse)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranque y paro del servidor. Importar la app no toca la base de datos: el engine se crea
+    con la primera consulta y las tablas solo si CREATE_SCHEMA_ON_STARTUP está activo.
+    """
+    if settings.CREATE_SCHEMA_ON_STARTUP:
+        await run_in_threadpool(init_db)
+    # Background refresh of the analysis summaries and materialized durations
+    background.start()
+    yield
+    background.shutdown()
+    # Stop the chart render workers with the server
+    render_pool.shutdown()
+
+# Compact JSON by default (?pretty=1 to indent), gzip/brotli for large JSON responses
+app = FastAPI(default_response_class=CompactORJSONResponse, lifespan=lifespan)
+app.add_middleware(ResponseEncodingMiddleware)
 
 # Include the security_police router
 app.include_router(security_police_router, prefix="/api")
@@ -27,4 +59,12 @@ app.include_router(security_incident_router, prefix="/api")
 app.include_router(incident_tracking_router, prefix="/api")
 app.include_router(status_incident_router, prefix="/api")
 
+# Async versions (async def + AsyncSession) of the lookup and analysis routes replace the
+# sync ones when enabled; every other endpoint keeps its sync handler during the migration.
+if settings.ASYNC_ROUTES:
+    from routes.security_incident_async import router as security_incident_async_router
+    from routes.security_incidenttrackingstate_async import router as incident_tracking_async_router
+    replace_routes(app, security_incident_async_router, prefix="/api")
+    replace_routes(app, incident_tracking_async_router, prefix="/api")
+
 app.mount("/static", StaticFiles(directory="."), name="static")
\ No newline at end of file
@@ -0,0 +1,85 @@
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict
+
+# Add the project root to sys.path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import pandas as pd
+
+from config.db import SessionLocal
+from models.security_incident import SecurityIncident
+from services.columnar import police_incident_columns
+
+"""
+Compara la carga de datos del análisis de un policía: objetos ORM completos contra
+la capa columnar (services/columnar.py).
+
+Se ejecuta (contra la base de datos configurada en settings.py, solo lectura):
+-----------
+python benchmarks/columnar_access.py <police_id> [repeticiones]
+
+Reporta la mediana del tiempo y del pico de memoria (tracemalloc) de cada camino.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+
+def orm_frame(db, police_id: int) -> pd.DataFrame:
+    # The previous implementation of /security_incident/police/{police_id}/analysis
+    incidents = db.query(SecurityIncident).filter(SecurityIncident.police_id == police_id).all()
+    return pd.DataFrame([{
+        "incident_id": incident.id,
+        "police_id": incident.police_id,
+        "status_id": incident.status_id,
+        "vector_id": incident.vector_id,
+        "zone_id": incident.zone_id,
+        "attention_time": incident.atention_time
+    } for incident in incidents])
+
+
+def columnar_frame(db, police_id: int) -> pd.DataFrame:
+    return pd.DataFrame(police_incident_columns(db, police_id))
+
+
+def measure(load: Callable, police_id: int, repeat: int) -> Dict[str, float]:
+    seconds, peaks = [], []
+    rows = 0
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            tracemalloc.start()
+            start = time.perf_counter()
+            rows = len(load(db, police_id))
+            seconds.append(time.perf_counter() - start)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        finally:
+            db.close()
+    return {
+        "rows": rows,
+        "median_ms": statistics.median(seconds) * 1000,
+        "peak_mib": statistics.median(peaks) / 2**20,
+    }
+
+
+def main(police_id: int, repeat: int = 5) -> None:
+    results = {
+        "orm": measure(orm_frame, police_id, repeat),
+        "columnar": measure(columnar_frame, police_id, repeat),
+    }
+    for name, result in results.items():
+        print(f"{name:>9}: {result['rows']} rows  {result['median_ms']:.1f} ms  peak {result['peak_mib']:.1f} MiB")
+    print(f"  speedup: {results['orm']['median_ms'] / results['columnar']['median_ms']:.1f}x  "
+          f"memory: {results['orm']['peak_mib'] / results['columnar']['peak_mib']:.1f}x less")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python benchmarks/columnar_access.py <police_id> [repeticiones]")
+        sys.exit(1)
+    main(int(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else 5)
@@ -0,0 +1,321 @@
+import argparse
+import io
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Add the project root to sys.path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+from sqlalchemy import Column, Index, Integer, Table, create_engine, func, select, text
+from sqlalchemy.engine import Engine
+
+from config.db import Base
+from settings import settings
+
+"""
+Generador de datos sintéticos (con semilla) para los benchmarks: llena una base de datos
+local con policías, incidentes y tracking states con volúmenes y distribuciones parecidos a
+los de producción, desde mil hasta 10 millones de incidentes.
+
+- Policías: uno por cada ~500 incidentes, con carga de trabajo de cola larga (Pareto), así
+  hay policías con miles de incidentes además de los típicos.
+- Incidentes: ids en orden de created_at a lo largo de un año; atention_time con
+  distribución log-normal escrito como "HH:MM:SS", como número de segundos, "null" o vacío.
+- Tracking states: flujos de status como los reales (creado, asignado, en camino, en sitio,
+  atendido, cerrado, con reasignaciones, cierres por monitor y cancelaciones), con tiempos
+  log-normales entre cambios de status.
+
+Con Postgres (la base de settings.py o la de --database-url) los renglones se cargan con
+COPY; con --database-url sqlite:///archivo.db se usa SQLite como sustituto. Las tablas que los modelos referencian pero no
+definen (statuses, vectors, zones, ...) se crean como tablas de solo id. Solo para bases de
+datos locales de pruebas: con --reset se BORRAN y recrean todas las tablas de los modelos.
+
+Se ejecuta:
+-----------
+python benchmarks/generator.py --incidents 1000000 [--seed 7] [--database-url URL] [--reset]
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+BULK_TABLES = ("security_police", "security_incident", "security_incidenttrackingstate")
+
+# Incidents generated and written per block; bounds memory at 10M rows
+CHUNK_SIZE = 200_000
+
+INCIDENTS_PER_OFFICER = 500
+N_ZONES = 12
+N_VECTORS = 96
+
+STATUS_NAMES = {
+    1: "Creado", 2: "Asignado", 3: "En camino", 4: "En sitio", 5: "Atendido",
+    6: "Cerrado por monitor", 7: "Cancelado", 8: "Reasignado", 9: "En espera", 10: "Cerrado",
+}
+
+# Status flows of an incident and how often they happen
+STATUS_FLOWS = [
+    ([1, 2, 3, 4, 5, 10], 0.55),
+    ([1, 2, 3, 4, 10], 0.15),
+    ([1, 2, 6], 0.10),
+    ([1, 2, 8, 2, 3, 4, 5, 10], 0.10),
+    ([1, 2, 3, 9, 3, 4, 5, 10], 0.05),
+    ([1, 7], 0.05),
+]
+
+START = np.datetime64("2024-01-01T00:00:00", "us")
+SPAN_SECONDS = 365 * 24 * 3600
+
+DESCRIPTION = ("Reporte ciudadano recibido por el centro de monitoreo; se asigna unidad "
+               "para verificar la situación y brindar apoyo en el sitio. ") * 4
+
+
+def _engine(database_url: Optional[str]) -> Engine:
+    return create_engine(database_url or settings.DATABASE_URL)
+
+
+def _stub_tables() -> List[Table]:
+    """Tablas de solo id para las llaves foráneas que apuntan a tablas que no tienen modelo."""
+    stubs = []
+    for table in list(Base.metadata.tables.values()):
+        for foreign_key in table.foreign_keys:
+            name = foreign_key.target_fullname.split(".")[0]
+            if name not in Base.metadata.tables:
+                stubs.append(Table(name, Base.metadata, Column("id", Integer, primary_key=True)))
+    return stubs
+
+
+def prepare_schema(engine: Engine, reset: bool) -> None:
+    """
+    Crea las tablas (más las de solo id) y llena los catálogos: status, zonas y vectores.
+
+    Raises:
+    - SystemExit: If security_incident already has rows and reset is not set.
+    """
+    stubs = _stub_tables()
+    if reset:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        if connection.execute(text("SELECT count(*) FROM security_incident")).scalar():
+            raise SystemExit("security_incident ya tiene datos; use --reset para borrarlos (solo bases locales)")
+        # Loading without the secondary indexes and building them at the end is much faster
+        for index in _bulk_indexes():
+            index.drop(connection, checkfirst=True)
+        stub_names = {stub.name for stub in stubs}
+        for stub in stubs:
+            if connection.execute(select(func.count()).select_from(stub)).scalar():
+                continue
+            size = {"statuses": len(STATUS_NAMES), "vectors": N_VECTORS, "zones": N_ZONES}.get(stub.name)
+            if size:
+                connection.execute(stub.insert(), [{"id": i} for i in range(1, size + 1)])
+        connection.execute(Base.metadata.tables["security_statusincident"].insert(), [
+            {"id": status_id, "name": name, "slug": name.lower().replace(" ", "-")}
+            for status_id, name in STATUS_NAMES.items()
+        ])
+        now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        connection.execute(Base.metadata.tables["security_zone"].insert(), [
+            {"id": zone_id, "created_at": now, "updated_at": now, "name": f"Zona {zone_id}",
+             "vector_initial": (zone_id - 1) * (N_VECTORS // N_ZONES) + 1,
+             "vector_final": zone_id * (N_VECTORS // N_ZONES), "zone_type": 1}
+            for zone_id in range(1, N_ZONES + 1)
+        ])
+        if "security_vector" in Base.metadata.tables and "security_vector" not in stub_names:
+            connection.execute(Base.metadata.tables["security_vector"].insert(), [
+                {"id": vector_id, "created_at": now, "updated_at": now, "name": f"Vector {vector_id}",
+                 "zone_id": _vector_zone(vector_id)}
+                for vector_id in range(1, N_VECTORS + 1)
+            ])
+
+
+def _bulk_indexes() -> List[Index]:
+    return [index for table in BULK_TABLES for index in Base.metadata.tables[table].indexes]
+
+
+def _vector_zone(vector_id: int) -> int:
+    return (vector_id - 1) // (N_VECTORS // N_ZONES) + 1
+
+
+def _timestamps(values: np.ndarray, postgres: bool) -> np.ndarray:
+    text_values = np.char.replace(np.datetime_as_string(values, unit="us"), "T", " ")
+    # SQLite stores what SQLAlchemy writes for a naive datetime; Postgres gets UTC explicitly
+    return np.char.add(text_values, "+00") if postgres else text_values
+
+
+def _attention_times(rng: np.random.Generator, size: int) -> List[str]:
+    seconds = np.minimum(rng.lognormal(np.log(600), 0.9, size), 86399).astype(np.int64)
+    # The formats found in production: "HH:MM:SS", plain seconds, "null" and empty
+    kind = rng.choice(4, size=size, p=[0.62, 0.25, 0.08, 0.05]).tolist()
+    hms = [f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}" for s in seconds.tolist()]
+    return [(hms[i], str(s), "null", "")[k] for i, (s, k) in enumerate(zip(seconds.tolist(), kind))]
+
+
+def police_rows(rng: np.random.Generator, n_police: int, postgres: bool) -> Dict[str, np.ndarray]:
+    ids = np.arange(1, n_police + 1)
+    created = _timestamps(np.full(n_police, START), postgres)
+    zone_ids = rng.integers(1, N_ZONES + 1, n_police)
+    vectors_per_zone = N_VECTORS // N_ZONES
+    return {
+        "id": ids, "created_at": created, "updated_at": created,
+        "vector_id": (zone_ids - 1) * vectors_per_zone + rng.integers(1, vectors_per_zone + 1, n_police),
+        "is_outside": np.zeros(n_police, bool), "is_supervisor": rng.random(n_police) < 0.05,
+        "zone_id": zone_ids, "is_chief": np.zeros(n_police, bool),
+        "is_sergeant": rng.random(n_police) < 0.1, "grade": rng.choice(["Policía", "Policía 1o", "Sargento"], n_police),
+        "is_assignable": np.ones(n_police, bool),
+    }
+
+
+def incident_chunk(rng: np.random.Generator, first_id: int, size: int, total: int, police_weights: np.ndarray,
+                   first_state_id: int, postgres: bool):
+    """
+    Un bloque de incidentes y sus tracking states.
+
+    Returns:
+    - (incidents, states): Column dicts ready for _write().
+    """
+    ids = np.arange(first_id, first_id + size)
+    # Ids follow created_at, as in production
+    offsets = (ids - 1) * (SPAN_SECONDS / total) + rng.random(size) * (SPAN_SECONDS / total)
+    created = START + (offsets * 1e6).astype("timedelta64[us]")
+    police_ids = rng.choice(len(police_weights), size=size, p=police_weights) + 1
+    vector_ids = rng.integers(1, N_VECTORS + 1, size).astype(object)
+    vector_ids[rng.random(size) < 0.1] = None
+    zone_ids = np.array([None if vector_id is None else _vector_zone(vector_id) for vector_id in vector_ids], dtype=object)
+
+    # Tracking states: one status flow per incident, log-normal gaps between changes
+    flows = rng.choice(len(STATUS_FLOWS), size=size, p=[weight for _, weight in STATUS_FLOWS])
+    state_incidents, state_statuses, state_times = [], [], []
+    last_status = np.empty(size, dtype=np.int64)
+    last_time = created.copy()
+    for flow_index, (flow, _) in enumerate(STATUS_FLOWS):
+        members = np.flatnonzero(flows == flow_index)
+        if not len(members):
+            continue
+        gaps = rng.lognormal(np.log(120), 1.0, (len(members), len(flow)))
+        gaps[:, 0] = 0
+        times = created[members, None] + (np.cumsum(gaps, axis=1) * 1e6).astype("timedelta64[us]")
+        state_incidents.append(np.repeat(ids[members], len(flow)))
+        state_statuses.append(np.tile(flow, len(members)))
+        state_times.append(times.ravel())
+        last_status[members] = flow[-1]
+        last_time[members] = times[:, -1]
+    state_incidents = np.concatenate(state_incidents)
+    order = np.lexsort((np.concatenate(state_times), state_incidents))
+    state_times = _timestamps(np.concatenate(state_times)[order], postgres)
+
+    false = np.zeros(size, bool)
+    incidents = {
+        "id": ids, "created_at": _timestamps(created, postgres), "updated_at": _timestamps(last_time, postgres),
+        "police_id": police_ids, "status_id": last_status, "is_open": false, "is_verified": rng.random(size) < 0.9,
+        "vector_id": vector_ids, "zone_id": zone_ids, "is_affected": false, "is_rated": false,
+        "is_police_arrived": rng.random(size) < 0.85, "is_police_confirm": rng.random(size) < 0.8,
+        "is_possible_duplicate": false, "is_read": np.ones(size, bool), "is_monitor_open": false,
+        "is_from_call": rng.random(size) < 0.6, "atention_time": np.array(_attention_times(rng, size), dtype=object),
+        "description": np.array([DESCRIPTION[:length] for length in rng.integers(40, len(DESCRIPTION), size).tolist()], dtype=object),
+    }
+    states = {
+        "id": np.arange(first_state_id, first_state_id + len(order)),
+        "created_at": state_times, "updated_at": state_times,
+        "incident_id": state_incidents[order], "status_id": np.concatenate(state_statuses)[order],
+    }
+    return incidents, states
+
+
+def _superuser(connection) -> bool:
+    return connection.execute(text("SELECT current_setting('is_superuser')")).scalar() == "on"
+
+
+def _write(engine: Engine, table: str, columns: Dict[str, np.ndarray]) -> None:
+    names = list(columns)
+    rows = zip(*(column.tolist() for column in columns.values()))
+    with engine.begin() as connection:
+        if engine.dialect.name == "postgresql":
+            # COPY is an order of magnitude faster than INSERT at these volumes
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write("\t".join("\\N" if value is None else str(value) for value in row))
+                buffer.write("\n")
+            buffer.seek(0)
+            cursor = connection.connection.cursor()
+            if _superuser(connection):
+                # The generated ids are consistent; skipping the foreign key triggers halves the load
+                cursor.execute("SET LOCAL session_replication_role = replica")
+            cursor.copy_expert(f"COPY {table} ({', '.join(names)}) FROM STDIN", buffer)
+        else:
+            connection.exec_driver_sql(
+                f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})", list(rows)
+            )
+
+
+def _finish(engine: Engine) -> None:
+    with engine.begin() as connection:
+        for index in _bulk_indexes():
+            index.create(connection)
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        for table in BULK_TABLES:
+            # Explicit ids were loaded: move the sequences past them
+            connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 1)) FROM {table}"
+            ))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("ANALYZE"))
+
+
+def generate(incidents: int, seed: int = 7, database_url: Optional[str] = None, reset: bool = False) -> Dict[str, int]:
+    """
+    Llena la base de datos con `incidents` incidentes, sus policías y sus tracking states.
+
+    Returns:
+    - Dict[str, int]: Rows written per table.
+    """
+    engine = _engine(database_url)
+    postgres = engine.dialect.name == "postgresql"
+    prepare_schema(engine, reset)
+    rng = np.random.default_rng(seed)
+
+    n_police = max(10, incidents // INCIDENTS_PER_OFFICER)
+    _write(engine, "security_police", police_rows(rng, n_police, postgres))
+    # Long-tailed workload: a few officers take thousands of incidents
+    police_weights = rng.pareto(1.5, n_police) + 1
+    police_weights /= police_weights.sum()
+
+    written = {"security_police": n_police, "security_incident": 0, "security_incidenttrackingstate": 0}
+    started = time.perf_counter()
+    for first_id in range(1, incidents + 1, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, incidents - first_id + 1)
+        incident_columns, state_columns = incident_chunk(
+            rng, first_id, size, incidents, police_weights, written["security_incidenttrackingstate"] + 1, postgres
+        )
+        _write(engine, "security_incident", incident_columns)
+        _write(engine, "security_incidenttrackingstate", state_columns)
+        written["security_incident"] += size
+        written["security_incidenttrackingstate"] += len(state_columns["id"])
+        elapsed = time.perf_counter() - started
+        print(f"  {written['security_incident']:>10,} incidentes  "
+              f"{written['security_incidenttrackingstate']:>11,} tracking states  ({elapsed:.0f} s)")
+    _finish(engine)
+    engine.dispose()
+    return written
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Datos sintéticos para los benchmarks")
+    parser.add_argument("--incidents", type=int, default=100_000, help="Incidentes a generar (1k a 10M)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-url", help="URL de SQLAlchemy (p. ej. sqlite:///bench.db) en lugar de la de settings.py")
+    parser.add_argument("--reset", action="store_true", help="Borra y recrea las tablas antes de generar")
+    args = parser.parse_args(argv)
+
+    written = generate(args.incidents, args.seed, args.database_url, args.reset)
+    print(", ".join(f"{table}: {count:,}" for table, count in written.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,82 @@
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+# Add the project root to sys.path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from config.db import SessionLocal
+from models.security_police import SecurityPolice
+from services.analysis import police_chart_payload
+from services.columnar import police_incident_columns
+from services.leaderboard import police_leaderboard
+
+"""
+Compara el ranking de todos los policías de security_police: una llamada al análisis por
+policía (lo que hacían los supervisores, sin contar el PNG) contra el ranking de una sola
+pasada (services/leaderboard.py) con NumPy y, en Postgres, con percentile_cont.
+
+Se ejecuta (contra la base de datos configurada en settings.py, solo lectura):
+-----------
+python benchmarks/leaderboard.py [repeticiones]
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+
+def per_officer(db) -> int:
+    ranked = 0
+    for police_id in db.scalars(select(SecurityPolice.id)).all():
+        try:
+            police_chart_payload(police_incident_columns(db, police_id), police_id)
+            ranked += 1
+        except HTTPException:
+            pass  # Officer without valid attention times
+    return ranked
+
+
+def single_pass(method: str) -> Callable:
+    def run(db) -> int:
+        return police_leaderboard(db, limit=1000000, method=method)["total_officers"]
+    return run
+
+
+def measure(run: Callable, repeat: int) -> Dict[str, float]:
+    seconds = []
+    officers = 0
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            officers = run(db)
+            seconds.append(time.perf_counter() - start)
+        finally:
+            db.close()
+    return {"officers": officers, "median_ms": statistics.median(seconds) * 1000}
+
+
+def main(repeat: int = 3) -> None:
+    db = SessionLocal()
+    try:
+        in_database = db.get_bind().dialect.name == "postgresql"
+    finally:
+        db.close()
+    results = {
+        "per_officer": measure(per_officer, repeat),
+        "numpy": measure(single_pass("numpy"), repeat),
+    }
+    if in_database:
+        results["sql"] = measure(single_pass("sql"), repeat)
+    for name, result in results.items():
+        print(f"{name:>12}: {result['officers']} officers  {result['median_ms']:.1f} ms  "
+              f"({results['per_officer']['median_ms'] / result['median_ms']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
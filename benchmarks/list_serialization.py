@@ -0,0 +1,102 @@
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Add the project root to sys.path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from config.db import SessionLocal
+from models.security_incident import SecurityIncident
+from models.security_incidenttrackingstate import SecurityIncidentTrackingState
+from schemas.security_incident import SecurityIncidentResponse
+from schemas.security_incidenttrackingstate import SecurityIncidentTrackingStateResponse
+from services.responses import RowsJSONResponse, schema_columns
+
+"""
+Compara cómo se serializan las listas de /security_incident/police/{police_id} y
+/incident_tracking_states/{incident_id}: objetos ORM validados renglón por renglón con el
+response_model (lo que hace FastAPI) contra Rows de Core codificados directo con orjson
+(services/responses.RowsJSONResponse). Reporta renglones por segundo de la consulta más la
+serialización, y de la serialización sola.
+
+Se ejecuta (contra la base de datos configurada en settings.py, solo lectura):
+-----------
+python benchmarks/list_serialization.py [renglones] [repeticiones]
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+
+def validated_path(model, schema, limit: int) -> Dict[str, Callable]:
+    adapter = TypeAdapter(List[schema])
+
+    def fetch(db):
+        return db.scalars(select(model).order_by(model.id).limit(limit)).all()
+
+    def encode(objects) -> bytes:
+        # FastAPI: validate against the response model, dump to JSON types, then render
+        return orjson.dumps(adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json"))
+
+    return {"fetch": fetch, "encode": encode}
+
+
+def rows_path(model, schema, limit: int) -> Dict[str, Callable]:
+    columns = schema_columns(model, schema)
+
+    def fetch(db):
+        return db.execute(select(*columns).order_by(model.id).limit(limit)).all()
+
+    def encode(rows) -> bytes:
+        return RowsJSONResponse(rows).body
+
+    return {"fetch": fetch, "encode": encode}
+
+
+def measure(path: Dict[str, Callable], repeat: int) -> Dict[str, float]:
+    total, encode_only = [], []
+    rows = 0
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            fetched = path["fetch"](db)
+            encoding = time.perf_counter()
+            path["encode"](fetched)
+            end = time.perf_counter()
+        finally:
+            db.close()
+        rows = len(fetched)
+        total.append(end - start)
+        encode_only.append(end - encoding)
+    return {
+        "rows": rows,
+        "rows_per_second": rows / statistics.median(total),
+        "encode_rows_per_second": rows / statistics.median(encode_only),
+    }
+
+
+def main(limit: int = 10000, repeat: int = 5) -> None:
+    tables = {
+        "security_incident": (SecurityIncident, SecurityIncidentResponse),
+        "tracking_states": (SecurityIncidentTrackingState, SecurityIncidentTrackingStateResponse),
+    }
+    for table, (model, schema) in tables.items():
+        validated = measure(validated_path(model, schema, limit), repeat)
+        rows = measure(rows_path(model, schema, limit), repeat)
+        print(f"{table} ({rows['rows']} renglones)")
+        for name, result in (("orm + validación", validated), ("core + orjson", rows)):
+            print(f"  {name:>17}: {result['rows_per_second']:>10,.0f} renglones/s  "
+                  f"(solo serialización: {result['encode_rows_per_second']:>11,.0f} renglones/s)")
+        print(f"  {'speedup':>17}: {rows['rows_per_second'] / validated['rows_per_second']:.1f}x "
+              f"(serialización {rows['encode_rows_per_second'] / validated['encode_rows_per_second']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
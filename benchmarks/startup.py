@@ -0,0 +1,121 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+"""
+Mide el arranque en frío de la API: el import de app.py y el lifespan de arranque, cada
+repetición en un intérprete nuevo.
+
+Los procesos hijos apuntan a una base de datos inexistente, así que si algún import o el
+arranque intenta conectarse (o crear tablas) la medición falla. También reporta qué
+librerías pesadas quedaron cargadas (pandas y matplotlib se deben importar hasta el
+primer análisis) y los módulos que más tardan en importarse (python -X importtime).
+
+Se ejecuta:
+-----------
+python benchmarks/startup.py [repeticiones] [--max-import-seconds N]
+
+Con --max-import-seconds regresa código 1 si la mediana del import lo excede o si se
+cargó alguna librería pesada, para usarlo en CI.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+project_root = Path(__file__).resolve().parent.parent
+
+# Must not be imported until an analysis is requested
+HEAVY_MODULES = ("pandas", "matplotlib")
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.app):
+    started = time.perf_counter()
+import config.db
+print(json.dumps({
+    "import_seconds": imported - start,
+    "startup_seconds": started - imported,
+    "heavy_modules": [name for name in %r if name in sys.modules],
+    "engine_created": config.db._engine is not None,
+}))
+""" % (HEAVY_MODULES,)
+
+
+def _child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        # Nothing listens here: any connection attempt during startup fails
+        "POSTGRES_HOST": "127.0.0.1",
+        "POSTGRES_PORT": "1",
+        "CREATE_SCHEMA_ON_STARTUP": "false",
+        # Measure the server itself, not the first run of the background jobs
+        "POLICE_SUMMARY_REFRESH_SECONDS": "0",
+        "INCIDENT_DURATIONS_REFRESH_SECONDS": "0",
+    })
+    return env
+
+
+def measure_once() -> Dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=project_root, env=_child_env(),
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(top: int = 10) -> List[Dict[str, Any]]:
+    """Módulos con mayor tiempo acumulado de import (solo los del proyecto y sus dependencias directas)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"], cwd=project_root, env=_child_env(),
+        capture_output=True, text=True, check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Top-level entries (depth 0 or 1) say where the time goes without repeating children
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            modules.append({"module": name.strip(), "cumulative_ms": int(cumulative) / 1000})
+    modules.sort(key=lambda module: -module["cumulative_ms"])
+    return modules[:top]
+
+
+def main(argv: List[str]) -> int:
+    max_import_seconds = None
+    if "--max-import-seconds" in argv:
+        index = argv.index("--max-import-seconds")
+        max_import_seconds = float(argv[index + 1])
+        argv = argv[:index] + argv[index + 2:]
+    repeat = int(argv[0]) if argv else 5
+
+    runs = [measure_once() for _ in range(repeat)]
+    import_seconds = statistics.median(run["import_seconds"] for run in runs)
+    startup_seconds = statistics.median(run["startup_seconds"] for run in runs)
+    heavy_modules = sorted({name for run in runs for name in run["heavy_modules"]})
+    engine_created = any(run["engine_created"] for run in runs)
+
+    print(f"import app:          {import_seconds * 1000:8.1f} ms (mediana de {repeat})")
+    print(f"lifespan (arranque): {startup_seconds * 1000:8.1f} ms")
+    print(f"librerías pesadas cargadas: {', '.join(heavy_modules) or 'ninguna'}")
+    print(f"engine creado en el arranque: {'sí' if engine_created else 'no'}")
+    print("imports más lentos:")
+    for module in slowest_imports():
+        print(f"  {module['cumulative_ms']:8.1f} ms  {module['module']}")
+
+    if max_import_seconds is not None and (import_seconds > max_import_seconds or heavy_modules):
+        print("Regresión en el arranque")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,410 @@
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Add the project root to sys.path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+from sqlalchemy import create_engine, func, select
+
+from settings import settings
+
+"""
+Suite de benchmarks de la API: cada ruta y cada etapa de los análisis (consulta, parseo de
+atention_time, DataFrame y render) se mide sobre los datos de benchmarks/generator.py.
+
+Cada caso corre en su propio proceso (así el RSS máximo es el del caso y no el de los
+anteriores) y reporta latencia p50/p99, throughput (peticiones/s y renglones/s) y RSS
+máximo del proceso y de los workers de render. Las rutas se llaman con el TestClient de
+FastAPI (sin servidor HTTP); las de gráficas se miden en frío (cache de render vacía) y,
+las que lo ameritan, también desde la cache.
+
+Los resultados se guardan en JSON con --output y se comparan contra un archivo anterior
+con --baseline: un caso es regresión si su p50 o su RSS máximo crece más de --tolerance
+(exit code 1). Los baselines dependen de la máquina y del volumen de datos, así que no se
+versionan; se genera uno en la rama principal y se compara en la rama del cambio.
+
+Se ejecuta:
+-----------
+python benchmarks/generator.py --incidents 1000000 --database-url URL --reset
+python benchmarks/suite.py --database-url URL --output main.json
+python benchmarks/suite.py --database-url URL --baseline main.json [--cases police,stage] [--repeat 20]
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+DEFAULT_TOLERANCE = 0.2
+BATCH_IDS = 200
+
+
+# Cases: name -> builder(context) returning (run, rows); run() is one measured call and rows
+# the number of rows it processes (for rows/s). Builders run inside the child process.
+
+def _client():
+    from fastapi.testclient import TestClient
+    from app import app
+    # Without the context manager the lifespan (background refreshes) does not start
+    return TestClient(app)
+
+
+def _endpoint(path: Callable[[Dict[str, Any]], str], rows: Callable[[Dict[str, Any]], int] = lambda context: 1,
+              cold: bool = False) -> Callable:
+    def build(context: Dict[str, Any]) -> Tuple[Callable, int]:
+        from services.render_cache import render_cache
+        client = _client()
+        url = path(context)
+
+        def run() -> None:
+            if cold:
+                render_cache.clear()
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url}: HTTP {response.status_code} {response.text[:200]}")
+        return run, rows(context)
+    return build
+
+
+def _police_columns(context: Dict[str, Any]):
+    from config.db import SessionLocal
+    from services.columnar import police_incident_columns
+    with SessionLocal() as db:
+        return police_incident_columns(db, context["heavy_police_id"])
+
+
+def _stage_police_query(context: Dict[str, Any]) -> Tuple[Callable, int]:
+    from config.db import SessionLocal
+    from services.columnar import police_incident_columns
+
+    def run() -> None:
+        with SessionLocal() as db:
+            police_incident_columns(db, context["heavy_police_id"])
+    return run, context["heavy_police_incidents"]
+
+
+def _stage_police_parse(context: Dict[str, Any]) -> Tuple[Callable, int]:
+    from services.attention_time import parse_attention_seconds
+    values = _police_columns(context)["attention_time"]
+    return lambda: parse_attention_seconds(values), len(values)
+
+
+def _stage_police_dataframe(context: Dict[str, Any]) -> Tuple[Callable, int]:
+    from services.analysis import police_chart_payload
+    columns = _police_columns(context)
+    return lambda: police_chart_payload(columns, context["heavy_police_id"]), len(columns["incident_id"])
+
+
+def _stage_police_render(context: Dict[str, Any]) -> Tuple[Callable, int]:
+    from services.analysis import POLICE_CHART_FIGSIZE, police_chart_payload, police_chart_view, police_render_payload
+    from services.chart_formats import chart_size
+    from services.charts import render_police_chart
+    payload = police_chart_payload(_police_columns(context), context["heavy_police_id"])
+    dpi, figsize = chart_size(None, None, POLICE_CHART_FIGSIZE)
+    view = police_chart_view(None, payload["total_incidents"])
+    render_payload = police_render_payload(payload, view, dpi, figsize)
+    return lambda: render_police_chart(render_payload, io.BytesIO()), payload["total_incidents"]
+
+
+def _tracking_columns(context: Dict[str, Any]):
+    from config.db import SessionLocal
+    from services.columnar import tracking_state_columns
+    with SessionLocal() as db:
+        return tracking_state_columns(db, incident_id=context["incident_id"])
+
+
+def _stage_incident_query(context: Dict[str, Any]) -> Tuple[Callable, int]:
+    from config.db import SessionLocal
+    from services.columnar import tracking_state_columns
+
+    def run() -> None:
+        with SessionLocal() as db:
+            tracking_state_columns(db, incident_id=context["incident_id"])
+    return run, context["incident_states"]
+
+
+def _stage_incident_dataframe(context: Dict[str, Any]) -> Tuple[Callable, int]:
+    from services.analysis import status_chart_payload, status_time_frame
+    columns = _tracking_columns(context)
+    return lambda: status_chart_payload(status_time_frame(columns), {}, "benchmark"), len(columns["status_id"])
+
+
+def _stage_incident_render(context: Dict[str, Any]) -> Tuple[Callable, int]:
+    from services.analysis import status_chart_payload, status_time_frame
+    from services.charts import render_status_chart
+    payload = status_chart_payload(status_time_frame(_tracking_columns(context)), {}, "benchmark")
+    return lambda: render_status_chart(payload, io.BytesIO()), context["incident_states"]
+
+
+def _police_analysis(chart_format: str, officer: str) -> Callable[[Dict[str, Any]], str]:
+    return lambda context: f"/api/security_incident/police/{context[officer + '_police_id']}/analysis?format={chart_format}"
+
+
+CASES: Dict[str, Callable[[Dict[str, Any]], Tuple[Callable, int]]] = {
+    # Analysis endpoints
+    "police_analysis.png.heavy": _endpoint(_police_analysis("png", "heavy"), lambda c: c["heavy_police_incidents"], cold=True),
+    "police_analysis.png.typical": _endpoint(_police_analysis("png", "typical"), lambda c: c["typical_police_incidents"], cold=True),
+    "police_analysis.png.cached": _endpoint(_police_analysis("png", "heavy"), lambda c: c["heavy_police_incidents"]),
+    "police_analysis.json.heavy": _endpoint(_police_analysis("json", "heavy"), lambda c: c["heavy_police_incidents"]),
+    "incident_analysis_full.png": _endpoint(
+        lambda c: f"/api/incident_tracking_states/{c['incident_id']}/analysis_full?format=png",
+        lambda c: c["incident_states"], cold=True),
+    "incident_analysis.json": _endpoint(
+        lambda c: f"/api/incident_tracking_states/{c['incident_id']}/analysis?format=json",
+        lambda c: c["incident_states"]),
+    "incident_durations": _endpoint(
+        lambda c: f"/api/incident_tracking_states/{c['incident_id']}/durations", lambda c: c["incident_states"]),
+    # Lists, lookups and exports
+    "police_incidents.page": _endpoint(lambda c: f"/api/security_incident/police/{c['heavy_police_id']}?limit=100",
+                                       lambda c: min(100, c["heavy_police_incidents"])),
+    "security_incident.by_id": _endpoint(lambda c: f"/api/security_incident/{c['incident_id']}"),
+    "incident_tracking_states.list": _endpoint(
+        lambda c: f"/api/incident_tracking_states/{c['incident_id']}", lambda c: c["incident_states"]),
+    "security_police.by_id": _endpoint(lambda c: f"/api/security_police/{c['heavy_police_id']}"),
+    "security_police.batch": _endpoint(lambda c: f"/api/security_police?ids={','.join(map(str, c['batch_police_ids']))}",
+                                       lambda c: len(c["batch_police_ids"])),
+    "status_incidents": _endpoint(lambda c: "/api/status_incidents"),
+    "security_incident.export.arrow": _endpoint(
+        lambda c: f"/api/security_incident/export?format=arrow&police_id={c['heavy_police_id']}",
+        lambda c: c["heavy_police_incidents"]),
+    # Fleet-wide aggregates
+    "police_leaderboard": _endpoint(lambda c: "/api/security_police/leaderboard", lambda c: c["incidents"]),
+    "attention_quantiles": _endpoint(lambda c: "/api/security_incident/attention_quantiles", lambda c: c["incidents"]),
+    "status_dwell.police": _endpoint(lambda c: f"/api/incident_tracking_states/dwell?police_id={c['heavy_police_id']}",
+                                     lambda c: c["heavy_police_incidents"]),
+    # Analysis stages of the heaviest officer and of one incident
+    "stage.police.query": _stage_police_query,
+    "stage.police.parse": _stage_police_parse,
+    "stage.police.dataframe": _stage_police_dataframe,
+    "stage.police.render": _stage_police_render,
+    "stage.incident.query": _stage_incident_query,
+    "stage.incident.dataframe": _stage_incident_dataframe,
+    "stage.incident.render": _stage_incident_render,
+}
+
+
+def _rss_mb() -> Optional[float]:
+    # Current resident set (Linux); None elsewhere
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _maxrss_mb(who: int) -> float:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    maxrss = resource.getrusage(who).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def run_case(name: str, context: Dict[str, Any], repeat: int, warmup: int) -> Dict[str, Any]:
+    """Mide un caso en este proceso: warmup llamadas sin medir y repeat medidas."""
+    from services import render_pool
+
+    run, rows = CASES[name](context)
+    rss_before = _rss_mb()
+    for _ in range(warmup):
+        run()
+    seconds = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+    # Wait for the render workers so their peak RSS shows up in RUSAGE_CHILDREN
+    render_pool.shutdown(wait=True)
+
+    milliseconds = np.array(seconds) * 1000
+    return {
+        "repeat": repeat,
+        "rows": rows,
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p99_ms": float(np.percentile(milliseconds, 99)),
+        "mean_ms": float(milliseconds.mean()),
+        "ops_per_s": repeat / elapsed,
+        "rows_per_s": rows * repeat / elapsed,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _maxrss_mb(resource.RUSAGE_SELF),
+        "peak_worker_rss_mb": _maxrss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def _use_database(database_url: Optional[str]) -> None:
+    # Point the app's lazily created engine at the benchmark database
+    if database_url:
+        import config.db
+        config.db._engine = create_engine(database_url)
+
+
+def discover(database_url: Optional[str]) -> Dict[str, Any]:
+    """
+    Datos generados y los IDs a medir: el policía con más incidentes, uno típico (mediana),
+    un incidente de en medio y los primeros BATCH_IDS policías.
+    """
+    from models.security_incident import SecurityIncident
+    from models.security_incidenttrackingstate import SecurityIncidentTrackingState
+    from models.security_police import SecurityPolice
+
+    engine = create_engine(database_url or settings.DATABASE_URL)
+    try:
+        with engine.connect() as connection:
+            counts = dict(connection.execute(
+                select(SecurityIncident.police_id, func.count()).where(SecurityIncident.police_id.is_not(None))
+                .group_by(SecurityIncident.police_id)
+            ).all())
+            if not counts:
+                raise SystemExit("No hay incidentes; genere datos con benchmarks/generator.py")
+            incidents = connection.execute(select(func.count()).select_from(SecurityIncident)).scalar()
+            states = connection.execute(select(func.count()).select_from(SecurityIncidentTrackingState)).scalar()
+            police = connection.execute(select(func.count()).select_from(SecurityPolice)).scalar()
+            incident_id = connection.execute(
+                select(SecurityIncidentTrackingState.incident_id)
+                .where(SecurityIncidentTrackingState.incident_id >= incidents // 2)
+                .order_by(SecurityIncidentTrackingState.incident_id).limit(1)
+            ).scalar()
+            incident_states = connection.execute(
+                select(func.count()).where(SecurityIncidentTrackingState.incident_id == incident_id)
+            ).scalar()
+            batch_police_ids = connection.execute(
+                select(SecurityPolice.id).order_by(SecurityPolice.id).limit(BATCH_IDS)
+            ).scalars().all()
+            dialect = engine.dialect.name
+    finally:
+        engine.dispose()
+
+    heavy = max(counts, key=counts.get)
+    median = float(np.median(list(counts.values())))
+    typical = min(counts, key=lambda police_id: abs(counts[police_id] - median))
+    return {
+        "dataset": {"dialect": dialect, "police": police, "incidents": incidents, "tracking_states": states},
+        "incidents": incidents,
+        "heavy_police_id": heavy, "heavy_police_incidents": counts[heavy],
+        "typical_police_id": typical, "typical_police_incidents": counts[typical],
+        "incident_id": incident_id, "incident_states": incident_states,
+        "batch_police_ids": batch_police_ids,
+    }
+
+
+def run_child(name: str, context: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    """Corre un caso en un proceso nuevo; el resultado es el último renglón (JSON) de su salida."""
+    command = [sys.executable, __file__, "--child", name, "--context", json.dumps(context),
+               "--repeat", str(args.repeat), "--warmup", str(args.warmup)]
+    if args.database_url:
+        command += ["--database-url", args.database_url]
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=project_root)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        # The child died (killed by the OOM killer, crashed interpreter...)
+        error = (completed.stderr.strip().splitlines() or [f"exit code {completed.returncode}"])[-1]
+        return {"error": error}
+    return json.loads(lines[-1])
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Compara contra un baseline e imprime el cambio de p50, p99 y RSS por caso.
+
+    Returns:
+    - List[str]: Cases whose p50 or peak RSS grew more than tolerance, or that fail now and did not in the baseline.
+    """
+    if results["dataset"] != baseline.get("dataset"):
+        print(f"AVISO: el baseline es de otros datos ({baseline.get('dataset')}); la comparación no es directa")
+    regressions = []
+    print(f"\n{'caso':<34}{'p50':>10}{'Δp50':>9}{'p99':>10}{'Δp99':>9}{'RSS MB':>9}{'ΔRSS':>9}")
+    for name, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if not previous or "error" in previous:
+            continue
+        if "error" in current:
+            # Worked in the baseline and fails now: a regression, not a case to leave out
+            regressions.append(name)
+            print(f"{name:<34}ERROR: {current['error']}  REGRESIÓN")
+            continue
+        change = {
+            metric: current[metric] / previous[metric] - 1 if previous[metric] else 0.0
+            for metric in ("p50_ms", "p99_ms", "peak_rss_mb")
+        }
+        regressed = change["p50_ms"] > tolerance or change["peak_rss_mb"] > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<34}{current['p50_ms']:>8.1f}ms{change['p50_ms']:>+9.0%}{current['p99_ms']:>8.1f}ms"
+              f"{change['p99_ms']:>+9.0%}{current['peak_rss_mb']:>9.0f}{change['peak_rss_mb']:>+9.0%}"
+              f"{'  REGRESIÓN' if regressed else ''}")
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Suite de benchmarks de rutas y etapas de análisis")
+    parser.add_argument("--database-url", help="URL de SQLAlchemy de los datos generados (por defecto la de settings.py)")
+    parser.add_argument("--cases", help="Solo los casos cuyo nombre contiene alguno de estos textos (separados por coma)")
+    parser.add_argument("--repeat", type=int, default=20, help="Mediciones por caso")
+    parser.add_argument("--warmup", type=int, default=2, help="Llamadas sin medir antes de cada caso")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados (sirve como baseline)")
+    parser.add_argument("--baseline", help="Resultados anteriores (JSON) contra los que comparar")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Crecimiento permitido (0.2 = 20%%)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--context", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _use_database(args.database_url)
+        try:
+            result = run_case(args.child, json.loads(args.context), args.repeat, args.warmup)
+        except Exception as error:
+            # Reported for this case (and as a regression against a baseline where it worked); the suite goes on
+            result = {"error": f"{type(error).__name__}: {str(error).splitlines()[0][:300]}"}
+        print(json.dumps(result))
+        return 0
+
+    context = discover(args.database_url)
+    filters = [text.strip() for text in args.cases.split(",")] if args.cases else None
+    names = [name for name in CASES if filters is None or any(text in name for text in filters)]
+    dataset = context["dataset"]
+    print(f"{dataset['dialect']}: {dataset['police']:,} policías, {dataset['incidents']:,} incidentes, "
+          f"{dataset['tracking_states']:,} tracking states; policía {context['heavy_police_id']} "
+          f"({context['heavy_police_incidents']:,} incidentes), incidente {context['incident_id']}")
+
+    results = {
+        "dataset": dataset,
+        "environment": {"python": platform.python_version(), "machine": platform.platform(), "cpus": os.cpu_count()},
+        "cases": {},
+    }
+    for name in names:
+        result = run_child(name, context, args)
+        results["cases"][name] = result
+        if "error" in result:
+            print(f"{name:<34}ERROR: {result['error']}")
+        else:
+            print(f"{name:<34}p50 {result['p50_ms']:>9.1f} ms  p99 {result['p99_ms']:>9.1f} ms  "
+                  f"{result['ops_per_s']:>8.1f}/s  {result['rows_per_s']:>12,.0f} renglones/s  "
+                  f"RSS {result['peak_rss_mb']:.0f} MB (render {result['peak_worker_rss_mb']:.0f} MB)")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Resultados guardados en {args.output}")
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regresiones (más de {args.tolerance:.0%}): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
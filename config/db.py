@@ -1,10 +1,27 @@
+import threading
+from typing import Optional
 from sqlalchemy import create_engine, MetaData
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 from settings import settings  # Import settings
 
+"""
+Conexión a la base de datos.
+
+Importar este módulo no se conecta a la base de datos ni crea tablas: el engine se crea
+la primera vez que se usa (get_engine() o la primera consulta de una sesión de
+SessionLocal) y el esquema se crea solo de forma explícita con init_db(), ya sea con
+
+    python -m config.db
+
+o con CREATE_SCHEMA_ON_STARTUP=true en el arranque de la app. Así un worker arranca
+aunque la base de datos no esté disponible en ese momento.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
 # Database connection
-DATABASE_URL = settings.DATABASE_URL 
-engine = create_engine(DATABASE_URL)
+DATABASE_URL = settings.DATABASE_URL
 
 # Metadata and Base
 meta = MetaData()
@@ -13,11 +30,60 @@ Base = declarative_base()
 # Import all models to register them with Base
 from models import *  # Import all models from the models package
 
-# Create (bind) tablas
-Base.metadata.create_all(bind=engine)
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> Engine:
+    """
+    Crea (la primera vez) el engine síncrono. Crear el engine no abre conexiones.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(DATABASE_URL)
+    return _engine
+
+def __getattr__(name: str):
+    # `from config.db import engine` keeps working, creating the engine on first access
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class LazyBindSession(Session):
+    """
+    Session que toma el engine de get_engine() hasta que ejecuta algo.
+    """
+    def get_bind(self, *args, **kwargs):
+        if self.bind is None:
+            self.bind = get_engine()
+        return super().get_bind(*args, **kwargs)
 
 # Session management
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=LazyBindSession, autocommit=False, autoflush=False)
+
+def init_db() -> None:
+    """
+    Crea las tablas de todos los modelos que no existan (paso explícito, ver arriba).
+    """
+    Base.metadata.create_all(bind=get_engine())
+
+# Async engine and sessions (only used when settings.ASYNC_ROUTES is enabled)
+_async_sessionmaker = None
+
+def get_async_sessionmaker():
+    """
+    Crea (la primera vez) el engine asíncrono sobre asyncpg y regresa su fábrica de AsyncSession.
+    """
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        async_engine = create_async_engine(settings.ASYNC_DATABASE_URL)
+        _async_sessionmaker = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
 
-# Connection
-conn = engine.connect()
+if __name__ == "__main__":
+    # The models are registered on config.db's Base, not on this __main__ copy of the module
+    from config.db import init_db as create_schema
+    create_schema()
+    print("Esquema creado.")
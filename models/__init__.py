@@ -5,6 +5,9 @@ from .security_incidenttrackingstate import SecurityIncidentTrackingState
 from .security_incidenttype import SecurityIncidentType
 from .security_statusincident import SecurityStatusIncident
 from .security_vector import SecurityVector
+from .police_summary import AnalysisWatermark, PoliceIncidentLedger, PoliceAttentionSummary
+from .incident_durations import IncidentStatusDuration, IncidentTimelineTail
+from .attention_sketch import AttentionSketchLedger, AttentionSketch
 
 """
 Servicio de Análisis de Datos en FastAPI para DERI.
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, Float, Date, TIMESTAMP, JSON
+
+from config.db import Base
+
+"""
+Histogramas de tiempos de atención por zona, vector y día (services/attention_sketches.py).
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+class AttentionSketchLedger(Base):
+    """La cubeta (zona, vector, día) y los segundos con que cada incidente contribuyó."""
+    __tablename__ = "analysis_attention_sketch_ledger"
+
+    incident_id = Column(Integer, primary_key=True)
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    zone_id = Column(Integer, nullable=False)  # 0 = incident without zone
+    vector_id = Column(Integer, nullable=False)  # 0 = incident without vector
+    day = Column(Date, nullable=False)  # UTC date of created_at
+    attention_seconds = Column(Float, nullable=True)  # NULL = invalid atention_time
+
+
+class AttentionSketch(Base):
+    """Conteos, suma y histograma mergeable de tiempos de atención de una (zona, vector, día)."""
+    __tablename__ = "analysis_attention_sketch"
+
+    zone_id = Column(Integer, primary_key=True)
+    vector_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    total_incidents = Column(Integer, nullable=False, default=0)
+    valid_incidents = Column(Integer, nullable=False, default=0)
+    sum_seconds = Column(Float, nullable=False, default=0.0)
+    sketch = Column(JSON, nullable=True)  # services.quantiles.LogHistogram.to_dict()
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=True)
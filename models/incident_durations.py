@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, Float, BigInteger
+
+from config.db import Base
+
+"""
+Tablas materializadas de tiempo por status de cada incidente (services/incident_durations.py).
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+class IncidentStatusDuration(Base):
+    """Segundos que un incidente pasó en cada status, por vista ("full" o "police")."""
+    __tablename__ = "analysis_incident_status_duration"
+
+    incident_id = Column(Integer, primary_key=True)
+    view = Column(String(10), primary_key=True)
+    status_id = Column(Integer, primary_key=True)
+    seconds = Column(Float, nullable=False, default=0.0)
+    first_seen_ns = Column(BigInteger, nullable=False)  # Earliest created_at, UTC epoch nanoseconds
+
+
+class IncidentTimelineTail(Base):
+    """
+    Último tracking state procesado de un incidente por vista: el segmento abierto cuya
+    duración se conocerá cuando llegue el siguiente state.
+    """
+    __tablename__ = "analysis_incident_timeline_tail"
+
+    incident_id = Column(Integer, primary_key=True)
+    view = Column(String(10), primary_key=True)
+    status_id = Column(Integer, nullable=False)  # -1 = state without status
+    created_at_ns = Column(BigInteger, nullable=False)
+    state_count = Column(Integer, nullable=False)  # States of the view processed so far
+    # Latest updated_at (UTC epoch nanoseconds) of the incident's states when it was materialized.
+    # On an existing database: ALTER TABLE analysis_incident_timeline_tail ADD COLUMN last_updated_ns bigint;
+    # and rebuild with python -m services.incident_durations --full
+    last_updated_ns = Column(BigInteger, nullable=True)
@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Integer, String, Float, TIMESTAMP, JSON
+
+from config.db import Base
+
+"""
+Tablas de resumen incremental de tiempos de atención por policía (services/police_summary.py).
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+class AnalysisWatermark(Base):
+    """Hasta qué (updated_at, id) de la tabla fuente ya procesó cada resumen incremental."""
+    __tablename__ = "analysis_watermark"
+
+    name = Column(String, primary_key=True)
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    last_id = Column(Integer, nullable=True)
+    refreshed_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+
+class PoliceIncidentLedger(Base):
+    """Lo que cada incidente aportó al resumen, para poder restarlo cuando el incidente cambia."""
+    __tablename__ = "analysis_police_incident_ledger"
+
+    incident_id = Column(Integer, primary_key=True)
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    police_id = Column(Integer, nullable=True)
+    vector_id = Column(Integer, nullable=False)  # 0 = incident without vector
+    attention_seconds = Column(Float, nullable=True)  # NULL = invalid atention_time
+
+
+class PoliceAttentionSummary(Base):
+    """
+    Conteos, suma y histograma de tiempos de atención por (police_id, vector_id).
+    vector_id = -1 is the officer-wide row, 0 groups incidents without vector.
+    """
+    __tablename__ = "analysis_police_attention_summary"
+
+    police_id = Column(Integer, primary_key=True)
+    vector_id = Column(Integer, primary_key=True)
+    total_incidents = Column(Integer, nullable=False, default=0)
+    valid_incidents = Column(Integer, nullable=False, default=0)
+    sum_seconds = Column(Float, nullable=False, default=0.0)
+    sketch = Column(JSON, nullable=True)  # services.quantiles.LogHistogram.to_dict()
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=True)
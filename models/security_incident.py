@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, TIMESTAMP, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, TIMESTAMP, Text, Index
 from sqlalchemy.orm import relationship
 from config.db import Base
 
 
 class SecurityIncident(Base):
     __tablename__ = "security_incident"
+    __table_args__ = (
+        # Keyset pagination of an officer's incidents (services/pagination.py). On an existing
+        # database: CREATE INDEX CONCURRENTLY ix_security_incident_police_created_id
+        #           ON security_incident (police_id, created_at, id);
+        Index("ix_security_incident_police_created_id", "police_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False)
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, TIMESTAMP, Index
 from sqlalchemy.orm import relationship
 
 from config.db import Base
 
 class SecurityIncidentTrackingState(Base):
     __tablename__ = "security_incidenttrackingstate"
+    __table_args__ = (
+        # Keyset pagination of an incident's states (services/pagination.py). On an existing
+        # database: CREATE INDEX CONCURRENTLY ix_security_incidenttrackingstate_incident_created_id
+        #           ON security_incidenttrackingstate (incident_id, created_at, id);
+        Index("ix_security_incidenttrackingstate_incident_created_id", "incident_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False)
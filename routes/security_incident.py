@@ -1,22 +1,28 @@
-from typing import List, Dict, Any
-from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Header, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from config.db import engine
+from config.db import SessionLocal
 from models.security_incident import SecurityIncident
-from sqlalchemy.orm import sessionmaker
-from schemas.security_incident import SecurityIncidentResponse
-import pandas as pd
-import numpy as np
-from datetime import datetime, time
-import re
-import os
-from fastapi.responses import JSONResponse
-from pathlib import Path
-import matplotlib.pyplot as plt
-from fastapi.responses import FileResponse
-
-# Create a session
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from schemas.security_incident import SecurityIncidentResponse, AttentionQuantilesResponse
+from datetime import date, datetime
+from services.render_cache import render_cache
+from services import render_pool
+from services.columnar import police_incident_columns
+from services.analysis import (
+    POLICE_CHART_FIGSIZE, police_chart_payload, police_chart_view, police_fingerprint_query, police_render_payload
+)
+from services.chart_formats import (
+    DATA_FORMATS, FORMAT_PATTERN, MIN_DPI, SIZE_PATTERN, chart_size, document_response, negotiate,
+    police_analysis_document
+)
+from services.deadlines import query_deadline
+from services.pagination import keyset_page, next_cursor
+from services.export import export_response
+from services.responses import RowsJSONResponse, schema_columns
+from services import police_summary
+from services.attention_sketches import attention_quantiles
+from settings import settings
 
 router = APIRouter()
 
@@ -28,6 +34,73 @@ def get_db():
     finally:
         db.close()
 
+@router.get("/security_incident/export")
+def export_security_incidents(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow|parquet)$"),
+    police_id: Optional[int] = None,
+    zone_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+):
+    """
+    Exporta los security_incidents que cumplen el filtro como NDJSON, CSV, Arrow o Parquet, en streaming.
+
+    Rows are read with a server-side cursor and sent as they arrive, so there is no row cap and
+    memory does not depend on the size of the export.
+
+    Parameters:
+    - format: "ndjson" (one JSON object per line), "csv" (with header), "arrow" (Arrow IPC
+      stream) or "parquet". Arrow and Parquet keep column types and UTC timestamps.
+    - police_id: Only incidents assigned to this police officer.
+    - zone_id: Only incidents of this zone.
+    - date_from / date_to: Incident created_at range (inclusive start, exclusive end).
+
+    Returns:
+    - Every column of each incident, ordered by id.
+    """
+    stmt = select(*SecurityIncident.__table__.columns).order_by(SecurityIncident.id)
+    if police_id is not None:
+        stmt = stmt.where(SecurityIncident.police_id == police_id)
+    if zone_id is not None:
+        stmt = stmt.where(SecurityIncident.zone_id == zone_id)
+    if date_from is not None:
+        stmt = stmt.where(SecurityIncident.created_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(SecurityIncident.created_at < date_to)
+    return export_response(stmt, format, "security_incidents")
+
+@router.get("/security_incident/attention_quantiles", response_model=AttentionQuantilesResponse)
+def get_attention_quantiles(
+    zone_id: Optional[List[int]] = Query(None),
+    vector_id: Optional[List[int]] = Query(None),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    q: List[float] = Query([0.5, 0.9, 0.99]),
+    db: Session = Depends(get_db)
+):
+    """
+    Cuantiles aproximados del tiempo de atención para cualquier combinación de zonas, vectores
+    y rango de días, combinando los histogramas precalculados de services/attention_sketches.py.
+
+    The cost depends on the number of (zone, vector, day) buckets, not on the number of
+    incidents. Counts and mean are exact; each quantile is within relative_accuracy (1%) of
+    the exact one. Data is as of refreshed_at (services/police_summary.refresh()).
+
+    Parameters:
+    - zone_id / vector_id: Repeatable; all zones / vectors when omitted.
+    - date_from / date_to: UTC days of the incident created_at (inclusive start, exclusive end).
+    - q: Repeatable quantiles in 0..1 (default 0.5, 0.9 and 0.99).
+
+    Returns:
+    - AttentionQuantilesResponse: Counts, mean and the quantiles keyed like "p50".
+    """
+    if any(not 0 <= quantile <= 1 for quantile in q):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+    result = attention_quantiles(
+        db, zone_ids=zone_id, vector_ids=vector_id, date_from=date_from, date_to=date_to, quantiles=q
+    )
+    return {**result, "refreshed_at": police_summary.last_refreshed_at(db)}
+
 @router.get("/security_incident/{id}", response_model=SecurityIncidentResponse)
 def get_security_incident_by_id(id: int, db: Session = Depends(get_db)):
     """
@@ -51,8 +124,10 @@ def get_security_incident_by_id(id: int, db: Session = Depends(get_db)):
 @router.get("/security_incident/police/{police_id}", response_model=List[SecurityIncidentResponse])
 def get_police_incidents(
     police_id: int, 
+    response: Response,
     limit: int = Query(50, ge=1, le=100), 
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
@@ -61,21 +136,29 @@ def get_police_incidents(
     Parameters:
     - police_id: The ID of the police officer
     - limit: Maximum number of records to return (default: 50, max: 100)
-    - offset: Number of records to skip (for pagination)
+    - offset: Number of records to skip (for pagination, deprecated in favor of cursor)
+    - cursor: The X-Next-Cursor header of the previous page
     
     Returns:
-    - List[SecurityIncidentResponse]: List of security incidents assigned to the police officer
+    - List[SecurityIncidentResponse]: List of security incidents assigned to the police officer,
+      newest first. When there are more, the X-Next-Cursor header has the cursor of the next page.
+      Rows are selected with Core and encoded straight to JSON (no per-row validation).
     
     Raises:
+    - 400 Bad Request: If both offset and cursor are given, or the cursor is invalid
     - 404 Not Found: If no incidents are found for the specified police officer
     """
-    # Query the database for incidents assigned to the given police_id
-    incidents = db.query(SecurityIncident)\
-                  .filter(SecurityIncident.police_id == police_id)\
-                  .order_by(SecurityIncident.created_at.desc())\
-                  .offset(offset)\
-                  .limit(limit)\
-                  .all()
+    if cursor is not None and offset:
+        raise HTTPException(status_code=400, detail="Use either offset or cursor, not both")
+
+    # Query the database for incidents assigned to the given police_id, one page after the cursor
+    stmt = keyset_page(
+        select(*schema_columns(SecurityIncident, SecurityIncidentResponse)).where(SecurityIncident.police_id == police_id),
+        SecurityIncident, cursor, limit
+    )
+    if offset:
+        stmt = stmt.offset(offset)
+    incidents = next_cursor(db.execute(stmt).all(), limit, response)
     
     if not incidents:
         raise HTTPException(
@@ -83,11 +166,18 @@ def get_police_incidents(
             detail=f"No security incidents found for police officer with ID {police_id}"
         )
         
-    return incidents  # FastAPI will use the Pydantic model to serialize the response
+    # The response model documents the shape; the rows are encoded without validating them
+    return RowsJSONResponse(incidents, headers=response.headers)
 
 @router.get("/security_incident/police/{police_id}/analysis")
 def analyze_police_incidents(
     police_id: int,
+    format: Optional[str] = Query(None, pattern=FORMAT_PATTERN),
+    view: Optional[str] = Query(None, pattern="^(incidents|distribution)$"),
+    dpi: Optional[int] = Query(None, ge=MIN_DPI, le=settings.CHART_MAX_DPI),
+    size: Optional[str] = Query(None, pattern=SIZE_PATTERN),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """
@@ -96,135 +186,62 @@ def analyze_police_incidents(
     
     Parameters:
     - police_id: The ID of the police officer
+    - format: "json", "vega", "svg" or "png"; when omitted it is negotiated from the Accept
+      header (PNG by default)
+    - view: Image only. "incidents" (one bar per incident) or "distribution" (histogram and
+      ECDF); by default incidents up to POLICE_CHART_MAX_BARS incidents, distribution above
+    - dpi / size: Image only. Resolution and size in inches ("16x10"), capped by
+      CHART_MAX_DPI, CHART_MAX_INCHES and CHART_MAX_PIXELS
     
     Returns:
-    - Dict with analysis results including:
-        - summary statistics
-        - attention time average
-        - incident details
-        - URL to the generated image
-        - The generated image directly in the browser
+    - json: summary_statistics, the incidents (id, attention time, vector) and vector_analysis
+    - vega: A Vega-Lite specification of the same charts with the data inline
+    - svg / png: The generated chart image
+
+    JSON and Vega-Lite are computed without rendering (no Matplotlib). The image is cached by a fingerprint of the officer's incidents (count and latest
+    updated_at) and served with an ETag; If-None-Match requests get 304 Not Modified.
+    The queries share a QUERY_BUDGET_POLICE_ANALYSIS_MS budget: past it they are cancelled
+    and the response is 504 Gateway Timeout.
     """
-    # Query all incidents for this police officer (NO LIMIT for analysis)
-    incidents = db.query(SecurityIncident)\
-                  .filter(SecurityIncident.police_id == police_id)\
-                  .all()
+    chart_format = negotiate(format, accept)
+    with query_deadline(db, settings.QUERY_BUDGET_POLICE_ANALYSIS_MS) as deadline:
+        # Fingerprint the officer's incidents to reuse a previous render of the same data
+        total_incidents, last_updated_at = db.execute(police_fingerprint_query(police_id)).one()
+        if not total_incidents:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"No security incidents found for police officer with ID {police_id}"
+            )
+        render_options = ()
+        if chart_format not in DATA_FORMATS:
+            # The image depends on the view and its size too
+            view = police_chart_view(view, total_incidents)
+            dpi, figsize = chart_size(dpi, size, POLICE_CHART_FIGSIZE)
+            render_options = (view, dpi, *figsize)
+        cache_key = render_cache.key(
+            "police_analysis", chart_format, police_id, total_incidents, last_updated_at, *render_options
+        )
+        cached_response = render_cache.response(cache_key, if_none_match, chart_format)
+        if cached_response is not None:
+            return cached_response
+
+        # Load only the columns the analysis needs, as arrays (NO LIMIT for analysis)
+        deadline.refresh()
+        incident_columns = police_incident_columns(db, police_id)
     
-    if not incidents:
+    if not len(incident_columns["incident_id"]):
         raise HTTPException(
             status_code=404, 
             detail=f"No security incidents found for police officer with ID {police_id}"
         )
+    payload = police_chart_payload(incident_columns, police_id)
+    if chart_format in DATA_FORMATS:
+        document = police_analysis_document(chart_format, incident_columns, payload)
+        return document_response(chart_format, document, render_cache.headers(cache_key))
     
-    # Create DataFrame from incidents
-    incidents_data = []
-    for incident in incidents:
-        incidents_data.append({
-            "incident_id": incident.id,
-            "police_id": incident.police_id,
-            "status_id": incident.status_id,
-            "vector_id": incident.vector_id,
-            "zone_id": incident.zone_id,
-            "attention_time": incident.atention_time
-        })
-    
-    df = pd.DataFrame(incidents_data)
-    
-    # Convert "00:00:00" formatted attention_time to seconds
-    def time_to_seconds(time_str):
-        if not time_str or time_str == 'null':
-            return np.nan
-        
-        # Handle various time formats
-        # Format: "HH:MM:SS"
-        time_match = re.match(r'^(\d{1,2}):(\d{1,2}):(\d{1,2})$', str(time_str))
-        if time_match:
-            h, m, s = map(int, time_match.groups())
-            return h * 3600 + m * 60 + s
-        
-        # Format: numeric string (already in seconds/minutes)
-        try:
-            return float(time_str)
-        except (ValueError, TypeError):
-            return np.nan
-    
-    # Apply conversion and handle NaN values
-    df['attention_time_seconds'] = df['attention_time'].apply(time_to_seconds)
-    
-    # Filter valid data for plotting
-    plot_data = df.dropna(subset=['attention_time_seconds'])
-    if plot_data.empty:
-        raise HTTPException(
-            status_code=400,
-            detail="No valid attention time data available for analysis."
-        )
-    
-    # Calculate statistics
-    avg_attention_time_seconds = plot_data['attention_time_seconds'].mean()
-    median_attention_time_seconds = plot_data['attention_time_seconds'].median()
-    
-    # Create output directory for plots
-    output_dir = "./analysis/police_all_incidents"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Generate the plot
-    plt.figure(figsize=(16, 10))
-    
-    # Plot 1: Attention time per incident
-    plt.subplot(2, 1, 1)
-    plt.bar(
-        plot_data['incident_id'].astype(str),
-        plot_data['attention_time_seconds'],
-        color='skyblue',
-        alpha=0.7
-    )
-    plt.axhline(y=avg_attention_time_seconds, color='r', linestyle='-', label=f'Promedio: {avg_attention_time_seconds/60:.2f} minutos')
-    plt.axhline(y=median_attention_time_seconds, color='g', linestyle='--', label=f'Mediana: {median_attention_time_seconds/60:.2f} minutos')
-    plt.title(f"Análisis de Tiempos de Atención para Policía ID {police_id}", fontsize=14)
-    plt.ylabel("Tiempo de Atención (segundos)", fontsize=12)
-    plt.xlabel("ID del Incidente", fontsize=12)
-    plt.xticks(rotation=90, fontsize=8)
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.legend()
-    
-    # Plot 2: Average attention time by vector
-    plt.subplot(2, 1, 2)
-    if 'vector_id' in plot_data.columns and not plot_data['vector_id'].isna().all():
-        plot_data['vector_id'] = plot_data['vector_id'].fillna('Desconocido')
-        vector_analysis = plot_data.groupby('vector_id')['attention_time_seconds'].agg(['mean', 'count']).reset_index()
-        vector_analysis = vector_analysis.sort_values('mean', ascending=False)
-        plt.bar(
-            vector_analysis['vector_id'].astype(str),
-            vector_analysis['mean'],
-            alpha=0.7,
-            color='lightgreen'
-        )
-        plt.title("Tiempo Promedio de Atención por Vector", fontsize=14)
-        plt.ylabel("Tiempo Promedio de Atención (segundos)", fontsize=12)
-        plt.xlabel("ID del Vector", fontsize=12)
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-    else:
-        plt.text(0.5, 0.5, "No hay datos de vector disponibles", ha='center', va='center', fontsize=14)
-        plt.axis('off')
-    
-    plt.tight_layout()
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    plot_filename = f"{output_dir}/police_id_{police_id}_analysis_{timestamp}.png"
-    plt.savefig(plot_filename, dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # Construct the image URL
-    image_url = f"/static/analysis/police_all_incidents/{Path(plot_filename).name}"
-    
-    # Prepare the response
-    response = {
-        "police_id": police_id,
-        "summary_statistics": {
-            "total_incidents": len(df),
-            "average_attention_time_seconds": avg_attention_time_seconds,
-            "median_attention_time_seconds": median_attention_time_seconds
-        },
-        "image_url": image_url
-    }
+    # Render the plot in the chart process pool
+    render_payload = police_render_payload(payload, view, dpi, figsize)
+    image = render_pool.render("police_analysis", render_payload, chart_format)
+    render_cache.put(cache_key, image, chart_format)
     
-    return FileResponse(plot_filename, media_type="image/png")
\ No newline at end of file
+    return render_cache.image_response(cache_key, image, chart_format)
\ No newline at end of file
@@ -0,0 +1,162 @@
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Header, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from config.db import get_async_sessionmaker
+from models.security_incident import SecurityIncident
+from schemas.security_incident import SecurityIncidentResponse
+from services.render_cache import render_cache
+from services import render_pool
+from services.columnar import police_incident_query, police_incident_rows_to_columns
+from services.analysis import (
+    POLICE_CHART_FIGSIZE, police_chart_payload, police_chart_view, police_fingerprint_query, police_render_payload
+)
+from services.chart_formats import (
+    DATA_FORMATS, FORMAT_PATTERN, MIN_DPI, SIZE_PATTERN, chart_size, document_response, negotiate,
+    police_analysis_document
+)
+from services.deadlines import async_query_deadline
+from services.pagination import keyset_page, next_cursor
+from services.responses import RowsJSONResponse, schema_columns
+from settings import settings
+
+"""
+Versión asíncrona (async def + AsyncSession) de las rutas de consulta y análisis de
+security_incident. Se registra en lugar de las síncronas cuando ASYNC_ROUTES está activo.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+router = APIRouter()
+
+# Dependency to get the async database session
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+@router.get("/security_incident/{id}", response_model=SecurityIncidentResponse)
+async def get_security_incident_by_id(id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Regresa toda la información de un security_incident por su ID.
+    
+    Parameters:
+    - id: The ID of the security incident to retrieve
+    
+    Returns:
+    - SecurityIncident: The security incident with the requested ID
+    
+    Raises:
+    - 404 Not Found: If the security incident doesn't exist
+    """
+    security_incident = await db.get(SecurityIncident, id)
+    if not security_incident:
+        raise HTTPException(status_code=404, detail="SecurityIncident record not found")
+    return security_incident
+
+@router.get("/security_incident/police/{police_id}", response_model=List[SecurityIncidentResponse])
+async def get_police_incidents(
+    police_id: int, 
+    response: Response,
+    limit: int = Query(50, ge=1, le=100), 
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Regresa todos los security_incidents asignados a un policía específico (por su police_id).
+    
+    Parameters:
+    - police_id: The ID of the police officer
+    - limit: Maximum number of records to return (default: 50, max: 100)
+    - offset: Number of records to skip (for pagination, deprecated in favor of cursor)
+    - cursor: The X-Next-Cursor header of the previous page
+    
+    Returns:
+    - List[SecurityIncidentResponse]: List of security incidents assigned to the police officer
+    
+    Raises:
+    - 400 Bad Request: If both offset and cursor are given, or the cursor is invalid
+    - 404 Not Found: If no incidents are found for the specified police officer
+    """
+    if cursor is not None and offset:
+        raise HTTPException(status_code=400, detail="Use either offset or cursor, not both")
+
+    stmt = keyset_page(
+        select(*schema_columns(SecurityIncident, SecurityIncidentResponse)).where(SecurityIncident.police_id == police_id),
+        SecurityIncident, cursor, limit
+    )
+    if offset:
+        stmt = stmt.offset(offset)
+    incidents = next_cursor((await db.execute(stmt)).all(), limit, response)
+    
+    if not incidents:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"No security incidents found for police officer with ID {police_id}"
+        )
+        
+    return RowsJSONResponse(incidents, headers=response.headers)
+
+@router.get("/security_incident/police/{police_id}/analysis")
+async def analyze_police_incidents(
+    police_id: int,
+    format: Optional[str] = Query(None, pattern=FORMAT_PATTERN),
+    view: Optional[str] = Query(None, pattern="^(incidents|distribution)$"),
+    dpi: Optional[int] = Query(None, ge=MIN_DPI, le=settings.CHART_MAX_DPI),
+    size: Optional[str] = Query(None, pattern=SIZE_PATTERN),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Regresa la gráfica del análisis de tiempos de atención de un policía (por su police_id).
+
+    Same response as the sync route: JSON, Vega-Lite, SVG or PNG (format or Accept), with an
+    ETag (304 on a matching If-None-Match); view, dpi and size as in the sync route.
+    The DataFrame work runs in the threadpool and the render in the chart process pool.
+    Queries past QUERY_BUDGET_POLICE_ANALYSIS_MS are cancelled with 504.
+    """
+    chart_format = negotiate(format, accept)
+    async with async_query_deadline(db, settings.QUERY_BUDGET_POLICE_ANALYSIS_MS) as deadline:
+        # Fingerprint the officer's incidents to reuse a previous render of the same data
+        total_incidents, last_updated_at = (await db.execute(police_fingerprint_query(police_id))).one()
+        if not total_incidents:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"No security incidents found for police officer with ID {police_id}"
+            )
+        render_options = ()
+        if chart_format not in DATA_FORMATS:
+            # The image depends on the view and its size too
+            view = police_chart_view(view, total_incidents)
+            dpi, figsize = chart_size(dpi, size, POLICE_CHART_FIGSIZE)
+            render_options = (view, dpi, *figsize)
+        cache_key = render_cache.key(
+            "police_analysis", chart_format, police_id, total_incidents, last_updated_at, *render_options
+        )
+        cached_response = render_cache.response(cache_key, if_none_match, chart_format)
+        if cached_response is not None:
+            return cached_response
+
+        # Same query as the sync columnar loader; the rows become arrays in the threadpool
+        await deadline.refresh()
+        in_database = db.get_bind().dialect.name == "postgresql"
+        incident_rows = (await db.execute(police_incident_query(police_id, in_database))).all()
+    if not incident_rows:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"No security incidents found for police officer with ID {police_id}"
+        )
+
+    incident_columns = await run_in_threadpool(police_incident_rows_to_columns, incident_rows, in_database)
+    payload = await run_in_threadpool(police_chart_payload, incident_columns, police_id)
+    if chart_format in DATA_FORMATS:
+        document = await run_in_threadpool(police_analysis_document, chart_format, incident_columns, payload)
+        return document_response(chart_format, document, render_cache.headers(cache_key))
+
+    render_payload = police_render_payload(payload, view, dpi, figsize)
+    image = await render_pool.render_async("police_analysis", render_payload, chart_format)
+    render_cache.put(cache_key, image, chart_format)
+
+    return render_cache.image_response(cache_key, image, chart_format)
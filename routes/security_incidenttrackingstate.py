@@ -1,16 +1,27 @@
-import os
-import pandas as pd
-import requests
-import matplotlib.pyplot as plt
-from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends
+import numpy as np
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from sqlalchemy import select, text, bindparam
 from sqlalchemy.orm import Session
 from config.db import SessionLocal
+from models.security_incident import SecurityIncident
 from models.security_incidenttrackingstate import SecurityIncidentTrackingState
-from schemas.security_incidenttrackingstate import SecurityIncidentTrackingStateResponse  # Import schema
-from typing import List, Dict, Any
-from fastapi.responses import FileResponse
-from settings import settings  # Import settings
+from schemas.security_incidenttrackingstate import SecurityIncidentTrackingStateResponse, StatusDwellResponse, IncidentStatusDurationsResponse  # Import schema
+from typing import List, Dict, Any, Optional
+from sqlalchemy.exc import SQLAlchemyError
+from services.status_registry import status_registry
+from services.render_cache import render_cache
+from services import render_pool
+from services.columnar import tracking_state_columns
+from services.analysis import status_chart_payload, status_time_frame, tracking_states_cache_key, tracking_states_fingerprint_query
+from services.chart_formats import DATA_FORMATS, FORMAT_PATTERN, document_response, negotiate, status_analysis_document
+from services.dwell import POLICE_VIEW_EXCLUDED_STATUS_IDS, segment_dwell, status_distributions
+from services.deadlines import query_deadline
+from services.pagination import keyset_page, next_cursor
+from services.responses import RowsJSONResponse, schema_columns
+from services.export import export_response
+from services.incident_durations import materialized_status_time
+from settings import settings
 
 # Create the router
 router = APIRouter()
@@ -23,255 +34,354 @@ def get_db():
     finally:
         db.close()
 
-BASE_URL = settings.API_URL
+# Time spent in each status of one incident, computed entirely in Postgres: LEAD() gives the
+# start of the next state, the difference is the time spent in the current one (0 for the last).
+# Other databases use status_duration_rows() below.
+STATUS_DURATIONS_SQL = """
+    WITH timeline AS (
+        SELECT status_id,
+               created_at,
+               LEAD(created_at) OVER (ORDER BY created_at) AS next_created_at
+        FROM security_incidenttrackingstate
+        WHERE incident_id = :incident_id {status_filter}
+    )
+    SELECT timeline.status_id,
+           status.name AS status_name,
+           SUM(COALESCE(EXTRACT(EPOCH FROM timeline.next_created_at - timeline.created_at), 0)) AS time_spent_seconds,
+           MIN(timeline.created_at) AS first_seen
+    FROM timeline
+    LEFT JOIN security_statusincident AS status ON status.id = timeline.status_id
+    GROUP BY timeline.status_id, status.name
+    ORDER BY first_seen
+"""
+FULL_STATUS_DURATIONS = text(STATUS_DURATIONS_SQL.format(status_filter=""))
+POLICE_STATUS_DURATIONS = text(
+    STATUS_DURATIONS_SQL.format(status_filter="AND status_id NOT IN :excluded_status_ids")
+).bindparams(bindparam("excluded_status_ids", expanding=True))
+
+def status_duration_rows(db: Session, incident_id: int, view: str) -> List[Dict[str, Any]]:
+    """
+    Equivalente portable de STATUS_DURATIONS_SQL (SQLite no tiene EXTRACT(EPOCH ...)): carga los
+    tracking states del incidente como arrays y suma el tiempo por status con segment_dwell().
 
-@router.get("/incident_tracking_states/{incident_id}", response_model=List[SecurityIncidentTrackingStateResponse])
-def get_tracking_states_by_incident_id(incident_id: int, db: Session = Depends(get_db)):
-    # Query the database for all tracking states with the given incident_id
-    tracking_states = (
-        db.query(SecurityIncidentTrackingState)
-        .filter(SecurityIncidentTrackingState.incident_id == incident_id)
-        .order_by(SecurityIncidentTrackingState.created_at.asc())
-        .all()
+    Returns:
+    - Rows with status_id, status_name, time_spent_seconds and first_seen, ordered by first_seen.
+    """
+    columns = tracking_state_columns(db, incident_id=incident_id)
+    dwell = segment_dwell(
+        columns["incident_id"], columns["status_id"], columns["created_at_ns"],
+        POLICE_VIEW_EXCLUDED_STATUS_IDS if view == "police" else None
     )
-    if not tracking_states:
-        raise HTTPException(status_code=404, detail="No tracking states found for the given incident_id")
-    return tracking_states
+    if not len(dwell["status_id"]):
+        return []
+    try:
+        status_id_name_mapping = status_registry.get_mapping(db)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve status ID to name mapping: {str(e)}")
 
-@router.get("/incident_tracking_states/{incident_id}/analysis_full")
-def analyze_incident_tracking_states(incident_id: int, db: Session = Depends(get_db)):
+    order = np.argsort(dwell["first_seen_ns"], kind="stable")
+    return [
+        {
+            "status_id": status_id,
+            "status_name": status_id_name_mapping.get(status_id),
+            "time_spent_seconds": seconds,
+            "first_seen": datetime.fromtimestamp(first_seen_ns / 1e9, tz=timezone.utc)
+        }
+        for status_id, seconds, first_seen_ns in zip(
+            dwell["status_id"][order].tolist(), dwell["seconds"][order].tolist(), dwell["first_seen_ns"][order].tolist()
+        )
+    ]
+
+@router.get("/incident_tracking_states/export")
+def export_tracking_states(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow|parquet)$"),
+    incident_id: Optional[int] = None,
+    police_id: Optional[int] = None,
+    zone_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+):
     """
-    Analyze the time spent in each status for a specific incident and generate a plot.
+    Exporta los tracking states que cumplen el filtro como NDJSON, CSV, Arrow o Parquet, en streaming
+    (cursor del lado del servidor, sin límite de renglones).
 
     Parameters:
-    - incident_id: The ID of the incident to analyze.
+    - format: "ndjson" (one JSON object per line), "csv" (with header), "arrow" (Arrow IPC
+      stream) or "parquet". Arrow and Parquet keep column types and UTC timestamps.
+    - incident_id: Only the states of this incident.
+    - police_id / zone_id: Only the states of incidents of this police officer / zone.
+    - date_from / date_to: Tracking state created_at range (inclusive start, exclusive end).
 
     Returns:
-    - The generated plot image as a response.
+    - Every column of each tracking state, ordered by incident_id, created_at and id.
     """
-    # Query the database for all tracking states with the given incident_id
-    tracking_states = (
-        db.query(SecurityIncidentTrackingState)
-        .filter(SecurityIncidentTrackingState.incident_id == incident_id)
-        .order_by(SecurityIncidentTrackingState.created_at.asc())
-        .all()
+    stmt = select(*SecurityIncidentTrackingState.__table__.columns).order_by(
+        SecurityIncidentTrackingState.incident_id,
+        SecurityIncidentTrackingState.created_at,
+        SecurityIncidentTrackingState.id
     )
-    if not tracking_states:
-        raise HTTPException(status_code=404, detail="No tracking states found for the given incident_id")
+    if incident_id is not None:
+        stmt = stmt.where(SecurityIncidentTrackingState.incident_id == incident_id)
+    if date_from is not None:
+        stmt = stmt.where(SecurityIncidentTrackingState.created_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(SecurityIncidentTrackingState.created_at < date_to)
+    incident_filters = []
+    if police_id is not None:
+        incident_filters.append(SecurityIncident.police_id == police_id)
+    if zone_id is not None:
+        incident_filters.append(SecurityIncident.zone_id == zone_id)
+    if incident_filters:
+        stmt = stmt.join(SecurityIncident, SecurityIncident.id == SecurityIncidentTrackingState.incident_id)\
+                   .where(*incident_filters)
+    return export_response(stmt, format, "incident_tracking_states")
+
+@router.get("/incident_tracking_states/dwell", response_model=StatusDwellResponse)
+def get_fleet_status_dwell(
+    view: str = Query("full", pattern="^(full|police)$"),
+    zone_id: Optional[int] = None,
+    police_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Distribución del tiempo que pasan los incidentes en cada status, para todos los
+    incidentes que cumplen el filtro (zona, policía y rango de fechas de creación).
 
-    # Extract relevant data
-    data = [{"status_id": ts.status_id, "created_at": ts.created_at} for ts in tracking_states]
-    df = pd.DataFrame(data)
+    Parameters:
+    - view: "full" uses every status; "police" excludes statuses 1, 6 and 10 like /analysis.
+    - zone_id: Only incidents of this zone.
+    - police_id: Only incidents assigned to this police officer.
+    - date_from / date_to: Incident created_at range (inclusive start, exclusive end).
 
-    # Ensure the DataFrame is not empty
-    if df.empty:
-        raise HTTPException(status_code=400, detail="No valid data available for analysis.")
+    Returns:
+    - StatusDwellResponse: Per-status incident count, total/mean/median/p90/max seconds and share of time.
+    """
+    # One sorted query for every tracking state of the selected incidents
+    stmt = select(
+        SecurityIncidentTrackingState.incident_id,
+        SecurityIncidentTrackingState.status_id,
+        SecurityIncidentTrackingState.created_at.label("created_at_ns")
+    ).where(SecurityIncidentTrackingState.incident_id.isnot(None))
+    incident_filters = []
+    if zone_id is not None:
+        incident_filters.append(SecurityIncident.zone_id == zone_id)
+    if police_id is not None:
+        incident_filters.append(SecurityIncident.police_id == police_id)
+    if date_from is not None:
+        incident_filters.append(SecurityIncident.created_at >= date_from)
+    if date_to is not None:
+        incident_filters.append(SecurityIncident.created_at < date_to)
+    if incident_filters:
+        stmt = stmt.join(SecurityIncident, SecurityIncident.id == SecurityIncidentTrackingState.incident_id)\
+                   .where(*incident_filters)
+
+    with query_deadline(db, settings.QUERY_BUDGET_FLEET_DWELL_MS):
+        state_columns = tracking_state_columns(db, stmt)
+    if not len(state_columns["incident_id"]):
+        raise HTTPException(status_code=404, detail="No tracking states found for the given filters")
+
+    dwell = segment_dwell(
+        state_columns["incident_id"],
+        state_columns["status_id"],
+        state_columns["created_at_ns"],
+        POLICE_VIEW_EXCLUDED_STATUS_IDS if view == "police" else None
+    )
 
-    # Convert created_at to datetime and normalize timezone
-    df['created_at'] = pd.to_datetime(df['created_at'], utc=True)  # Ensure all timestamps are UTC
-    df['created_at'] = df['created_at'].dt.tz_localize(None)  # Remove timezone information
-    df = df.sort_values(by='created_at')
+    try:
+        status_id_name_mapping = status_registry.get_mapping(db)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve status ID to name mapping: {str(e)}")
 
-    # Calculate time spent in each status
-    df['time_spent'] = df['created_at'].shift(-1) - df['created_at']
-    df['time_spent'] = df['time_spent'].dt.total_seconds().fillna(0)  # Convert timedelta to seconds
+    return {
+        "view": view,
+        "incidents": len(np.unique(dwell["incident_id"])),
+        "tracking_states": len(state_columns["incident_id"]),
+        "statuses": status_distributions(dwell, status_id_name_mapping)
+    }
 
-    # Group by status_id and calculate total time spent
-    status_time = df.groupby('status_id', as_index=False).agg({
-        'time_spent': 'sum',
-        'created_at': 'min'  # Keep the earliest created_at for sorting
-    })
+@router.get("/incident_tracking_states/{incident_id}", response_model=List[SecurityIncidentTrackingStateResponse])
+def get_tracking_states_by_incident_id(
+    incident_id: int,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Regresa los tracking states de un incidente en orden cronológico.
 
-    # Calculate percentages and convert time to minutes
-    total_time = status_time['time_spent'].sum()
-    status_time['percentage'] = (status_time['time_spent'] / total_time) * 100
-    status_time['time_spent_minutes'] = status_time['time_spent'] / 60  # Convert time to minutes
+    Without limit every state is returned. With limit the states come in pages of that size;
+    the X-Next-Cursor header has the cursor to pass for the next page. Rows are selected
+    with Core and encoded straight to JSON (no per-row validation).
+    """
+    stmt = select(*schema_columns(SecurityIncidentTrackingState, SecurityIncidentTrackingStateResponse))\
+        .where(SecurityIncidentTrackingState.incident_id == incident_id)
+    if limit is None:
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="cursor requires limit")
+        stmt = stmt.order_by(SecurityIncidentTrackingState.created_at.asc(), SecurityIncidentTrackingState.id.asc())
+        tracking_states = db.execute(stmt).all()
+    else:
+        stmt = keyset_page(stmt, SecurityIncidentTrackingState, cursor, limit, descending=False)
+        tracking_states = next_cursor(db.execute(stmt).all(), limit, response)
+    if not tracking_states:
+        raise HTTPException(status_code=404, detail="No tracking states found for the given incident_id")
+    return RowsJSONResponse(tracking_states, headers=response.headers)
+
+@router.get("/incident_tracking_states/{incident_id}/durations", response_model=IncidentStatusDurationsResponse)
+def get_incident_status_durations(
+    incident_id: int,
+    view: str = Query("full", pattern="^(full|police)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Regresa el tiempo transcurrido en cada status de un incidente como JSON (sin gráfica).
 
-    # Sort by the earliest created_at to ensure the order is based on the first occurrence
-    status_time = status_time.sort_values(by='created_at', ascending=True).reset_index(drop=True)
+    Same numbers as /analysis_full (view=full) and /analysis (view=police), computed by a
+    single window-function query in Postgres and with segment_dwell() on other databases.
 
-    # Map status_id to status_name
-    try:
-        # Fetch the mapping from the API
-        mapping_response = requests.get(f"{BASE_URL}/status_incidents")
-        mapping_response.raise_for_status()
-        status_id_name_mapping = mapping_response.json()
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Failed to retrieve status ID to name mapping: {str(e)}")
+    Parameters:
+    - incident_id: The ID of the incident to analyze.
+    - view: "full" for every status, "police" to exclude statuses 1, 6 and 10.
 
-    # Ensure the mapping is obtained
-    status_time['status_id'] = status_time['status_id'].astype(str)  # Convert to string
-    status_id_name_mapping = {str(k): v for k, v in status_id_name_mapping.items()}  # Convert keys to string
+    Returns:
+    - IncidentStatusDurationsResponse: Seconds, minutes and percentage per status, in order of first occurrence.
+    """
+    with query_deadline(db, settings.QUERY_BUDGET_INCIDENT_ANALYSIS_MS):
+        if db.get_bind().dialect.name == "postgresql":
+            if view == "police":
+                result = db.execute(POLICE_STATUS_DURATIONS, {
+                    "incident_id": incident_id,
+                    "excluded_status_ids": list(POLICE_VIEW_EXCLUDED_STATUS_IDS)
+                })
+            else:
+                result = db.execute(FULL_STATUS_DURATIONS, {"incident_id": incident_id})
+            rows = result.mappings().all()
+        else:
+            rows = status_duration_rows(db, incident_id, view)
+    if not rows:
+        raise HTTPException(status_code=404, detail="No tracking states found for the given incident_id")
 
-    # Replace status_id with status_name
-    status_time['status_name'] = status_time['status_id'].map(status_id_name_mapping)
+    total_seconds = float(sum(row["time_spent_seconds"] for row in rows))
+    statuses = [
+        {
+            "status_id": row["status_id"],
+            "status_name": row["status_name"],
+            "time_spent_seconds": float(row["time_spent_seconds"]),
+            "time_spent_minutes": float(row["time_spent_seconds"]) / 60,
+            "percentage": float(row["time_spent_seconds"]) / total_seconds * 100 if total_seconds else 0.0,
+            "first_seen": row["first_seen"]
+        }
+        for row in rows
+    ]
+    return {"incident_id": incident_id, "view": view, "total_seconds": total_seconds, "statuses": statuses}
 
-    # Generate the plot
-    plt.figure(figsize=(12, 8))
-    plt.barh(
-        y=status_time['status_name'],  # Use status_name for labels
-        width=status_time['percentage'],
-        color=plt.cm.tab20.colors[:len(status_time)],
-        edgecolor="black"
-    )
-    plt.title(f"Distribución (FULL) de Tiempo por Status del Incidente {incident_id}", fontsize=14)
-    plt.xlabel("Porcentaje de Tiempo Total (%)", fontsize=12)
-    plt.ylabel("Status", fontsize=12)
-
-    # Add labels to the bars
-    for i, row in status_time.iterrows():
-        # Add percentage label
-        plt.text(
-            row['percentage'] / 2,
-            i,
-            f"{row['percentage']:.1f}%",
-            ha="center",
-            va="center",
-            fontsize=10,
-            color="white",
-            weight="bold"
-        )
-        # Add time in minutes label
-        plt.text(
-            row['percentage'] + 1,  # Position slightly to the right of the bar
-            i,
-            f"{row['time_spent_minutes']:.1f} min",
-            ha="left",
-            va="center",
-            fontsize=10,
-            color="black"
-        )
+@router.get("/incident_tracking_states/{incident_id}/analysis_full")
+def analyze_incident_tracking_states_full(
+    incident_id: int,
+    format: Optional[str] = Query(None, pattern=FORMAT_PATTERN),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Analyze the time spent in each status for a specific incident and generate a plot.
 
-    # Save the plot
-    output_dir = "./analysis/incident_all_states"
-    os.makedirs(output_dir, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    plot_filename = f"{output_dir}/incident_{incident_id}_status_analysis_full_{timestamp}.png"
-    plt.savefig(plot_filename, dpi=300, bbox_inches="tight")
-    plt.close()
+    Parameters:
+    - incident_id: The ID of the incident to analyze.
+    - format: "json", "vega", "svg" or "png"; when omitted it is negotiated from the Accept
+      header (PNG by default).
 
-    # Return the plot image as a response
-    return FileResponse(plot_filename, media_type="image/png")
+    Returns:
+    - The time per status as data (json), a Vega-Lite specification (vega) or the plot image
+      (svg, png), with an ETag (304 on a matching If-None-Match).
+    """
+    return render_status_analysis(
+        db, incident_id, negotiate(format, accept), if_none_match,
+        variant="incident_status_analysis_full",
+        title=f"Distribución (FULL) de Tiempo por Status del Incidente {incident_id}",
+        view="full"
+    )
 
 @router.get("/incident_tracking_states/{incident_id}/analysis")
-def analyze_incident_tracking_states(incident_id: int, db: Session = Depends(get_db)):
+def analyze_incident_tracking_states(
+    incident_id: int,
+    format: Optional[str] = Query(None, pattern=FORMAT_PATTERN),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
     """
     Analyze the time spent in each status for a specific incident and generate a plot.
+    Only the statuses seen by the police officer are included (1, 6 and 10 are excluded).
 
     Parameters:
     - incident_id: The ID of the incident to analyze.
+    - format: "json", "vega", "svg" or "png"; when omitted it is negotiated from the Accept
+      header (PNG by default).
 
     Returns:
-    - The generated plot image as a response.
+    - The time per status as data (json), a Vega-Lite specification (vega) or the plot image
+      (svg, png), with an ETag (304 on a matching If-None-Match).
     """
-    # Query the database for all tracking states with the given incident_id
-    tracking_states = (
-        db.query(SecurityIncidentTrackingState)
-        .filter(SecurityIncidentTrackingState.incident_id == incident_id)
-        .order_by(SecurityIncidentTrackingState.created_at.asc())
-        .all()
+    return render_status_analysis(
+        db, incident_id, negotiate(format, accept), if_none_match,
+        variant="incident_status_analysis",
+        title=f"Distribución de Tiempo por Status del Incidente {incident_id}",
+        view="police",
+        excluded_status_ids=POLICE_VIEW_EXCLUDED_STATUS_IDS
     )
-    if not tracking_states:
-        raise HTTPException(status_code=404, detail="No tracking states found for the given incident_id")
-
-    # Extract relevant data
-    data = [{"status_id": ts.status_id, "created_at": ts.created_at} for ts in tracking_states]
-    df = pd.DataFrame(data)
-
-    # Ensure the DataFrame is not empty
-    if df.empty:
-        raise HTTPException(status_code=400, detail="No valid data available for analysis.")
 
-    # Exclude specific status_id values (1, 6, and 10)
-    excluded_status_ids = [1, 6, 10]
-    df = df[~df['status_id'].isin(excluded_status_ids)]
-
-    # Ensure the DataFrame is not empty after filtering
-    if df.empty:
-        raise HTTPException(status_code=400, detail="No valid data available for analysis after filtering excluded statuses.")
-
-    # Convert created_at to datetime and normalize timezone
-    df['created_at'] = pd.to_datetime(df['created_at'], utc=True)  # Ensure all timestamps are UTC
-    df['created_at'] = df['created_at'].dt.tz_localize(None)  # Remove timezone information
-    df = df.sort_values(by='created_at')
-
-    # Calculate time spent in each status
-    df['time_spent'] = df['created_at'].shift(-1) - df['created_at']
-    df['time_spent'] = df['time_spent'].dt.total_seconds().fillna(0)  # Convert timedelta to seconds
-
-    # Group by status_id and calculate total time spent
-    status_time = df.groupby('status_id', as_index=False).agg({
-        'time_spent': 'sum',
-        'created_at': 'min'  # Keep the earliest created_at for sorting
-    })
-
-    # Calculate percentages and convert time to minutes
-    total_time = status_time['time_spent'].sum()
-    status_time['percentage'] = (status_time['time_spent'] / total_time) * 100
-    status_time['time_spent_minutes'] = status_time['time_spent'] / 60  # Convert time to minutes
-
-    # Sort by the earliest created_at to ensure the order is based on the first occurrence
-    status_time = status_time.sort_values(by='created_at', ascending=True).reset_index(drop=True)
-
-    # Map status_id to status_name
-    try:
-        # Fetch the mapping from the API
-        mapping_response = requests.get(f"{BASE_URL}/status_incidents")
-        mapping_response.raise_for_status()
-        status_id_name_mapping = mapping_response.json()
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Failed to retrieve status ID to name mapping: {str(e)}")
-
-    # Ensure the mapping is obtained
-    status_time['status_id'] = status_time['status_id'].astype(str)  # Convert to string
-    status_id_name_mapping = {str(k): v for k, v in status_id_name_mapping.items()}  # Convert keys to string
-
-    # Replace status_id with status_name
-    status_time['status_name'] = status_time['status_id'].map(status_id_name_mapping)
-
-    # Generate the plot
-    plt.figure(figsize=(12, 8))
-    plt.barh(
-        y=status_time['status_name'],  # Use status_name for labels
-        width=status_time['percentage'],
-        color=plt.cm.tab20.colors[:len(status_time)],
-        edgecolor="black"
-    )
-    plt.title(f"Distribución de Tiempo por Status del Incidente {incident_id}", fontsize=14)
-    plt.xlabel("Porcentaje de Tiempo Total (%)", fontsize=12)
-    plt.ylabel("Status", fontsize=12)
-
-    # Add labels to the bars
-    for i, row in status_time.iterrows():
-        # Add percentage label
-        plt.text(
-            row['percentage'] / 2,
-            i,
-            f"{row['percentage']:.1f}%",
-            ha="center",
-            va="center",
-            fontsize=10,
-            color="white",
-            weight="bold"
-        )
-        # Add time in minutes label
-        plt.text(
-            row['percentage'] + 1,  # Position slightly to the right of the bar
-            i,
-            f"{row['time_spent_minutes']:.1f} min",
-            ha="left",
-            va="center",
-            fontsize=10,
-            color="black"
-        )
+def render_status_analysis(
+    db: Session,
+    incident_id: int,
+    chart_format: str,
+    if_none_match: Optional[str],
+    variant: str,
+    title: str,
+    view: str,
+    excluded_status_ids: Optional[tuple] = None
+):
+    """
+    Genera (o toma de la cache) la gráfica de tiempo por status de un incidente, o sus datos
+    (JSON / Vega-Lite, sin renderizar) según chart_format. Las consultas comparten el presupuesto QUERY_BUDGET_INCIDENT_ANALYSIS_MS (504 si se excede).
 
-    # Save the plot
-    output_dir = "./analysis/incident_all_states"
-    os.makedirs(output_dir, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    plot_filename = f"{output_dir}/incident_{incident_id}_status_analysis_{timestamp}.png"
-    plt.savefig(plot_filename, dpi=300, bbox_inches="tight")
-    plt.close()
+    The times come from the materialized durations (services/incident_durations.py) when they
+    are up to date for the incident, and are computed from its tracking states otherwise.
+    """
+    with query_deadline(db, settings.QUERY_BUDGET_INCIDENT_ANALYSIS_MS) as deadline:
+        fingerprint = db.execute(tracking_states_fingerprint_query(incident_id)).one()
+        try:
+            # Read the mapping from the in-process registry (no HTTP round trip to this API)
+            status_id_name_mapping = status_registry.get_mapping(db)
+        except SQLAlchemyError as e:
+            raise HTTPException(status_code=500, detail=f"Failed to retrieve status ID to name mapping: {str(e)}")
+        cache_key = tracking_states_cache_key(fingerprint, status_id_name_mapping, incident_id, f"{variant}.{chart_format}")
+        total_states, last_updated_at, last_id = fingerprint
+        cached_response = render_cache.response(cache_key, if_none_match, chart_format)
+        if cached_response is not None:
+            return cached_response
+
+        status_time = materialized_status_time(db, incident_id, view, total_states, last_updated_at, last_id)
+        if status_time is None:
+            # Load status_id and created_at of every tracking state of the incident as arrays
+            deadline.refresh()
+            state_columns = tracking_state_columns(db, incident_id=incident_id)
+    if status_time is None:
+        if not len(state_columns["status_id"]):
+            raise HTTPException(status_code=404, detail="No tracking states found for the given incident_id")
+        status_time = status_time_frame(state_columns, excluded_status_ids)
+
+    payload = status_chart_payload(status_time, status_id_name_mapping, title)
+    if chart_format in DATA_FORMATS:
+        document = status_analysis_document(chart_format, incident_id, view, payload)
+        return document_response(chart_format, document, render_cache.headers(cache_key))
+
+    # Render the plot in the chart process pool
+    image = render_pool.render("incident_status_analysis", payload, chart_format)
+    render_cache.put(cache_key, image, chart_format)
 
     # Return the plot image as a response
-    return FileResponse(plot_filename, media_type="image/png")
\ No newline at end of file
+    return render_cache.image_response(cache_key, image, chart_format)
@@ -0,0 +1,153 @@
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from config.db import get_async_sessionmaker
+from models.security_incidenttrackingstate import SecurityIncidentTrackingState
+from schemas.security_incidenttrackingstate import SecurityIncidentTrackingStateResponse
+from services.status_registry import status_registry
+from services.render_cache import render_cache
+from services import render_pool
+from services.columnar import TRACKING_STATE_SPECS, rows_to_columns, tracking_state_query
+from services.analysis import status_chart_payload, status_time_frame, tracking_states_cache_key, tracking_states_fingerprint_query
+from services.chart_formats import DATA_FORMATS, FORMAT_PATTERN, document_response, negotiate, status_analysis_document
+from services.dwell import POLICE_VIEW_EXCLUDED_STATUS_IDS
+from services.deadlines import async_query_deadline
+from services.pagination import keyset_page, next_cursor
+from services.responses import RowsJSONResponse, schema_columns
+from services.incident_durations import materialized_status_frame, materialized_status_rows
+from settings import settings
+
+"""
+Versión asíncrona (async def + AsyncSession) de las rutas de consulta y análisis de
+tracking states. Se registra en lugar de las síncronas cuando ASYNC_ROUTES está activo.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+router = APIRouter()
+
+# Dependency to get the async database session
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+@router.get("/incident_tracking_states/{incident_id}", response_model=List[SecurityIncidentTrackingStateResponse])
+async def get_tracking_states_by_incident_id(
+    incident_id: int,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Regresa los tracking states de un incidente en orden cronológico (paginados con limit/cursor).
+    """
+    stmt = select(*schema_columns(SecurityIncidentTrackingState, SecurityIncidentTrackingStateResponse))\
+        .where(SecurityIncidentTrackingState.incident_id == incident_id)
+    if limit is None:
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="cursor requires limit")
+        stmt = stmt.order_by(SecurityIncidentTrackingState.created_at.asc(), SecurityIncidentTrackingState.id.asc())
+        tracking_states = (await db.execute(stmt)).all()
+    else:
+        stmt = keyset_page(stmt, SecurityIncidentTrackingState, cursor, limit, descending=False)
+        tracking_states = next_cursor((await db.execute(stmt)).all(), limit, response)
+    if not tracking_states:
+        raise HTTPException(status_code=404, detail="No tracking states found for the given incident_id")
+    return RowsJSONResponse(tracking_states, headers=response.headers)
+
+@router.get("/incident_tracking_states/{incident_id}/analysis_full")
+async def analyze_incident_tracking_states_full(
+    incident_id: int,
+    format: Optional[str] = Query(None, pattern=FORMAT_PATTERN),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Analyze the time spent in each status for a specific incident and generate a plot.
+    Same formats as the sync route: format=json|vega|svg|png or the Accept header.
+    """
+    return await render_status_analysis(
+        db, incident_id, negotiate(format, accept), if_none_match,
+        variant="incident_status_analysis_full",
+        title=f"Distribución (FULL) de Tiempo por Status del Incidente {incident_id}",
+        view="full"
+    )
+
+@router.get("/incident_tracking_states/{incident_id}/analysis")
+async def analyze_incident_tracking_states(
+    incident_id: int,
+    format: Optional[str] = Query(None, pattern=FORMAT_PATTERN),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Analyze the time spent in each status for a specific incident and generate a plot.
+    Only the statuses seen by the police officer are included (1, 6 and 10 are excluded).
+    """
+    return await render_status_analysis(
+        db, incident_id, negotiate(format, accept), if_none_match,
+        variant="incident_status_analysis",
+        title=f"Distribución de Tiempo por Status del Incidente {incident_id}",
+        view="police",
+        excluded_status_ids=POLICE_VIEW_EXCLUDED_STATUS_IDS
+    )
+
+async def render_status_analysis(
+    db: AsyncSession,
+    incident_id: int,
+    chart_format: str,
+    if_none_match: Optional[str],
+    variant: str,
+    title: str,
+    view: str,
+    excluded_status_ids: Optional[tuple] = None
+):
+    """
+    Genera (o toma de la cache) la gráfica de tiempo por status de un incidente, o sus datos
+    (JSON / Vega-Lite, sin renderizar) según chart_format. Las consultas comparten el presupuesto QUERY_BUDGET_INCIDENT_ANALYSIS_MS (504 si se excede).
+    """
+    async with async_query_deadline(db, settings.QUERY_BUDGET_INCIDENT_ANALYSIS_MS) as deadline:
+        fingerprint = (await db.execute(tracking_states_fingerprint_query(incident_id))).one()
+        try:
+            # The registry answers from memory; a reload uses its own sync session in the threadpool
+            status_id_name_mapping = await run_in_threadpool(status_registry.get_mapping)
+        except SQLAlchemyError as e:
+            raise HTTPException(status_code=500, detail=f"Failed to retrieve status ID to name mapping: {str(e)}")
+
+        cache_key = tracking_states_cache_key(fingerprint, status_id_name_mapping, incident_id, f"{variant}.{chart_format}")
+        total_states, last_updated_at, last_id = fingerprint
+        cached_response = render_cache.response(cache_key, if_none_match, chart_format)
+        if cached_response is not None:
+            return cached_response
+
+        # Materialized durations when up to date (services/incident_durations.py), else the states.
+        # Only the queries run on the event loop; arrays and DataFrames are built in the threadpool.
+        materialized_rows = await db.run_sync(
+            lambda session: materialized_status_rows(session, incident_id, view, total_states, last_updated_at, last_id)
+        )
+        if materialized_rows is None:
+            await deadline.refresh()
+            state_rows = (await db.execute(tracking_state_query(incident_id=incident_id))).all()
+    if materialized_rows is not None:
+        status_time = await run_in_threadpool(materialized_status_frame, materialized_rows)
+    else:
+        if not state_rows:
+            raise HTTPException(status_code=404, detail="No tracking states found for the given incident_id")
+        state_columns = await run_in_threadpool(rows_to_columns, state_rows, TRACKING_STATE_SPECS)
+        status_time = await run_in_threadpool(status_time_frame, state_columns, excluded_status_ids)
+
+    payload = await run_in_threadpool(status_chart_payload, status_time, status_id_name_mapping, title)
+    if chart_format in DATA_FORMATS:
+        document = await run_in_threadpool(status_analysis_document, chart_format, incident_id, view, payload)
+        return document_response(chart_format, document, render_cache.headers(cache_key))
+
+    image = await render_pool.render_async("incident_status_analysis", payload, chart_format)
+    render_cache.put(cache_key, image, chart_format)
+
+    return render_cache.image_response(cache_key, image, chart_format)
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session, joinedload
-from config.db import engine
-from models.security_police import SecurityPolice
-from sqlalchemy.orm import sessionmaker
-from schemas.security_police import SecurityPoliceResponse
-
-# Create a session
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from sqlalchemy.orm import Session
+from config.db import SessionLocal
+from schemas.security_police import SecurityPoliceResponse, PoliceAttentionSummaryResponse, SummaryRefreshResponse, PoliceLeaderboardResponse
+from services import police_summary
+from services.leaderboard import police_leaderboard
+from services.deadlines import query_deadline
+from services.police_roster import police_roster
+from services.responses import RecordsJSONResponse
+from settings import settings
 
 router = APIRouter()
 
@@ -18,48 +21,124 @@ def get_db():
     finally:
         db.close()
 
+@router.get("/security_police/leaderboard", response_model=PoliceLeaderboardResponse)
+def get_police_leaderboard(
+    zone_id: Optional[int] = None,
+    vector_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    sort_by: str = Query("p90", pattern="^(p50|p90|mean|count)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(20, ge=1, le=1000),
+    min_incidents: int = Query(1, ge=1),
+    db: Session = Depends(get_db)
+):
+    """
+    Ranking de policías por tiempo de atención: conteo, promedio, p50 y p90 de cada uno,
+    calculados para todos los policías en una sola consulta agrupada (services/leaderboard.py).
+
+    Parameters:
+    - zone_id / vector_id: Only incidents of this zone / vector.
+    - date_from / date_to: Incident created_at range (inclusive start, exclusive end).
+    - sort_by: "p50", "p90", "mean" or "count".
+    - order: "desc" (slowest first) or "asc".
+    - limit: Number of officers returned (top-k).
+    - min_incidents: Minimum valid attention times for an officer to be ranked.
+
+    Returns:
+    - PoliceLeaderboardResponse: Ranked officers and how many qualified in total.
+    """
+    with query_deadline(db, settings.QUERY_BUDGET_LEADERBOARD_MS):
+        return police_leaderboard(
+            db, zone_id=zone_id, vector_id=vector_id, date_from=date_from, date_to=date_to,
+            sort_by=sort_by, descending=order == "desc", limit=limit, min_incidents=min_incidents
+        )
+
+@router.get("/security_police", response_model=List[SecurityPoliceResponse])
+def get_security_police_batch(
+    response: Response,
+    ids: Optional[List[str]] = Query(None, description="Officer ids, comma separated and/or repeated"),
+    zone_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Varios policías en una sola petición, con el nombre de su zona, servidos del roster en
+    memoria (services/police_roster.py).
+
+    Parameters:
+    - ids: Officers to return, in the order given (?ids=1,2,3 or ?ids=1&ids=2).
+    - zone_id: Only officers assigned to this zone; alone, every officer of the zone by id.
+
+    Returns:
+    - List[SecurityPoliceResponse]: The officers found. Requested ids that do not exist are
+      listed in the X-Missing-Ids header.
+
+    Raises:
+    - 400 Bad Request: Without ids nor zone_id, with an invalid id or with more than
+      POLICE_BATCH_MAX_IDS ids.
+    """
+    police_ids = None
+    if ids:
+        try:
+            police_ids = [int(value) for entry in ids for value in entry.split(",") if value.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be integers")
+    if not police_ids and zone_id is None:
+        raise HTTPException(status_code=400, detail="Provide ids and/or zone_id")
+    if police_ids and len(police_ids) > settings.POLICE_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.POLICE_BATCH_MAX_IDS} ids per request")
+
+    officers, missing_ids = police_roster.get_many(police_ids or None, zone_id=zone_id, db=db)
+    if missing_ids:
+        response.headers["X-Missing-Ids"] = ",".join(str(police_id) for police_id in missing_ids)
+    return RecordsJSONResponse(officers, headers=response.headers)
+
+@router.get("/security_police/roster/stats", response_model=Dict[str, Any])
+def get_police_roster_stats():
+    """
+    Regresa los contadores del roster de policías (hits, refrescos, recargas, marcas de updated_at y edad).
+    """
+    return police_roster.stats()
+
+@router.post("/security_police/roster/invalidate", response_model=Dict[str, Any])
+def invalidate_police_roster():
+    """
+    Invalida el roster de policías; la siguiente consulta lo recarga completo de la base de datos.
+    """
+    police_roster.invalidate()
+    return police_roster.stats()
+
 @router.get("/security_police/{id}", response_model=SecurityPoliceResponse)
 def get_security_police_by_id(id: int, db: Session = Depends(get_db)):
-    # Query the database for the record with the given id
-    security_police = (
-        db.query(SecurityPolice)
-        .options(joinedload(SecurityPolice.zone))  # Eagerly load the zone relationship
-        .filter(SecurityPolice.id == id)
-        .first()
-    )
+    """
+    Un policía con el nombre de su zona, servido del roster en memoria (services/police_roster.py).
+    """
+    security_police = police_roster.get(id, db=db)
     if not security_police:
         raise HTTPException(status_code=404, detail="SecurityPolice record not found")
-    
-    # Extract the zone name
-    zone_name = security_police.zone.name if security_police.zone else None
-
-    # Return the response with the zone_name field
-    return {
-        "id": security_police.id,
-        "created_at": security_police.created_at,
-        "updated_at": security_police.updated_at,
-        "position_id": security_police.position_id,
-        "license_plate": security_police.license_plate,
-        "point": security_police.point,
-        "profile_id": security_police.profile_id,
-        "status_id": security_police.status_id,
-        "supervisor_id": security_police.supervisor_id,
-        "vector_id": security_police.vector_id,
-        "is_outside": security_police.is_outside,
-        "armament_id": security_police.armament_id,
-        "bulletprof_vest_id": security_police.bulletprof_vest_id,
-        "device_id": security_police.device_id,
-        "is_supervisor": security_police.is_supervisor,
-        "radio_id": security_police.radio_id,
-        "turn_id": security_police.turn_id,
-        "vehicle_id": security_police.vehicle_id,
-        "zone_name": zone_name,  # Include only the zone name
-        "status_staff_id": security_police.status_staff_id,
-        "is_chief": security_police.is_chief,
-        "is_sergeant": security_police.is_sergeant,
-        "grade": security_police.grade,
-        "grouping_id": security_police.grouping_id,
-        "is_assignable": security_police.is_assignable,
-        "special_group_police_id": security_police.special_group_police_id,
-        "last_tracking_location": security_police.last_tracking_location,
-    }
\ No newline at end of file
+    return security_police
+
+@router.get("/security_police/{id}/summary", response_model=PoliceAttentionSummaryResponse)
+def get_police_attention_summary(id: int, db: Session = Depends(get_db)):
+    """
+    Resumen de tiempos de atención de un policía: número de incidentes, promedio, mediana
+    y p90, en total y por vector.
+
+    Served from the incrementally maintained summary table (services/police_summary.py), so
+    it answers in constant time whatever the number of incidents. It is as fresh as the last
+    refresh (refreshed_at); median and p90 are approximate within relative_accuracy.
+
+    Raises:
+    - 404 Not Found: If the officer has no incidents in the summary.
+    """
+    summary = police_summary.police_summary(db, id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No attention summary found for police officer with ID {id}")
+    return summary
+
+@router.post("/security_police/summary/refresh", response_model=SummaryRefreshResponse)
+def refresh_police_attention_summaries(full: bool = False, db: Session = Depends(get_db)):
+    """
+    Procesa los incidentes modificados desde el último refresco (full=true reconstruye todo).
+    """
+    return police_summary.refresh(db, full=full)
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from config.db import SessionLocal
-from models.security_statusincident import SecurityStatusIncident
-from typing import List, Dict
+from services.responses import CompactORJSONResponse
+from services.status_registry import status_registry
+from sqlalchemy.exc import SQLAlchemyError
+from typing import List, Dict, Any
 from pydantic import BaseModel
 
 # Define the response schema
@@ -33,11 +35,29 @@ def get_status_id_name_mapping(db: Session = Depends(get_db)):
     --------
     Dict[int, str]
         A dictionary where keys are status IDs and values are their names.
+
+    The registry's dict is encoded directly by orjson (integer keys included), without
+    validating it again through the response model.
     """
     try:
-        status_incidents = db.query(SecurityStatusIncident).all()
-        if not status_incidents:
-            raise HTTPException(status_code=404, detail="No status incidents found")
-        return {incident.id: incident.name for incident in status_incidents}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
\ No newline at end of file
+        status_id_name_mapping = status_registry.get_mapping(db)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    if not status_id_name_mapping:
+        raise HTTPException(status_code=404, detail="No status incidents found")
+    return CompactORJSONResponse(status_id_name_mapping)
+
+@router.get("/status_incidents/registry/stats", response_model=Dict[str, Any])
+def get_status_registry_stats():
+    """
+    Regresa los contadores del registro en memoria de status (hits, misses, edad y TTL).
+    """
+    return status_registry.stats()
+
+@router.post("/status_incidents/registry/invalidate", response_model=Dict[str, Any])
+def invalidate_status_registry():
+    """
+    Invalida el registro en memoria de status; la siguiente consulta lo recarga de la base de datos.
+    """
+    status_registry.invalidate()
+    return status_registry.stats()
\ No newline at end of file
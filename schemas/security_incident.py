@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 class SecurityIncidentResponse(BaseModel):
@@ -35,4 +35,13 @@ class SecurityIncidentResponse(BaseModel):
     social_proximity_id: Optional[int] = None
 
     class Config:
-        from_attributes = True  # For SQLAlchemy model compatibility in Pydantic v2
\ No newline at end of file
+        from_attributes = True  # For SQLAlchemy model compatibility in Pydantic v2
+
+class AttentionQuantilesResponse(BaseModel):
+    buckets: int  # (zone, vector, day) histograms merged
+    total_incidents: int
+    valid_incidents: int
+    mean_seconds: Optional[float] = None
+    quantiles: Dict[str, Optional[float]]  # "p50" -> seconds
+    relative_accuracy: float
+    refreshed_at: Optional[datetime] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class SecurityIncidentTrackingStateBase(BaseModel):
@@ -18,4 +18,37 @@ class SecurityIncidentTrackingStateResponse(BaseModel):
     status_id: int
 
     class Config:
-        from_attributes = True  # Pydantic v2 compatibility
\ No newline at end of file
+        from_attributes = True  # Pydantic v2 compatibility
+
+# Fleet-wide time-in-status distributions (GET /incident_tracking_states/dwell)
+class StatusDwellDistribution(BaseModel):
+    status_id: int
+    status_name: Optional[str] = None
+    incidents: int
+    total_seconds: float
+    mean_seconds: float
+    median_seconds: float
+    p90_seconds: float
+    max_seconds: float
+    percentage: float
+
+class StatusDwellResponse(BaseModel):
+    view: str
+    incidents: int
+    tracking_states: int
+    statuses: List[StatusDwellDistribution]
+
+# Time in each status of one incident (GET /incident_tracking_states/{incident_id}/durations)
+class StatusDuration(BaseModel):
+    status_id: Optional[int] = None
+    status_name: Optional[str] = None
+    time_spent_seconds: float
+    time_spent_minutes: float
+    percentage: float
+    first_seen: datetime
+
+class IncidentStatusDurationsResponse(BaseModel):
+    incident_id: int
+    view: str
+    total_seconds: float
+    statuses: List[StatusDuration]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class SecurityPoliceResponse(BaseModel):
@@ -32,4 +32,44 @@ class SecurityPoliceResponse(BaseModel):
     last_tracking_location: Optional[datetime]
 
     class Config:
-        from_attributes = True  # Pydantic v2 compatibility
\ No newline at end of file
+        from_attributes = True  # Pydantic v2 compatibility
+
+class VectorAttentionSummary(BaseModel):
+    vector_id: Optional[int]  # None groups incidents without vector
+    total_incidents: int
+    valid_incidents: int
+    average_seconds: Optional[float]
+    median_seconds: Optional[float]
+    p90_seconds: Optional[float]
+
+class PoliceAttentionSummaryResponse(BaseModel):
+    police_id: int
+    total_incidents: int
+    valid_incidents: int
+    average_seconds: Optional[float]
+    median_seconds: Optional[float]  # Approximate, within relative_accuracy
+    p90_seconds: Optional[float]
+    relative_accuracy: float
+    refreshed_at: Optional[datetime]
+    vectors: List[VectorAttentionSummary]
+
+class SummaryRefreshResponse(BaseModel):
+    incidents_read: int
+    incidents_changed: int
+    batches: int
+    watermark: Optional[datetime]
+    refreshed_at: Optional[datetime]
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    police_id: int
+    total_incidents: int
+    valid_incidents: int
+    mean_seconds: float
+    p50_seconds: float
+    p90_seconds: float
+
+class PoliceLeaderboardResponse(BaseModel):
+    sort_by: str
+    total_officers: int  # Officers that qualified before the top-k cut
+    officers: List[LeaderboardEntry]
@@ -0,0 +1,271 @@
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.sql import Select
+
+from models.security_incident import SecurityIncident
+from models.security_incidenttrackingstate import SecurityIncidentTrackingState
+from services.render_cache import render_cache
+from settings import settings
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+"""
+Pasos de los análisis que no dependen de cómo se consulta la base de datos.
+
+Las rutas síncronas y asíncronas comparten estas funciones: las consultas de huella
+(para la cache de gráficas) se regresan como select() para ejecutarlas con Session o
+AsyncSession, y los cálculos reciben las columnas de services/columnar.py y regresan
+los datos que necesita services/charts.py.
+
+pandas se importa dentro de los cálculos, la primera vez que se pide un análisis, para
+que no cueste en el arranque de cada worker.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+
+# Default size (inches) and points of the ECDF drawn in the distribution view of the police chart
+POLICE_CHART_FIGSIZE = (16, 10)
+ECDF_POINTS = 512
+
+
+def police_fingerprint_query(police_id: int) -> Select:
+    """Número de incidentes y último updated_at de un policía."""
+    return select(
+        func.count(SecurityIncident.id),
+        func.max(SecurityIncident.updated_at)
+    ).where(SecurityIncident.police_id == police_id)
+
+
+def tracking_states_fingerprint_query(incident_id: int) -> Select:
+    """Número de tracking states, último updated_at y último id de un incidente."""
+    return select(
+        func.count(SecurityIncidentTrackingState.id),
+        func.max(SecurityIncidentTrackingState.updated_at),
+        func.max(SecurityIncidentTrackingState.id)
+    ).where(SecurityIncidentTrackingState.incident_id == incident_id)
+
+
+def tracking_states_cache_key(
+    fingerprint: Sequence[Any], status_id_name_mapping: Dict[int, str], incident_id: int, variant: str
+) -> str:
+    """
+    Llave de cache de una gráfica de tracking states a partir de la huella de sus datos y del
+    catálogo de nombres de status. No hace consultas: la usan la ruta síncrona y la asíncrona.
+
+    Parameters:
+    - fingerprint: Row of tracking_states_fingerprint_query() (count, last updated_at, last id).
+    - status_id_name_mapping: Mapping status_id -> name.
+    - incident_id: The ID of the incident.
+    - variant: Chart variant and format, e.g. "incident_status_analysis.png".
+
+    Raises:
+    - 404 Not Found: If the incident has no tracking states.
+    """
+    total_states, last_updated_at, last_id = fingerprint
+    if not total_states:
+        raise HTTPException(status_code=404, detail="No tracking states found for the given incident_id")
+    return render_cache.key(
+        variant, incident_id, total_states, last_updated_at, last_id, sorted(status_id_name_mapping.items())
+    )
+
+
+def police_chart_payload(columns: Dict[str, np.ndarray], police_id: int) -> Dict[str, Any]:
+    """
+    Calcula las estadísticas de tiempo de atención de un policía y los datos de su gráfica.
+
+    Parameters:
+    - columns: Output of services.columnar.police_incident_columns().
+    - police_id: The ID of the police officer.
+
+    Returns:
+    - Payload for services.charts.render_police_chart(), plus total_incidents, vector_ids and
+      vector_counts (used by the JSON/Vega-Lite formats of services/chart_formats.py).
+
+    Raises:
+    - 400 Bad Request: If no incident has a valid attention time.
+    """
+    import pandas as pd
+
+    # attention_time_seconds comes already converted (see services/attention_time.py)
+    df = pd.DataFrame(columns)
+
+    # Filter valid data for plotting
+    plot_data = df.dropna(subset=['attention_time_seconds'])
+    if plot_data.empty:
+        raise HTTPException(
+            status_code=400,
+            detail="No valid attention time data available for analysis."
+        )
+
+    # Calculate statistics
+    avg_attention_time_seconds = plot_data['attention_time_seconds'].mean()
+    median_attention_time_seconds = plot_data['attention_time_seconds'].median()
+
+    # Average attention time by vector
+    vector_ids, vector_labels, vector_means, vector_counts = [], [], [], []
+    if 'vector_id' in plot_data.columns and not plot_data['vector_id'].isna().all():
+        plot_data = plot_data.assign(vector_id=plot_data['vector_id'].fillna('Desconocido'))
+        vector_analysis = plot_data.groupby('vector_id')['attention_time_seconds'].agg(['mean', 'count']).reset_index()
+        vector_analysis = vector_analysis.sort_values('mean', ascending=False)
+        vector_ids = [None if vector_id == 'Desconocido' else int(vector_id) for vector_id in vector_analysis['vector_id']]
+        # vector_id is loaded as float64 (NaN for NULL): label from the int ids, not "7.0"
+        vector_labels = ['Desconocido' if vector_id is None else str(vector_id) for vector_id in vector_ids]
+        vector_means = vector_analysis['mean'].tolist()
+        vector_counts = vector_analysis['count'].astype(int).tolist()
+
+    return {
+        "police_id": police_id,
+        "total_incidents": len(df),
+        "incident_ids": plot_data['incident_id'].astype(str).tolist(),
+        "attention_seconds": plot_data['attention_time_seconds'].tolist(),
+        "average": float(avg_attention_time_seconds),
+        "median": float(median_attention_time_seconds),
+        "vector_ids": vector_ids,
+        "vector_labels": vector_labels,
+        "vector_means": vector_means,
+        "vector_counts": vector_counts
+    }
+
+
+def police_chart_view(view: Optional[str], total_incidents: int) -> str:
+    """
+    Elige la vista de la gráfica de un policía: una barra por incidente ("incidents") o la
+    distribución de tiempos ("distribution", histograma y ECDF).
+
+    Without view, officers with more than POLICE_CHART_MAX_BARS incidents get the
+    distribution, whose render cost does not grow with the number of incidents.
+
+    Raises:
+    - 400 Bad Request: If view=incidents is asked for more than POLICE_CHART_MAX_BARS incidents.
+    """
+    if view is None:
+        return "distribution" if total_incidents > settings.POLICE_CHART_MAX_BARS else "incidents"
+    if view == "incidents" and total_incidents > settings.POLICE_CHART_MAX_BARS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"view=incidents is limited to {settings.POLICE_CHART_MAX_BARS} incidents "
+                   f"({total_incidents} found); use view=distribution"
+        )
+    return view
+
+
+def police_render_payload(payload: Dict[str, Any], view: str, dpi: int, figsize: Tuple[float, float]) -> Dict[str, Any]:
+    """
+    Datos que se mandan al pool de render para la gráfica de un policía en la vista elegida.
+
+    Parameters:
+    - payload: Output of police_chart_payload().
+    - view: Output of police_chart_view().
+    - dpi / figsize: Output of services.chart_formats.chart_size().
+
+    The distribution view replaces the per-incident lists with a histogram of at most
+    POLICE_CHART_HISTOGRAM_BINS bins and an ECDF of at most ECDF_POINTS points, so what is
+    sent to the worker and drawn is bounded.
+    """
+    render_payload = {**payload, "view": view, "dpi": dpi, "figsize": list(figsize)}
+    if view != "distribution":
+        return render_payload
+
+    seconds = np.sort(np.asarray(payload["attention_seconds"], dtype=np.float64))
+    edges = np.histogram_bin_edges(seconds, bins="auto")
+    if len(edges) - 1 > settings.POLICE_CHART_HISTOGRAM_BINS:
+        edges = np.histogram_bin_edges(seconds, bins=settings.POLICE_CHART_HISTOGRAM_BINS)
+    counts, _ = np.histogram(seconds, bins=edges)
+    if len(seconds) > ECDF_POINTS:
+        # Quantiles at evenly spaced fractions trace the same curve with bounded points
+        fractions = np.linspace(0.0, 1.0, ECDF_POINTS)
+        ecdf_seconds = np.quantile(seconds, fractions)
+    else:
+        fractions = np.arange(1, len(seconds) + 1) / len(seconds)
+        ecdf_seconds = seconds
+
+    del render_payload["incident_ids"], render_payload["attention_seconds"]
+    render_payload.update({
+        "valid_incidents": len(seconds),
+        "histogram_edges": edges.tolist(),
+        "histogram_counts": counts.tolist(),
+        "ecdf_seconds": ecdf_seconds.tolist(),
+        "ecdf_fractions": fractions.tolist(),
+    })
+    return render_payload
+
+
+def status_time_frame(
+    columns: Dict[str, np.ndarray],
+    excluded_status_ids: Optional[Sequence[int]] = None
+) -> "pd.DataFrame":
+    """
+    Calcula el tiempo transcurrido en cada status de un incidente.
+
+    Parameters:
+    - columns: Output of services.columnar.tracking_state_columns() for one incident.
+    - excluded_status_ids: Statuses removed before computing times (police view).
+
+    Returns:
+    - DataFrame with status_id, time_spent (seconds), created_at (first occurrence),
+      percentage and time_spent_minutes, ordered by first occurrence.
+
+    Raises:
+    - 400 Bad Request: If nothing is left to analyze.
+    """
+    import pandas as pd
+
+    df = pd.DataFrame({
+        "status_id": columns["status_id"],
+        "created_at": pd.to_datetime(columns["created_at_ns"], utc=True)
+    })
+
+    # Ensure the DataFrame is not empty
+    if df.empty:
+        raise HTTPException(status_code=400, detail="No valid data available for analysis.")
+
+    if excluded_status_ids:
+        df = df[~df['status_id'].isin(excluded_status_ids)]
+
+        # Ensure the DataFrame is not empty after filtering
+        if df.empty:
+            raise HTTPException(status_code=400, detail="No valid data available for analysis after filtering excluded statuses.")
+
+    # Normalize timezone
+    df = df.assign(created_at=df['created_at'].dt.tz_localize(None))  # Remove timezone information
+    df = df.sort_values(by='created_at')
+
+    # Calculate time spent in each status
+    df['time_spent'] = df['created_at'].shift(-1) - df['created_at']
+    df['time_spent'] = df['time_spent'].dt.total_seconds().fillna(0)  # Convert timedelta to seconds
+
+    # Group by status_id and calculate total time spent
+    status_time = df.groupby('status_id', as_index=False).agg({
+        'time_spent': 'sum',
+        'created_at': 'min'  # Keep the earliest created_at for sorting
+    })
+    status_time = status_time[status_time['status_id'] != -1]  # States without status_id
+
+    # Calculate percentages and convert time to minutes
+    total_time = status_time['time_spent'].sum()
+    status_time['percentage'] = (status_time['time_spent'] / total_time) * 100
+    status_time['time_spent_minutes'] = status_time['time_spent'] / 60  # Convert time to minutes
+
+    # Sort by the earliest created_at to ensure the order is based on the first occurrence
+    return status_time.sort_values(by='created_at', ascending=True).reset_index(drop=True)
+
+
+def status_chart_payload(status_time: "pd.DataFrame", status_names: Dict[int, str], title: str) -> Dict[str, Any]:
+    """
+    Datos para services.charts.render_status_chart() a partir de status_time_frame().
+    """
+    return {
+        "title": title,
+        "status_ids": [int(status_id) for status_id in status_time['status_id']],
+        "status_names": [
+            status_names.get(int(status_id), str(status_id))
+            for status_id in status_time['status_id']
+        ],
+        "percentages": status_time['percentage'].tolist(),
+        "minutes": status_time['time_spent_minutes'].tolist()
+    }
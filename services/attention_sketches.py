@@ -0,0 +1,163 @@
+import math
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.orm import Session
+
+from models.attention_sketch import AttentionSketch, AttentionSketchLedger
+from services.quantiles import LogHistogram, SketchDelta
+
+"""
+Histogramas mergeables de tiempos de atención por zona, vector y día.
+
+Cada (zone_id, vector_id, día UTC de created_at) guarda el número de incidentes, los que
+tienen atention_time válido, la suma de segundos y un LogHistogram (services/quantiles.py).
+Se mantienen en el mismo recorrido incremental que el resumen por policía
+(services/police_summary.refresh()), con su propio ledger por incidente para mover la
+aportación cuando un incidente cambia de zona, vector o tiempo.
+
+Una consulta por cualquier combinación de zonas, vectores y rango de días combina los
+histogramas de esas cubetas (sumando cubetas, sin ordenar valores), así que el costo
+depende del número de cubetas y no del de incidentes.
+
+Cotas de error:
+- count, valid_count y mean son exactos.
+- Cada cuantil tiene error relativo de a lo más relative_accuracy (1%): si el cuantil
+  exacto (interpolado como numpy/percentile_cont) es v, el estimado está en
+  [v * (1 - alpha), v * (1 + alpha)]. La cota no depende del número de valores ni de
+  cuántos histogramas se combinen, porque combinar es exacto (suma de cubetas).
+- Los valores 0 se reportan exactos (cubeta de ceros).
+- El filtro de fechas es por día completo en UTC.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+# zone_id / vector_id stored for incidents without zone / vector
+NO_ZONE = 0
+NO_VECTOR = 0
+
+BucketKey = Tuple[int, int, date]
+
+
+def _utc_day(created_at: datetime) -> date:
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+
+def reset(db: Session) -> None:
+    """Borra histogramas y ledger (reconstrucción completa)."""
+    db.execute(delete(AttentionSketch))
+    db.execute(delete(AttentionSketchLedger))
+
+
+def apply_batch(db: Session, columns: Dict[str, Any], now: datetime) -> int:
+    """
+    Aplica un bloque de incidentes modificados (services/police_summary.CHANGED_INCIDENT_SPECS).
+
+    Returns:
+    - Number of incidents whose bucket or attention time changed.
+    """
+    incident_ids = columns["incident_id"].tolist()
+    ledger = {
+        entry.incident_id: entry
+        for entry in db.scalars(select(AttentionSketchLedger).where(AttentionSketchLedger.incident_id.in_(incident_ids)))
+    }
+
+    deltas: Dict[BucketKey, SketchDelta] = defaultdict(SketchDelta)
+    changed = 0
+    for incident_id, updated_at, created_at, zone_id, vector_id, seconds in zip(
+        incident_ids,
+        columns["updated_at"],
+        columns["created_at"],
+        columns["zone_id"].tolist(),
+        columns["vector_id"].tolist(),
+        columns["attention_time_seconds"].tolist()
+    ):
+        day = _utc_day(created_at)
+        seconds = None if math.isnan(seconds) else seconds
+        entry = ledger.get(incident_id)
+        if entry is not None:
+            if (entry.zone_id, entry.vector_id, entry.day, entry.attention_seconds) == (zone_id, vector_id, day, seconds):
+                entry.updated_at = updated_at
+                continue
+            deltas[(entry.zone_id, entry.vector_id, entry.day)].add(entry.attention_seconds, -1)
+        else:
+            entry = AttentionSketchLedger(incident_id=incident_id)
+            db.add(entry)
+        entry.updated_at = updated_at
+        entry.zone_id = zone_id
+        entry.vector_id = vector_id
+        entry.day = day
+        entry.attention_seconds = seconds
+        deltas[(zone_id, vector_id, day)].add(seconds, 1)
+        changed += 1
+
+    if not deltas:
+        return changed
+
+    sketches = {
+        (sketch.zone_id, sketch.vector_id, sketch.day): sketch
+        for sketch in db.scalars(
+            select(AttentionSketch)
+            .where(tuple_(AttentionSketch.zone_id, AttentionSketch.vector_id, AttentionSketch.day).in_(list(deltas)))
+        )
+    }
+    for (zone_id, vector_id, day), delta in deltas.items():
+        sketch = sketches.get((zone_id, vector_id, day))
+        if sketch is None:
+            sketch = AttentionSketch(
+                zone_id=zone_id, vector_id=vector_id, day=day, total_incidents=0, valid_incidents=0, sum_seconds=0.0
+            )
+            db.add(sketch)
+        delta.apply_to(sketch, now)
+    return changed
+
+
+def attention_quantiles(
+    db: Session,
+    zone_ids: Optional[Sequence[int]] = None,
+    vector_ids: Optional[Sequence[int]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    quantiles: Sequence[float] = (0.5, 0.9, 0.99)
+) -> Dict[str, Any]:
+    """
+    Cuantiles aproximados de tiempo de atención combinando los histogramas que cumplen el filtro.
+
+    Parameters:
+    - zone_ids / vector_ids: Buckets of these zones / vectors (all when None).
+    - date_from / date_to: UTC days, inclusive start and exclusive end.
+    - quantiles: Quantiles in 0..1.
+
+    Returns:
+    - Dict with the merged bucket count, incident counts, exact mean, the quantiles (keyed
+      like "p50") and relative_accuracy.
+    """
+    stmt = select(
+        AttentionSketch.total_incidents, AttentionSketch.valid_incidents, AttentionSketch.sum_seconds, AttentionSketch.sketch
+    )
+    if zone_ids:
+        stmt = stmt.where(AttentionSketch.zone_id.in_(zone_ids))
+    if vector_ids:
+        stmt = stmt.where(AttentionSketch.vector_id.in_(vector_ids))
+    if date_from is not None:
+        stmt = stmt.where(AttentionSketch.day >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(AttentionSketch.day < date_to)
+    rows = db.execute(stmt).all()
+
+    histogram = LogHistogram.merged(row.sketch for row in rows)
+    total = sum(row.total_incidents for row in rows)
+    valid = sum(row.valid_incidents for row in rows)
+    sum_seconds = sum(row.sum_seconds for row in rows)
+    return {
+        "buckets": len(rows),
+        "total_incidents": total,
+        "valid_incidents": valid,
+        "mean_seconds": sum_seconds / valid if valid else None,
+        "quantiles": {f"p{q * 100:g}": histogram.quantile(q) for q in quantiles},
+        "relative_accuracy": histogram.relative_accuracy
+    }
@@ -0,0 +1,108 @@
+import sys
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import Float, Integer, case, cast, func, literal_column
+from sqlalchemy.sql.elements import ColumnElement
+
+from settings import settings
+
+"""
+Conversión de SecurityIncident.atention_time (texto) a segundos.
+
+atention_time se guarda como String con tres formas posibles: "HH:MM:SS", un número
+(segundos) o vacío/"null". Este módulo ofrece:
+
+- parse_attention_seconds(): conversión vectorizada de un arreglo completo en Python.
+- attention_seconds_sql(): la misma conversión como expresión SQL, para que Postgres
+  agregue sin mandar los textos a Python.
+- ATTENTION_SECONDS_DDL: columna generada (almacenada) opcional con los segundos ya
+  calculados. Se crea con:
+
+      python -m services.attention_time --apply
+
+  y se activa con ATTENTION_SECONDS_COLUMN=atention_time_seconds en el .env.
+
+Los modelos se importan solo dentro de las funciones SQL para que los scripts de
+analysis/ puedan usar parse_attention_seconds() sin conectarse a la base de datos.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+# Same formats accepted by the previous per-row time_to_seconds(). Written without
+# backslashes so the same patterns work in Python and in Postgres string literals.
+HMS_PATTERN = r'^([0-9]{1,2}):([0-9]{1,2}):([0-9]{1,2})$'
+NUMERIC_PATTERN = r'^ *[-+]?([0-9]+[.]?[0-9]*|[.][0-9]+)([eE][-+]?[0-9]+)? *$'
+
+
+def parse_attention_seconds(values: Iterable) -> np.ndarray:
+    """
+    Convierte un arreglo de atention_time a segundos (float64), NaN si no es válido.
+
+    Parameters:
+    - values: Array-like of str/None ("HH:MM:SS", numeric strings, "null", "" or None).
+
+    Returns:
+    - np.ndarray: float64 seconds aligned with values.
+    """
+    import pandas as pd
+
+    text = pd.Series(values, dtype=object).astype("string")
+    hms = text.str.extract(HMS_PATTERN).astype("float64").to_numpy()
+    hms_seconds = hms @ np.array([3600.0, 60.0, 1.0])
+    numeric_seconds = pd.to_numeric(text.where(text.str.match(NUMERIC_PATTERN)), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return np.where(np.isnan(hms_seconds), numeric_seconds, hms_seconds)
+
+
+def _hms_part(column: ColumnElement, position: int) -> ColumnElement:
+    return cast(func.split_part(column, ":", position), Integer)
+
+
+def attention_seconds_sql(column: Optional[ColumnElement] = None) -> ColumnElement:
+    """
+    Expresión SQL (Postgres) con los segundos de atention_time, NULL si no es válido.
+
+    Parameters:
+    - column: Text column to convert; defaults to SecurityIncident.atention_time, in which
+      case the persisted ATTENTION_SECONDS_COLUMN is used when it is configured.
+    """
+    if column is None:
+        from models.security_incident import SecurityIncident
+        if settings.ATTENTION_SECONDS_COLUMN:
+            return literal_column(f"{SecurityIncident.__tablename__}.{settings.ATTENTION_SECONDS_COLUMN}", Float)
+        column = SecurityIncident.atention_time
+    return case(
+        (
+            column.op("~")(HMS_PATTERN),
+            cast(_hms_part(column, 1) * 3600 + _hms_part(column, 2) * 60 + _hms_part(column, 3), Float)
+        ),
+        (column.op("~")(NUMERIC_PATTERN), cast(column, Float)),
+        else_=None
+    )
+
+
+def attention_seconds_ddl(column_name: str = "atention_time_seconds") -> str:
+    """
+    DDL de la columna generada con los segundos de atention_time (Postgres 12+).
+    """
+    from sqlalchemy.dialects import postgresql
+    from models.security_incident import SecurityIncident
+
+    expression = attention_seconds_sql(literal_column("atention_time"))
+    compiled = expression.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    return (
+        f"ALTER TABLE {SecurityIncident.__tablename__} "
+        f"ADD COLUMN IF NOT EXISTS {column_name} double precision "
+        f"GENERATED ALWAYS AS ({compiled}) STORED"
+    )
+
+
+if __name__ == "__main__":
+    # python -m services.attention_time [--apply]
+    ddl = attention_seconds_ddl()
+    print(ddl)
+    if "--apply" in sys.argv:
+        from config.db import engine
+        with engine.begin() as connection:
+            connection.exec_driver_sql(ddl)
+        print("Columna creada. Configure ATTENTION_SECONDS_COLUMN=atention_time_seconds para usarla.")
@@ -0,0 +1,152 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+"""
+Tareas periódicas en hilos de fondo (resúmenes y tablas materializadas de análisis).
+
+Cada PeriodicJob corre su función al arrancar y después cada interval_seconds, hasta que
+se detiene con el servidor. Un intervalo de 0 deshabilita la tarea (por ejemplo si se
+prefiere correrla desde cron). Las funciones reciben wait=False: si otro worker ya tiene
+la marca tomada, esa vuelta se salta en lugar de esperar.
+
+Si las tablas de la tarea no existen (la base no se ha creado con python -m config.db), se
+registra un solo aviso y la tarea espera cada vez el doble, hasta MISSING_TABLE_MAX_WAIT_SECONDS,
+en lugar de repetir el traceback en cada vuelta; al crearse las tablas vuelve a su intervalo.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+logger = logging.getLogger(__name__)
+
+# Postgres SQLSTATE undefined_table (SQLite reports "no such table")
+UNDEFINED_TABLE = "42P01"
+
+
+def _missing_table(error: Exception) -> bool:
+    if not isinstance(error, (ProgrammingError, OperationalError)):
+        return False
+    code = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+    return code == UNDEFINED_TABLE or "no such table" in str(error.orig)
+
+
+class PeriodicJob:
+    """
+    Ejecuta func cada interval_seconds en un hilo daemon.
+
+    Counters:
+    - runs / failures: Completed and failed executions.
+    - last_result / last_error: Outcome of the latest execution.
+    - missing_tables: Consecutive executions that found the job's tables missing.
+    """
+
+    # Longest wait between executions while the tables are missing
+    MISSING_TABLE_MAX_WAIT_SECONDS = 3600
+
+    def __init__(self, name: str, interval_seconds: float, func: Callable[[], Any]):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.func = func
+        self.runs = 0
+        self.failures = 0
+        self.last_run_at: Optional[float] = None
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+        self.missing_tables = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> None:
+        try:
+            self.last_result = self.func()
+            self.last_error = None
+            self.runs += 1
+            if self.missing_tables:
+                logger.info("Background job %s: tables found, back to every %s s", self.name, self.interval_seconds)
+                self.missing_tables = 0
+        except Exception as e:
+            self.failures += 1
+            self.last_error = repr(e)
+            if _missing_table(e):
+                if not self.missing_tables:
+                    logger.warning("Background job %s paused: its tables do not exist (%s); create them with "
+                                   "python -m config.db", self.name, str(e.orig).splitlines()[0])
+                self.missing_tables += 1
+            else:
+                logger.exception("Background job %s failed", self.name)
+        self.last_run_at = time.time()
+
+    def wait_seconds(self) -> float:
+        """Espera hasta la siguiente ejecución: el intervalo, o más mientras falten las tablas."""
+        if not self.missing_tables:
+            return self.interval_seconds
+        backoff = self.interval_seconds * 2 ** min(self.missing_tables, 16)
+        return max(self.interval_seconds, min(backoff, self.MISSING_TABLE_MAX_WAIT_SECONDS))
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.wait_seconds())
+
+    def start(self) -> None:
+        if self.interval_seconds <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"job-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 10) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "interval_seconds": self.interval_seconds,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "runs": self.runs,
+            "failures": self.failures,
+            "missing_tables": self.missing_tables,
+            "last_run_at": self.last_run_at,
+            "last_error": self.last_error
+        }
+
+
+def _materialize_incident_durations():
+    from services.incident_durations import materialize
+    return materialize(wait=False)
+
+
+def _refresh_police_summaries():
+    from services.police_summary import refresh
+    return refresh(wait=False)
+
+
+def _jobs() -> List[PeriodicJob]:
+    from settings import settings
+    return [
+        PeriodicJob("incident_durations", settings.INCIDENT_DURATIONS_REFRESH_SECONDS, _materialize_incident_durations),
+        PeriodicJob("police_summary", settings.POLICE_SUMMARY_REFRESH_SECONDS, _refresh_police_summaries),
+    ]
+
+
+jobs: List[PeriodicJob] = []
+
+
+def start() -> None:
+    """Arranca las tareas de fondo configuradas (evento startup de la app)."""
+    if not jobs:
+        jobs.extend(_jobs())
+    for job in jobs:
+        job.start()
+
+
+def shutdown() -> None:
+    """Detiene las tareas de fondo (evento shutdown de la app)."""
+    for job in jobs:
+        job.stop()
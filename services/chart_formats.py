@@ -0,0 +1,255 @@
+import math
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from services.responses import CompactORJSONResponse
+from settings import settings
+
+"""
+Formatos de respuesta de los análisis: datos (JSON), especificación Vega-Lite, SVG o PNG.
+
+Los clientes que dibujan sus propias gráficas piden format=json o format=vega (o mandan
+Accept: application/json / application/vnd.vegalite.v5+json) y reciben las series ya
+calculadas sin pasar por Matplotlib: este módulo no lo importa y esos formatos nunca usan
+el pool de services/render_pool.py. SVG y PNG se siguen renderizando en el pool y se
+guardan en services/render_cache.py.
+
+Sin format ni Accept (o con Accept: */*) la respuesta sigue siendo PNG. Las imágenes
+aceptan dpi y size (pulgadas, "16x10"), acotados por CHART_MAX_DPI, CHART_MAX_INCHES y
+CHART_MAX_PIXELS para que el costo de un render no dependa de lo que pida el cliente.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "vega": "application/vnd.vegalite.v5+json",
+    "svg": "image/svg+xml",
+    "png": "image/png",
+}
+
+# Formats answered with the computed data, without rendering
+DATA_FORMATS = ("json", "vega")
+
+# Query parameter patterns shared by the analysis routes
+FORMAT_PATTERN = "^(json|vega|svg|png)$"
+SIZE_PATTERN = r"^\d+(\.\d+)?x\d+(\.\d+)?$"
+
+MIN_DPI = 50
+MIN_INCHES = 2.0
+
+_WILDCARDS = {
+    "*/*": "png",
+    "image/*": "png",
+    "application/*": "json",
+}
+
+
+def negotiate(chart_format: Optional[str], accept: Optional[str]) -> str:
+    """
+    Elige el formato de respuesta: el parámetro format si viene, si no el header Accept.
+
+    Accept entries are tried by decreasing q (ties in the order sent). Without Accept the
+    format is PNG, as before.
+
+    Raises:
+    - 406 Not Acceptable: If Accept only lists media types this endpoint cannot produce.
+    """
+    if chart_format:
+        return chart_format
+    if not accept:
+        return "png"
+    candidates = []
+    for position, entry in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            candidates.append((-quality, position, media_type.lower()))
+    for _, _, media_type in sorted(candidates):
+        for name, known in MEDIA_TYPES.items():
+            if media_type == known:
+                return name
+        if media_type in _WILDCARDS:
+            return _WILDCARDS[media_type]
+    raise HTTPException(
+        status_code=406,
+        detail=f"Not Acceptable; supported media types: {', '.join(MEDIA_TYPES.values())}"
+    )
+
+
+def chart_size(dpi: Optional[int], size: Optional[str], default_figsize: Tuple[float, float],
+               default_dpi: int = 300) -> Tuple[int, Tuple[float, float]]:
+    """
+    Resuelve los parámetros dpi y size ("WxH" en pulgadas) de una imagen dentro de los límites.
+
+    The dpi is lowered, never the size, when width x height x dpi² exceeds CHART_MAX_PIXELS.
+
+    Raises:
+    - 400 Bad Request: If a side of size is outside [MIN_INCHES, CHART_MAX_INCHES].
+    """
+    figsize = default_figsize
+    if size:
+        width, height = (float(side) for side in size.lower().split("x"))
+        if not all(MIN_INCHES <= side <= settings.CHART_MAX_INCHES for side in (width, height)):
+            raise HTTPException(
+                status_code=400,
+                detail=f"size sides must be between {MIN_INCHES:g} and {settings.CHART_MAX_INCHES:g} inches"
+            )
+        figsize = (width, height)
+    dpi = min(dpi or default_dpi, settings.CHART_MAX_DPI)
+    pixel_dpi = int(math.sqrt(settings.CHART_MAX_PIXELS / (figsize[0] * figsize[1])))
+    return max(MIN_DPI, min(dpi, pixel_dpi)), figsize
+
+
+def document_response(chart_format: str, document: Dict[str, Any], headers: Dict[str, str]) -> CompactORJSONResponse:
+    """Respuesta JSON o Vega-Lite con los headers de cache de la gráfica (ETag, Vary)."""
+    return CompactORJSONResponse(content=document, media_type=MEDIA_TYPES[chart_format], headers=headers)
+
+
+def _optional(values: np.ndarray, cast) -> list:
+    return [None if value is None or (isinstance(value, float) and math.isnan(value)) else cast(value)
+            for value in values.tolist()]
+
+
+def police_analysis_document(chart_format: str, columns: Dict[str, np.ndarray], payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Análisis de tiempos de atención de un policía como datos (json) o especificación Vega-Lite (vega).
+
+    Parameters:
+    - columns: Output of services.columnar.police_incident_columns().
+    - payload: Output of services.analysis.police_chart_payload() for the same columns.
+    """
+    if chart_format == "vega":
+        return _police_analysis_vega(payload)
+    average, median = payload["average"], payload["median"]
+    return {
+        "police_id": payload["police_id"],
+        "summary_statistics": {
+            "total_incidents": payload["total_incidents"],
+            "valid_incidents": len(payload["attention_seconds"]),
+            "average_attention_time_seconds": average,
+            "median_attention_time_seconds": median
+        },
+        "incidents": [
+            {
+                "incident_id": incident_id,
+                "attention_time": attention_time,
+                "attention_time_seconds": seconds,
+                "vector_id": vector_id
+            }
+            for incident_id, attention_time, seconds, vector_id in zip(
+                columns["incident_id"].tolist(),
+                columns["attention_time"].tolist(),
+                _optional(columns["attention_time_seconds"], float),
+                _optional(columns["vector_id"], int)
+            )
+        ],
+        "vector_analysis": [
+            {"vector_id": vector_id, "mean_seconds": mean, "count": count}
+            for vector_id, mean, count in zip(payload["vector_ids"], payload["vector_means"], payload["vector_counts"])
+        ]
+    }
+
+
+def _police_analysis_vega(payload: Dict[str, Any]) -> Dict[str, Any]:
+    average, median = payload["average"], payload["median"]
+    incidents_chart = {
+        "title": f"Análisis de Tiempos de Atención para Policía ID {payload['police_id']}",
+        "width": 900,
+        "layer": [
+            {
+                "data": {"values": [
+                    {"incident_id": incident_id, "attention_seconds": seconds}
+                    for incident_id, seconds in zip(payload["incident_ids"], payload["attention_seconds"])
+                ]},
+                "mark": {"type": "bar", "color": "skyblue", "opacity": 0.7},
+                "encoding": {
+                    "x": {"field": "incident_id", "type": "nominal", "sort": None, "title": "ID del Incidente"},
+                    "y": {"field": "attention_seconds", "type": "quantitative", "title": "Tiempo de Atención (segundos)"}
+                }
+            },
+            {
+                "data": {"values": [
+                    {"statistic": f"Promedio: {average/60:.2f} minutos", "seconds": average},
+                    {"statistic": f"Mediana: {median/60:.2f} minutos", "seconds": median}
+                ]},
+                "mark": "rule",
+                "encoding": {
+                    "y": {"field": "seconds", "type": "quantitative"},
+                    "color": {"field": "statistic", "type": "nominal", "title": None,
+                              "scale": {"range": ["red", "green"]}},
+                    "strokeDash": {"field": "statistic", "type": "nominal", "legend": None,
+                                   "scale": {"range": [[1, 0], [6, 4]]}}
+                }
+            }
+        ]
+    }
+    vectors_chart = {
+        "title": "Tiempo Promedio de Atención por Vector",
+        "width": 900,
+        "data": {"values": [
+            {"vector": label, "mean_seconds": mean, "count": count}
+            for label, mean, count in zip(payload["vector_labels"], payload["vector_means"], payload["vector_counts"])
+        ]},
+        "mark": {"type": "bar", "color": "lightgreen", "opacity": 0.7},
+        "encoding": {
+            "x": {"field": "vector", "type": "nominal", "sort": None, "title": "ID del Vector"},
+            "y": {"field": "mean_seconds", "type": "quantitative", "title": "Tiempo Promedio de Atención (segundos)"},
+            "tooltip": [{"field": "vector"}, {"field": "mean_seconds", "format": ".1f"}, {"field": "count"}]
+        }
+    }
+    return {"$schema": VEGA_LITE_SCHEMA, "vconcat": [incidents_chart, vectors_chart]}
+
+
+def status_analysis_document(chart_format: str, incident_id: int, view: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Tiempo por status de un incidente como datos (json) o especificación Vega-Lite (vega).
+
+    Parameters:
+    - payload: Output of services.analysis.status_chart_payload().
+    """
+    statuses = [
+        {"status_id": status_id, "status_name": name, "percentage": percentage, "minutes": minutes}
+        for status_id, name, percentage, minutes in zip(
+            payload["status_ids"], payload["status_names"], payload["percentages"], payload["minutes"]
+        )
+    ]
+    if chart_format == "json":
+        return {"incident_id": incident_id, "view": view, "title": payload["title"], "statuses": statuses}
+    y_axis = {"field": "status_name", "type": "nominal", "sort": None, "title": "Status"}
+    return {
+        "$schema": VEGA_LITE_SCHEMA,
+        "title": payload["title"],
+        "width": 700,
+        "data": {"values": statuses},
+        "transform": [{"calculate": "format(datum.minutes, '.1f') + ' min'", "as": "minutes_label"}],
+        "encoding": {"y": y_axis},
+        "layer": [
+            {
+                "mark": {"type": "bar", "stroke": "black"},
+                "encoding": {
+                    "x": {"field": "percentage", "type": "quantitative", "title": "Porcentaje de Tiempo Total (%)"},
+                    "color": {"field": "status_name", "type": "nominal", "sort": None, "legend": None,
+                              "scale": {"scheme": "category20"}}
+                }
+            },
+            {
+                "mark": {"type": "text", "align": "left", "dx": 4},
+                "encoding": {
+                    "x": {"field": "percentage", "type": "quantitative"},
+                    "text": {"field": "minutes_label", "type": "nominal"}
+                }
+            }
+        ]
+    }
@@ -0,0 +1,161 @@
+from typing import IO, Any, Dict, Union
+
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+"""
+Gráficas de los análisis construidas con la API orientada a objetos de Matplotlib.
+
+Cada función crea su propia Figure con un canvas Agg y no toca el estado global de
+matplotlib.pyplot, así que se puede llamar en paralelo (ver services/render_pool.py).
+Reciben únicamente datos ya calculados (listas y números) para que sean baratas de
+enviar a otro proceso.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+
+def render_police_chart(payload: Dict[str, Any], output: Union[str, IO[bytes]], chart_format: str = "png") -> None:
+    """
+    Gráfica de tiempos de atención de un policía: tiempo por incidente (o su distribución) y
+    promedio por vector.
+
+    Parameters:
+    - payload: police_id, average, median, vector_labels and vector_means, plus view, dpi and
+      figsize (services.analysis.police_render_payload()). The "incidents" view needs
+      incident_ids and attention_seconds; the "distribution" view needs valid_incidents,
+      histogram_edges, histogram_counts, ecdf_seconds and ecdf_fractions.
+    - output: File path or binary buffer to write the image to.
+    - chart_format: "png" or "svg".
+    """
+    fig = Figure(figsize=tuple(payload.get("figsize", (16, 10))))
+    FigureCanvasAgg(fig)
+    ax_incidents, ax_vectors = fig.subplots(2, 1)
+
+    average = payload["average"]
+    median = payload["median"]
+
+    if payload.get("view") == "distribution":
+        _draw_attention_distribution(ax_incidents, payload)
+    else:
+        # Plot 1: Attention time per incident
+        ax_incidents.bar(
+            payload["incident_ids"],
+            payload["attention_seconds"],
+            color='skyblue',
+            alpha=0.7
+        )
+        ax_incidents.axhline(y=average, color='r', linestyle='-', label=f'Promedio: {average/60:.2f} minutos')
+        ax_incidents.axhline(y=median, color='g', linestyle='--', label=f'Mediana: {median/60:.2f} minutos')
+        ax_incidents.set_title(f"Análisis de Tiempos de Atención para Policía ID {payload['police_id']}", fontsize=14)
+        ax_incidents.set_ylabel("Tiempo de Atención (segundos)", fontsize=12)
+        ax_incidents.set_xlabel("ID del Incidente", fontsize=12)
+        ax_incidents.tick_params(axis='x', labelrotation=90, labelsize=8)
+        ax_incidents.grid(axis='y', linestyle='--', alpha=0.7)
+        ax_incidents.legend()
+
+    # Plot 2: Average attention time by vector
+    if payload["vector_labels"]:
+        ax_vectors.bar(
+            payload["vector_labels"],
+            payload["vector_means"],
+            alpha=0.7,
+            color='lightgreen'
+        )
+        ax_vectors.set_title("Tiempo Promedio de Atención por Vector", fontsize=14)
+        ax_vectors.set_ylabel("Tiempo Promedio de Atención (segundos)", fontsize=12)
+        ax_vectors.set_xlabel("ID del Vector", fontsize=12)
+        ax_vectors.grid(axis='y', linestyle='--', alpha=0.7)
+    else:
+        ax_vectors.text(0.5, 0.5, "No hay datos de vector disponibles", ha='center', va='center', fontsize=14)
+        ax_vectors.axis('off')
+
+    fig.tight_layout()
+    fig.savefig(output, format=chart_format, dpi=payload.get("dpi", 300), bbox_inches='tight')
+
+
+def _draw_attention_distribution(ax, payload: Dict[str, Any]) -> None:
+    # Histogram of attention times with the ECDF on a second axis; cost independent of the incident count
+    average = payload["average"]
+    median = payload["median"]
+    ax.stairs(payload["histogram_counts"], payload["histogram_edges"], fill=True, color='skyblue', alpha=0.7,
+              label='Incidentes')
+    ax.axvline(x=average, color='r', linestyle='-', label=f'Promedio: {average/60:.2f} minutos')
+    ax.axvline(x=median, color='g', linestyle='--', label=f'Mediana: {median/60:.2f} minutos')
+    ax.set_title(
+        f"Distribución de Tiempos de Atención para Policía ID {payload['police_id']} "
+        f"({payload['valid_incidents']} incidentes)",
+        fontsize=14
+    )
+    ax.set_xlabel("Tiempo de Atención (segundos)", fontsize=12)
+    ax.set_ylabel("Número de Incidentes", fontsize=12)
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+    ax_ecdf = ax.twinx()
+    ax_ecdf.step(payload["ecdf_seconds"], payload["ecdf_fractions"], where='post', color='navy', linewidth=1.5,
+                 label='Acumulado (ECDF)')
+    ax_ecdf.set_ylim(0, 1.02)
+    ax_ecdf.set_ylabel("Fracción Acumulada de Incidentes", fontsize=12)
+
+    handles, labels = ax.get_legend_handles_labels()
+    ecdf_handles, ecdf_labels = ax_ecdf.get_legend_handles_labels()
+    ax.legend(handles + ecdf_handles, labels + ecdf_labels, loc='center right')
+
+
+def render_status_chart(payload: Dict[str, Any], output: Union[str, IO[bytes]], chart_format: str = "png") -> None:
+    """
+    Gráfica de distribución de tiempo por status de un incidente (versiones FULL y simple).
+
+    Parameters:
+    - payload: title, status_names, percentages and minutes, in order of first occurrence.
+    - output: File path or binary buffer to write the image to.
+    - chart_format: "png" or "svg".
+    """
+    fig = Figure(figsize=(12, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+
+    percentages = payload["percentages"]
+    ax.barh(
+        y=payload["status_names"],
+        width=percentages,
+        color=matplotlib.colormaps["tab20"].colors[:len(percentages)],
+        edgecolor="black"
+    )
+    ax.set_title(payload["title"], fontsize=14)
+    ax.set_xlabel("Porcentaje de Tiempo Total (%)", fontsize=12)
+    ax.set_ylabel("Status", fontsize=12)
+
+    # Add labels to the bars
+    for i, (percentage, minutes) in enumerate(zip(percentages, payload["minutes"])):
+        # Add percentage label
+        ax.text(
+            percentage / 2,
+            i,
+            f"{percentage:.1f}%",
+            ha="center",
+            va="center",
+            fontsize=10,
+            color="white",
+            weight="bold"
+        )
+        # Add time in minutes label
+        ax.text(
+            percentage + 1,  # Position slightly to the right of the bar
+            i,
+            f"{minutes:.1f} min",
+            ha="left",
+            va="center",
+            fontsize=10,
+            color="black"
+        )
+
+    fig.savefig(output, format=chart_format, dpi=300, bbox_inches="tight")
+
+
+# Charts that can be requested by name through services/render_pool.py
+CHARTS = {
+    "police_analysis": render_police_chart,
+    "incident_status_analysis": render_status_chart,
+}
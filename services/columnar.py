@@ -0,0 +1,188 @@
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from models.security_incident import SecurityIncident
+from models.security_incidenttrackingstate import SecurityIncidentTrackingState
+from services.attention_time import attention_seconds_sql, parse_attention_seconds
+
+"""
+Capa de acceso a datos columnar para los análisis.
+
+Las rutas de análisis no necesitan objetos ORM completos (con description, report y
+citizen_affected) sino unas cuantas columnas. Aquí se ejecutan select() de Core que
+proyectan solo esas columnas, se leen por bloques (yield_per) sin pasar por el identity
+map del ORM, y cada columna se materializa como un arreglo de NumPy con tipo.
+
+Tipos de columna (ColumnSpec = (kind, fill)):
+- "int64": entero; los NULL se reemplazan por fill.
+- "float64": número; los NULL quedan como NaN.
+- "object": texto u otro valor de Python tal cual.
+- "epoch_ns": timestamp con zona horaria convertido a nanosegundos UTC (int64).
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+ColumnSpec = Tuple[str, Optional[int]]
+
+# Rows converted per block; bounds the transient list of tuples
+FETCH_BLOCK_SIZE = 10000
+
+
+def _to_array(values: tuple, spec: ColumnSpec) -> np.ndarray:
+    kind, fill = spec
+    if kind == "int64":
+        if fill is not None:
+            values = [fill if value is None else value for value in values]
+        return np.array(values, dtype=np.int64)
+    if kind == "float64":
+        return np.array(values, dtype=np.float64)
+    if kind == "epoch_ns":
+        import pandas as pd
+        return pd.to_datetime(pd.Series(values, dtype=object), utc=True).to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return np.array(values, dtype=object)
+
+
+def _empty_array(spec: ColumnSpec) -> np.ndarray:
+    kind, _ = spec
+    dtype = {"int64": np.int64, "float64": np.float64, "epoch_ns": np.int64}.get(kind, object)
+    return np.empty(0, dtype=dtype)
+
+
+def fetch_columns(db: Session, stmt: Select, specs: Dict[str, ColumnSpec]) -> Dict[str, np.ndarray]:
+    """
+    Ejecuta un select() y regresa sus columnas como arreglos de NumPy.
+
+    Parameters:
+    - db: Session used only for its connection (no ORM entities are loaded).
+    - stmt: Core select whose selected columns are labeled as the keys of specs, in order.
+    - specs: Column name -> (kind, fill), see the module notes.
+
+    Returns:
+    - Dict[str, np.ndarray]: One aligned array per column (empty arrays if there are no rows).
+    """
+    names = list(specs)
+    blocks = {name: [] for name in names}
+    result = db.execute(stmt.execution_options(yield_per=FETCH_BLOCK_SIZE))
+    for partition in result.partitions():
+        for name, values in zip(names, zip(*partition)):
+            blocks[name].append(_to_array(values, specs[name]))
+
+    columns = {}
+    for name in names:
+        if not blocks[name]:
+            columns[name] = _empty_array(specs[name])
+        elif len(blocks[name]) == 1:
+            columns[name] = blocks[name][0]
+        else:
+            columns[name] = np.concatenate(blocks[name])
+    return columns
+
+
+def rows_to_columns(rows: Sequence[Sequence[Any]], specs: Dict[str, ColumnSpec]) -> Dict[str, np.ndarray]:
+    """
+    Las mismas columnas que fetch_columns(), a partir de renglones ya leídos. Las rutas
+    asíncronas leen en el event loop y hacen esta conversión en el threadpool.
+    """
+    if not rows:
+        return {name: _empty_array(spec) for name, spec in specs.items()}
+    return {name: _to_array(values, specs[name]) for name, values in zip(specs, zip(*rows))}
+
+
+POLICE_INCIDENT_SPECS: Dict[str, ColumnSpec] = {
+    "incident_id": ("int64", None),
+    "police_id": ("float64", None),
+    "status_id": ("float64", None),
+    "vector_id": ("float64", None),
+    "zone_id": ("float64", None),
+    "attention_time": ("object", None),
+    "attention_time_seconds": ("float64", None),
+}
+
+
+def police_incident_query(police_id: int, in_database: bool) -> Select:
+    """
+    Select de las columnas de police_incident_columns().
+
+    Parameters:
+    - in_database: Whether Postgres computes attention_time_seconds (see services/attention_time.py).
+    """
+    return select(
+        SecurityIncident.id.label("incident_id"),
+        SecurityIncident.police_id,
+        SecurityIncident.status_id,
+        SecurityIncident.vector_id,
+        SecurityIncident.zone_id,
+        SecurityIncident.atention_time.label("attention_time"),
+        (attention_seconds_sql() if in_database else SecurityIncident.atention_time).label("attention_time_seconds")
+    ).where(SecurityIncident.police_id == police_id)
+
+
+def _police_incident_specs(in_database: bool) -> Dict[str, ColumnSpec]:
+    if in_database:
+        return POLICE_INCIDENT_SPECS
+    return {**POLICE_INCIDENT_SPECS, "attention_time_seconds": ("object", None)}
+
+
+def _parse_police_incident_columns(columns: Dict[str, np.ndarray], in_database: bool) -> Dict[str, np.ndarray]:
+    if not in_database:
+        columns["attention_time_seconds"] = parse_attention_seconds(columns["attention_time_seconds"])
+    return columns
+
+
+def police_incident_columns(db: Session, police_id: int) -> Dict[str, np.ndarray]:
+    """
+    Columnas de todos los incidentes de un policía que usa el análisis de tiempos de atención.
+
+    attention_time_seconds is computed by Postgres (see services/attention_time.py); other
+    databases get it parsed here, vectorized over the whole column.
+    """
+    in_database = db.get_bind().dialect.name == "postgresql"
+    columns = fetch_columns(db, police_incident_query(police_id, in_database), _police_incident_specs(in_database))
+    return _parse_police_incident_columns(columns, in_database)
+
+
+def police_incident_rows_to_columns(rows: Sequence[Sequence[Any]], in_database: bool) -> Dict[str, np.ndarray]:
+    """police_incident_columns() a partir de los renglones de police_incident_query() ya leídos."""
+    return _parse_police_incident_columns(rows_to_columns(rows, _police_incident_specs(in_database)), in_database)
+
+
+TRACKING_STATE_SPECS: Dict[str, ColumnSpec] = {
+    "incident_id": ("int64", -1),
+    "status_id": ("int64", -1),
+    "created_at_ns": ("epoch_ns", None),
+}
+
+
+def tracking_state_query(stmt: Optional[Select] = None, incident_id: Optional[int] = None) -> Select:
+    """
+    Select de tracking_state_columns(), ordenado por incidente y fecha.
+
+    Parameters:
+    - stmt: Optional select of the three columns with extra filters/joins; it must keep that
+      column order. Defaults to every tracking state.
+    - incident_id: Restrict to one incident.
+    """
+    if stmt is None:
+        stmt = select(
+            SecurityIncidentTrackingState.incident_id,
+            SecurityIncidentTrackingState.status_id,
+            SecurityIncidentTrackingState.created_at.label("created_at_ns")
+        )
+    if incident_id is not None:
+        stmt = stmt.where(SecurityIncidentTrackingState.incident_id == incident_id)
+    return stmt.order_by(SecurityIncidentTrackingState.incident_id, SecurityIncidentTrackingState.created_at)
+
+
+def tracking_state_columns(db: Session, stmt: Optional[Select] = None, incident_id: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Columnas (incident_id, status_id, created_at) de tracking states ordenados por incidente y fecha.
+
+    Parameters: as tracking_state_query().
+
+    Missing status_id/incident_id are returned as -1.
+    """
+    return fetch_columns(db, tracking_state_query(stmt, incident_id), TRACKING_STATE_SPECS)
@@ -0,0 +1,137 @@
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+"""
+Presupuestos de tiempo (deadlines) para las consultas de los análisis.
+
+Cada ruta tiene un presupuesto en milisegundos (QUERY_BUDGET_*_MS en settings.py) que se
+aplica como statement_timeout de Postgres en la transacción de la sesión. Si una consulta
+lo excede, Postgres la cancela y el cliente recibe 504 con el tiempo transcurrido; si no
+hay conexiones libres en el pool a tiempo, recibe 503. Así una consulta lenta no retiene
+una conexión ni un hilo por tiempo indefinido.
+
+Se usa así:
+
+    with query_deadline(db, settings.QUERY_BUDGET_POLICE_ANALYSIS_MS) as deadline:
+        ... consultas ...
+        deadline.refresh()   # opcional: lo que queda del presupuesto para las siguientes
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+# SQLSTATE of a statement cancelled by statement_timeout
+QUERY_CANCELED = "57014"
+
+_SET_STATEMENT_TIMEOUT = text("SELECT set_config('statement_timeout', :timeout, true)")
+
+
+class Deadline:
+    """
+    Presupuesto de tiempo de un bloque de consultas.
+
+    Parameters:
+    - budget_ms: Total milliseconds for every query in the block.
+    """
+
+    def __init__(self, budget_ms: int):
+        self.budget_ms = budget_ms
+        self.started = time.monotonic()
+
+    @property
+    def elapsed_ms(self) -> int:
+        return int((time.monotonic() - self.started) * 1000)
+
+    def remaining_ms(self) -> int:
+        """Milisegundos que quedan; lanza 504 si el presupuesto ya se agotó."""
+        remaining = self.budget_ms - self.elapsed_ms
+        if remaining <= 0:
+            raise self.exceeded()
+        return remaining
+
+    def exceeded(self) -> HTTPException:
+        return HTTPException(status_code=504, detail={
+            "message": "The analysis query exceeded its time budget and was cancelled",
+            "elapsed_ms": self.elapsed_ms,
+            "budget_ms": self.budget_ms
+        })
+
+    def busy(self) -> HTTPException:
+        return HTTPException(status_code=503, headers={"Retry-After": "5"}, detail={
+            "message": "No database connection available, try again later",
+            "elapsed_ms": self.elapsed_ms,
+            "budget_ms": self.budget_ms
+        })
+
+    def translate(self, error: Exception) -> Optional[HTTPException]:
+        """HTTPException que corresponde a un error de la base de datos, o None."""
+        if isinstance(error, PoolTimeoutError):
+            return self.busy()
+        if isinstance(error, DBAPIError):
+            orig = error.orig
+            if getattr(orig, "pgcode", None) == QUERY_CANCELED or getattr(orig, "sqlstate", None) == QUERY_CANCELED:
+                return self.exceeded()
+        return None
+
+
+class SessionDeadline(Deadline):
+    def __init__(self, db: Session, budget_ms: int):
+        super().__init__(budget_ms)
+        self.db = db
+
+    def refresh(self) -> None:
+        """Ajusta statement_timeout a lo que queda del presupuesto."""
+        if self.db.get_bind().dialect.name == "postgresql":
+            self.db.execute(_SET_STATEMENT_TIMEOUT, {"timeout": str(self.remaining_ms())})
+
+
+class AsyncSessionDeadline(Deadline):
+    def __init__(self, db: AsyncSession, budget_ms: int):
+        super().__init__(budget_ms)
+        self.db = db
+
+    async def refresh(self) -> None:
+        """Ajusta statement_timeout a lo que queda del presupuesto."""
+        if self.db.get_bind().dialect.name == "postgresql":
+            await self.db.execute(_SET_STATEMENT_TIMEOUT, {"timeout": str(self.remaining_ms())})
+
+
+@contextmanager
+def query_deadline(db: Session, budget_ms: int):
+    """
+    Aplica un presupuesto de tiempo a las consultas de una sesión síncrona.
+
+    The timeout is transaction-local (set_config(..., true)), so it is discarded when the
+    session ends its transaction and the connection goes back to the pool.
+    """
+    deadline = SessionDeadline(db, budget_ms)
+    try:
+        deadline.refresh()
+        yield deadline
+    except (DBAPIError, PoolTimeoutError) as error:
+        http_error = deadline.translate(error)
+        if http_error is None:
+            raise
+        db.rollback()
+        raise http_error from error
+
+
+@asynccontextmanager
+async def async_query_deadline(db: AsyncSession, budget_ms: int):
+    """Igual que query_deadline() para una AsyncSession."""
+    deadline = AsyncSessionDeadline(db, budget_ms)
+    try:
+        await deadline.refresh()
+        yield deadline
+    except (DBAPIError, PoolTimeoutError) as error:
+        http_error = deadline.translate(error)
+        if http_error is None:
+            raise
+        await db.rollback()
+        raise http_error from error
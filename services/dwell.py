@@ -0,0 +1,115 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+"""
+Cálculo vectorizado del tiempo que pasa cada incidente en cada status (dwell time).
+
+En lugar de recorrer incidente por incidente con pandas shift(-1)/groupby, todos los
+tracking states ordenados por (incident_id, created_at) se procesan de una sola vez:
+el tiempo de cada renglón es la diferencia con el siguiente renglón del mismo incidente,
+y las sumas por (incidente, status) se obtienen con np.add.reduceat sobre segmentos.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+# Statuses hidden in the police view of an incident (Assignment and the monitor's Close)
+POLICE_VIEW_EXCLUDED_STATUS_IDS = (1, 6, 10)
+
+# Placeholder for tracking states without status_id; dropped after the diff
+_NO_STATUS = -1
+
+
+def segment_dwell(
+    incident_ids: np.ndarray,
+    status_ids: np.ndarray,
+    created_at_ns: np.ndarray,
+    excluded_status_ids: Optional[Sequence[int]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Calcula el tiempo por (incidente, status) para muchos incidentes a la vez.
+
+    Parameters:
+    - incident_ids: int64 array, sorted by incident and then by created_at.
+    - status_ids: int64 array aligned with incident_ids (-1 for missing status).
+    - created_at_ns: int64 array of UTC epoch nanoseconds aligned with incident_ids.
+    - excluded_status_ids: Statuses removed before computing the differences (police view).
+
+    Returns:
+    - Dict of aligned arrays: incident_id, status_id, seconds and first_seen_ns
+      (earliest occurrence of that status in the incident). The last state of each
+      incident counts 0 seconds, like the per-incident analysis.
+    """
+    if excluded_status_ids:
+        keep = ~np.isin(status_ids, excluded_status_ids)
+        incident_ids, status_ids, created_at_ns = incident_ids[keep], status_ids[keep], created_at_ns[keep]
+
+    n = len(incident_ids)
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return {"incident_id": empty, "status_id": empty, "seconds": np.empty(0), "first_seen_ns": empty}
+
+    # Time to the next state of the same incident; 0 at the end of each incident
+    dwell = np.zeros(n, dtype=np.float64)
+    same_incident = incident_ids[1:] == incident_ids[:-1]
+    dwell[:-1] = np.where(same_incident, np.diff(created_at_ns) / 1e9, 0.0)
+
+    # Regroup rows by (incident, status, time) and sum each contiguous segment
+    order = np.lexsort((created_at_ns, status_ids, incident_ids))
+    incident_sorted = incident_ids[order]
+    status_sorted = status_ids[order]
+    segment_change = (incident_sorted[1:] != incident_sorted[:-1]) | (status_sorted[1:] != status_sorted[:-1])
+    starts = np.concatenate(([0], np.flatnonzero(segment_change) + 1))
+
+    result = {
+        "incident_id": incident_sorted[starts],
+        "status_id": status_sorted[starts],
+        "seconds": np.add.reduceat(dwell[order], starts),
+        "first_seen_ns": created_at_ns[order][starts],
+    }
+    has_status = result["status_id"] != _NO_STATUS
+    return {name: values[has_status] for name, values in result.items()}
+
+
+def status_distributions(dwell: Dict[str, np.ndarray], status_names: Dict[int, str]) -> List[Dict[str, Any]]:
+    """
+    Resume el resultado de segment_dwell() en una distribución por status.
+
+    Parameters:
+    - dwell: Output of segment_dwell().
+    - status_names: Mapping status_id -> name.
+
+    Returns:
+    - One dict per status with the number of incidents that went through it and the
+      total, mean, median, p90 and max seconds per incident, plus its share of all time.
+    """
+    status_ids = dwell["status_id"]
+    seconds = dwell["seconds"]
+    if len(status_ids) == 0:
+        return []
+
+    order = np.argsort(status_ids, kind="stable")
+    status_sorted = status_ids[order]
+    seconds_sorted = seconds[order]
+    starts = np.concatenate(([0], np.flatnonzero(status_sorted[1:] != status_sorted[:-1]) + 1))
+    ends = np.append(starts[1:], len(status_sorted))
+    totals = np.add.reduceat(seconds_sorted, starts)
+    grand_total = totals.sum()
+
+    distributions = []
+    # One iteration per distinct status (a handful), never per incident
+    for start, end, total in zip(starts, ends, totals):
+        status_id = int(status_sorted[start])
+        p50, p90 = np.percentile(seconds_sorted[start:end], [50, 90])
+        distributions.append({
+            "status_id": status_id,
+            "status_name": status_names.get(status_id),
+            "incidents": int(end - start),
+            "total_seconds": float(total),
+            "mean_seconds": float(total / (end - start)),
+            "median_seconds": float(p50),
+            "p90_seconds": float(p90),
+            "max_seconds": float(seconds_sorted[start:end].max()),
+            "percentage": float(total / grand_total * 100) if grand_total else 0.0,
+        })
+    return distributions
@@ -0,0 +1,195 @@
+import csv
+import io
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Boolean, DateTime, Float, Integer, Numeric
+from sqlalchemy.sql import ColumnElement, Select
+
+from config.db import SessionLocal
+from settings import settings
+
+"""
+Exportación masiva (NDJSON / CSV / Arrow IPC / Parquet) con cursores del lado del servidor.
+
+La consulta se ejecuta con stream_results + yield_per: psycopg2 usa un cursor con nombre,
+así que Postgres envía los renglones por bloques de EXPORT_BATCH_SIZE y en memoria solo
+vive el bloque actual. Cada bloque se codifica y se manda con StreamingResponse, sin
+listas completas ni modelos de Pydantic, de modo que la memoria no crece con el tamaño
+de la exportación.
+
+El generador abre su propia sesión: la sesión de la dependencia get_db() se cierra antes
+de que termine de enviarse una respuesta en streaming.
+
+Arrow y Parquet se arman por columnas: cada bloque del cursor se convierte en un
+RecordBatch con el esquema derivado de los tipos de SQLAlchemy (timestamps en UTC con su
+zona horaria), así que el cliente lo carga con pyarrow/pandas sin parsear renglón por
+renglón. pyarrow es opcional: si no está instalado esos formatos responden 501.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+Encoder = Callable[[List[ColumnElement], Iterator[Sequence[Tuple]]], Iterator[bytes]]
+
+
+def _ndjson(columns: List[ColumnElement], partitions: Iterator[Sequence[Tuple]]) -> Iterator[bytes]:
+    """Un objeto JSON por renglón; datetimes en ISO 8601."""
+    names = [column.name for column in columns]
+    for rows in partitions:
+        yield b"".join(orjson.dumps(dict(zip(names, row))) + b"\n" for row in rows)
+
+
+def _csv(columns: List[ColumnElement], partitions: Iterator[Sequence[Tuple]]) -> Iterator[bytes]:
+    """CSV con encabezado; NULL como campo vacío."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in columns])
+    for rows in partitions:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _arrow_schema(columns: List[ColumnElement]):
+    """Esquema de Arrow equivalente a los tipos de SQLAlchemy de las columnas."""
+    import pyarrow as pa
+
+    fields = []
+    for column in columns:
+        if isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us", tz="UTC") if column.type.timezone else pa.timestamp("us")
+        elif isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, (Float, Numeric)):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type, nullable=getattr(column, "nullable", True)))
+    return pa.schema(fields)
+
+
+def _record_batches(columns: List[ColumnElement], partitions: Iterator[Sequence[Tuple]]):
+    """Esquema y generador de RecordBatch, uno por bloque del cursor."""
+    import pyarrow as pa
+
+    schema = _arrow_schema(columns)
+
+    def batches():
+        for rows in partitions:
+            values = list(zip(*rows))
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(column_values, type=field.type) for column_values, field in zip(values, schema)],
+                schema=schema
+            )
+
+    return schema, batches()
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Archivo de solo escritura que entrega lo escrito por pedazos (drain()).
+
+    tell() reports the total bytes written, which the Parquet writer needs for its footer offsets.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow(columns: List[ColumnElement], partitions: Iterator[Sequence[Tuple]]) -> Iterator[bytes]:
+    """Arrow IPC stream: el esquema y después un RecordBatch por bloque."""
+    import pyarrow as pa
+
+    schema, batches = _record_batches(columns, partitions)
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _parquet(columns: List[ColumnElement], partitions: Iterator[Sequence[Tuple]]) -> Iterator[bytes]:
+    """Parquet con un row group por bloque; el footer se envía al final."""
+    import pyarrow.parquet as pq
+
+    schema, batches = _record_batches(columns, partitions)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+# format -> (media type, file extension, encoder)
+FORMATS: Dict[str, Tuple[str, str, Encoder]] = {
+    "ndjson": ("application/x-ndjson", "ndjson", _ndjson),
+    "csv": ("text/csv; charset=utf-8", "csv", _csv),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows", _arrow),
+    "parquet": ("application/vnd.apache.parquet", "parquet", _parquet),
+}
+
+# Formats that need the optional pyarrow dependency
+ARROW_FORMATS = ("arrow", "parquet")
+
+
+def stream_rows(stmt: Select, encoder: Encoder) -> Iterator[bytes]:
+    """
+    Ejecuta stmt con un cursor del servidor y produce los bytes codificados bloque por bloque.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=settings.EXPORT_BATCH_SIZE))
+        yield from encoder(list(stmt.selected_columns), result.partitions())
+    finally:
+        db.close()
+
+
+def export_response(stmt: Select, format: str, filename: str) -> StreamingResponse:
+    """
+    StreamingResponse con la exportación de stmt en el formato pedido (ver FORMATS).
+
+    Parameters:
+    - stmt: Core select() of the exported columns, already filtered and ordered.
+    - format: A key of FORMATS.
+    - filename: Download name without extension.
+
+    Raises:
+    - 501 Not Implemented: If an Arrow format is requested and pyarrow is not installed.
+    """
+    if format in ARROW_FORMATS:
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail=f"The {format} format requires pyarrow, which is not installed")
+    media_type, extension, encoder = FORMATS[format]
+    return StreamingResponse(
+        stream_rows(stmt, encoder),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'}
+    )
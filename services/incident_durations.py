@@ -0,0 +1,439 @@
+import logging
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+
+from config.db import SessionLocal
+from models.incident_durations import IncidentStatusDuration, IncidentTimelineTail
+from models.police_summary import AnalysisWatermark
+from models.security_incidenttrackingstate import SecurityIncidentTrackingState
+from services.columnar import fetch_columns, tracking_state_columns
+from services.deadlines import QUERY_CANCELED
+from services.dwell import POLICE_VIEW_EXCLUDED_STATUS_IDS, segment_dwell
+from services.watermarks import lock_watermark
+from settings import settings
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+"""
+Materialización incremental del tiempo por status de cada incidente.
+
+Los incidentes cerrados no cambian, pero su línea de tiempo se recalculaba completa en
+cada análisis. materialize() consume los tracking states nuevos en orden de id (después de
+la marca guardada en analysis_watermark) y mantiene analysis_incident_status_duration por
+(incidente, vista, status), para las vistas "full" y "police" (sin 1, 6 y 10).
+
+De cada incidente se guarda además su último state por vista (analysis_incident_timeline_tail):
+es el segmento abierto, cuya duración todavía no se conoce. Cuando llega un state nuevo,
+se calcula con segment_dwell() sobre [último state guardado + states nuevos], lo que suma
+el segmento que se cierra y deja como nuevo tail el último state; los incidentes que no
+reciben states nuevos no se tocan.
+
+Un incidente se recalcula completo (con todos sus states hasta el id procesado) cuando:
+- llega un state con created_at anterior a su tail (llegó fuera de orden),
+- su número de states no coincide con lo procesado (un id menor hizo commit tarde), o
+- uno de sus states ya procesados se editó: cada corrida busca los states con updated_at
+  desde la marca anterior (analysis_watermark.updated_at) y recalcula los incidentes cuyo
+  último updated_at no es el que se materializó.
+
+Las rutas de análisis usan la tabla solo si está al día para ese incidente (la marca cubre
+su último id, y el conteo de states y el último updated_at coinciden); si no, o si las
+tablas no existen todavía, calculan como siempre.
+
+Se ejecuta en un hilo de fondo (services/background.py) o desde cron con:
+
+    python -m services.incident_durations [--full]
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "incident_status_durations"
+
+# View name -> statuses excluded before computing times (same views as /durations)
+VIEWS: Dict[str, Optional[Sequence[int]]] = {
+    "full": None,
+    "police": POLICE_VIEW_EXCLUDED_STATUS_IDS,
+}
+
+NEW_STATE_SPECS = {
+    "id": ("int64", None),
+    "incident_id": ("int64", -1),
+    "status_id": ("int64", -1),
+    "created_at_ns": ("epoch_ns", None),
+    "updated_at_ns": ("epoch_ns", None),
+}
+
+DurationKey = Tuple[int, str, int]
+TailKey = Tuple[int, str]
+
+
+def _new_states(db: Session, after_id: int, limit: int) -> Dict[str, np.ndarray]:
+    """Siguiente bloque de tracking states con id > after_id, en orden de id."""
+    stmt = select(
+        SecurityIncidentTrackingState.id,
+        SecurityIncidentTrackingState.incident_id,
+        SecurityIncidentTrackingState.status_id,
+        SecurityIncidentTrackingState.created_at.label("created_at_ns"),
+        SecurityIncidentTrackingState.updated_at.label("updated_at_ns")
+    ).where(
+        SecurityIncidentTrackingState.id > after_id,
+        SecurityIncidentTrackingState.incident_id.isnot(None)
+    ).order_by(SecurityIncidentTrackingState.id).limit(limit)
+    return fetch_columns(db, stmt, NEW_STATE_SPECS)
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _epoch_ns(value: datetime) -> int:
+    # Same conversion as the "epoch_ns" columns (naive timestamps are UTC), without pandas:
+    # the async routes call it on the event loop
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def _last_updated(db: Session, incident_ids: Sequence[int], max_id: int) -> Dict[int, int]:
+    """Último updated_at (epoch ns) de los states de cada incidente hasta max_id."""
+    rows = db.execute(
+        select(SecurityIncidentTrackingState.incident_id, func.max(SecurityIncidentTrackingState.updated_at))
+        .where(SecurityIncidentTrackingState.incident_id.in_(incident_ids), SecurityIncidentTrackingState.id <= max_id)
+        .group_by(SecurityIncidentTrackingState.incident_id)
+    ).all()
+    return {incident_id: _epoch_ns(updated_at) for incident_id, updated_at in rows}
+
+
+def _view_mask(status_ids: np.ndarray, view: str) -> np.ndarray:
+    excluded = VIEWS[view]
+    if not excluded:
+        return np.ones(len(status_ids), dtype=bool)
+    return ~np.isin(status_ids, excluded)
+
+
+def _accumulate(
+    view: str,
+    incident_ids: np.ndarray,
+    status_ids: np.ndarray,
+    created_at_ns: np.ndarray,
+    durations: Dict[DurationKey, IncidentStatusDuration],
+    tails: Dict[TailKey, IncidentTimelineTail],
+    last_updated: Dict[int, int],
+    db: Session
+) -> None:
+    """
+    Suma a durations los tiempos de los states dados (de una sola vista) y mueve los tails.
+
+    The existing tail of each incident is prepended, so the open segment is closed by the first
+    new state; the last state of each incident becomes its new tail. last_updated has the
+    latest updated_at (epoch ns) of each incident's states, kept on its tail.
+    """
+    new_counts = dict(zip(*np.unique(incident_ids, return_counts=True)))
+    prior = [tails[(incident_id, view)] for incident_id in new_counts if (incident_id, view) in tails]
+    incident_ids = np.concatenate((np.array([tail.incident_id for tail in prior], dtype=np.int64), incident_ids))
+    status_ids = np.concatenate((np.array([tail.status_id for tail in prior], dtype=np.int64), status_ids))
+    created_at_ns = np.concatenate((np.array([tail.created_at_ns for tail in prior], dtype=np.int64), created_at_ns))
+    if not len(incident_ids):
+        return
+
+    # Stable sort: on equal created_at the stored tail stays before the new states
+    order = np.lexsort((created_at_ns, incident_ids))
+    incident_ids, status_ids, created_at_ns = incident_ids[order], status_ids[order], created_at_ns[order]
+
+    dwell = segment_dwell(incident_ids, status_ids, created_at_ns)
+    for incident_id, status_id, seconds, first_seen_ns in zip(
+        dwell["incident_id"].tolist(), dwell["status_id"].tolist(),
+        dwell["seconds"].tolist(), dwell["first_seen_ns"].tolist()
+    ):
+        row = durations.get((incident_id, view, status_id))
+        if row is None:
+            row = IncidentStatusDuration(
+                incident_id=incident_id, view=view, status_id=status_id, seconds=0.0, first_seen_ns=first_seen_ns
+            )
+            durations[(incident_id, view, status_id)] = row
+            db.add(row)
+        row.seconds += seconds
+        row.first_seen_ns = min(row.first_seen_ns, first_seen_ns)
+
+    last_rows = np.append(np.flatnonzero(incident_ids[1:] != incident_ids[:-1]), len(incident_ids) - 1)
+    for incident_id, status_id, created_ns in zip(
+        incident_ids[last_rows].tolist(), status_ids[last_rows].tolist(), created_at_ns[last_rows].tolist()
+    ):
+        tail = tails.get((incident_id, view))
+        if tail is None:
+            tail = IncidentTimelineTail(incident_id=incident_id, view=view, state_count=0)
+            tails[(incident_id, view)] = tail
+            db.add(tail)
+        tail.status_id = status_id
+        tail.created_at_ns = created_ns
+        tail.state_count += int(new_counts.get(incident_id, 0))
+        tail.last_updated_ns = max(tail.last_updated_ns or 0, last_updated.get(incident_id, 0))
+
+
+def _recompute(db: Session, incident_ids: Set[int], max_id: int) -> None:
+    """Reconstruye desde cero las duraciones de unos incidentes con sus states hasta max_id."""
+    ids = sorted(incident_ids)
+    db.execute(delete(IncidentStatusDuration).where(IncidentStatusDuration.incident_id.in_(ids)))
+    db.execute(delete(IncidentTimelineTail).where(IncidentTimelineTail.incident_id.in_(ids)))
+    stmt = select(
+        SecurityIncidentTrackingState.incident_id,
+        SecurityIncidentTrackingState.status_id,
+        SecurityIncidentTrackingState.created_at.label("created_at_ns")
+    ).where(SecurityIncidentTrackingState.incident_id.in_(ids), SecurityIncidentTrackingState.id <= max_id)
+    columns = tracking_state_columns(db, stmt)
+    last_updated = _last_updated(db, ids, max_id)
+    for view in VIEWS:
+        keep = _view_mask(columns["status_id"], view)
+        _accumulate(
+            view, columns["incident_id"][keep], columns["status_id"][keep], columns["created_at_ns"][keep],
+            durations={}, tails={}, last_updated=last_updated, db=db
+        )
+
+
+def _apply_batch(db: Session, states: Dict[str, np.ndarray]) -> int:
+    """Aplica un bloque de states nuevos; regresa cuántos incidentes se recalcularon completos."""
+    import pandas as pd
+
+    max_id = int(states["id"].max())
+    touched = np.unique(states["incident_id"]).tolist()
+
+    tails: Dict[TailKey, IncidentTimelineTail] = {
+        (tail.incident_id, tail.view): tail
+        for tail in db.scalars(select(IncidentTimelineTail).where(IncidentTimelineTail.incident_id.in_(touched)))
+    }
+
+    # Incidents whose new states are out of order, or that miss a state committed late
+    actual_counts = dict(db.execute(
+        select(SecurityIncidentTrackingState.incident_id, func.count())
+        .where(SecurityIncidentTrackingState.incident_id.in_(touched), SecurityIncidentTrackingState.id <= max_id)
+        .group_by(SecurityIncidentTrackingState.incident_id)
+    ).all())
+    new_counts = dict(zip(*np.unique(states["incident_id"], return_counts=True)))
+    earliest_new = pd.Series(states["created_at_ns"]).groupby(states["incident_id"]).min().to_dict()
+    last_updated = pd.Series(states["updated_at_ns"]).groupby(states["incident_id"]).max().to_dict()
+    recompute = set()
+    for incident_id in touched:
+        tail = tails.get((incident_id, "full"))
+        stored = tail.state_count if tail is not None else 0
+        if actual_counts.get(incident_id, 0) != stored + new_counts[incident_id]:
+            recompute.add(incident_id)
+        elif tail is not None and (earliest_new[incident_id] < tail.created_at_ns or tail.last_updated_ns is None):
+            # Out of order, or materialized before last_updated_ns existed
+            recompute.add(incident_id)
+
+    if recompute:
+        _recompute(db, recompute, max_id)
+
+    incremental = ~np.isin(states["incident_id"], list(recompute))
+    if incremental.any():
+        incremental_ids = np.unique(states["incident_id"][incremental]).tolist()
+        durations: Dict[DurationKey, IncidentStatusDuration] = {
+            (row.incident_id, row.view, row.status_id): row
+            for row in db.scalars(
+                select(IncidentStatusDuration).where(IncidentStatusDuration.incident_id.in_(incremental_ids))
+            )
+        }
+        order = np.lexsort((states["created_at_ns"], states["incident_id"]))
+        incident_ids = states["incident_id"][order]
+        status_ids = states["status_id"][order]
+        created_at_ns = states["created_at_ns"][order]
+        incremental = incremental[order]
+        for view in VIEWS:
+            keep = incremental & _view_mask(status_ids, view)
+            _accumulate(view, incident_ids[keep], status_ids[keep], created_at_ns[keep], durations, tails, last_updated, db)
+    return len(recompute)
+
+
+def _recompute_edited(db: Session, watermark: AnalysisWatermark) -> int:
+    """
+    Recalcula los incidentes con states ya procesados que se editaron (updated_at desde la
+    marca y distinto del materializado); regresa cuántos.
+    """
+    # >= so states committed with the same timestamp as the previous mark are not missed
+    edited = dict(db.execute(
+        select(SecurityIncidentTrackingState.incident_id, func.max(SecurityIncidentTrackingState.updated_at))
+        .where(
+            SecurityIncidentTrackingState.updated_at >= watermark.updated_at,
+            SecurityIncidentTrackingState.id <= watermark.last_id,
+            SecurityIncidentTrackingState.incident_id.isnot(None)
+        )
+        .group_by(SecurityIncidentTrackingState.incident_id)
+    ).all())
+    recomputed = 0
+    incident_ids = sorted(edited)
+    for start in range(0, len(incident_ids), settings.INCIDENT_DURATIONS_BATCH_SIZE):
+        chunk = incident_ids[start:start + settings.INCIDENT_DURATIONS_BATCH_SIZE]
+        materialized = dict(db.execute(
+            select(IncidentTimelineTail.incident_id, IncidentTimelineTail.last_updated_ns)
+            .where(IncidentTimelineTail.incident_id.in_(chunk), IncidentTimelineTail.view == "full")
+        ).all())
+        # Incidents just processed above already carry their latest updated_at
+        stale = {incident_id for incident_id in chunk if materialized.get(incident_id) != _epoch_ns(edited[incident_id])}
+        if stale:
+            # A full re-read also drops rows whose status_id moved to another view
+            _recompute(db, stale, watermark.last_id)
+            recomputed += len(stale)
+    return recomputed
+
+
+def materialize(db: Optional[Session] = None, full: bool = False, wait: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Procesa los tracking states nuevos desde la última marca.
+
+    Parameters:
+    - db: Optional session; a new one is opened otherwise.
+    - full: Drop the materialized tables and rebuild them from scratch.
+    - wait: Wait for a run already in progress; with False return None instead.
+
+    Returns:
+    - Dict with the states read, the incidents recomputed from scratch (out of order or late,
+      and edited), the batches and the last id.
+    """
+    session = db if db is not None else SessionLocal()
+    try:
+        watermark = lock_watermark(session, WATERMARK_NAME, wait=wait)
+        if watermark is None:
+            return None
+        if full:
+            session.execute(delete(IncidentStatusDuration))
+            session.execute(delete(IncidentTimelineTail))
+            watermark.last_id = None
+            watermark.updated_at = None
+        # Taken before reading: edits made during this run are looked for again in the next one
+        latest_updated_at = session.scalar(select(func.max(SecurityIncidentTrackingState.updated_at)))
+
+        read, recomputed, batches = 0, 0, 0
+        while True:
+            states = _new_states(session, watermark.last_id or 0, settings.INCIDENT_DURATIONS_BATCH_SIZE)
+            if not len(states["id"]):
+                break
+            recomputed += _apply_batch(session, states)
+            read += len(states["id"])
+            batches += 1
+            watermark.last_id = int(states["id"].max())
+            # Commit each batch: the tables are usable while a long first build goes on
+            watermark.refreshed_at = datetime.now(timezone.utc)
+            session.commit()
+            if len(states["id"]) < settings.INCIDENT_DURATIONS_BATCH_SIZE:
+                break
+            watermark = lock_watermark(session, WATERMARK_NAME)
+
+        edited = 0
+        if watermark.updated_at is not None and watermark.last_id is not None:
+            edited = _recompute_edited(session, watermark)
+        # First run (or --full): every state was just read, nothing to look back for
+        watermark.updated_at = latest_updated_at
+        watermark.refreshed_at = datetime.now(timezone.utc)
+        session.commit()
+        return {
+            "states_read": read,
+            "incidents_recomputed": recomputed,
+            "incidents_edited": edited,
+            "batches": batches,
+            "last_id": watermark.last_id,
+            "refreshed_at": watermark.refreshed_at
+        }
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        if db is None:
+            session.close()
+
+
+def materialized_status_rows(
+    db: Session,
+    incident_id: int,
+    view: str,
+    total_states: int,
+    last_updated_at: datetime,
+    last_id: int
+) -> Optional[list]:
+    """
+    Renglones (status_id, seconds, first_seen_ns) de la tabla materializada para un incidente.
+    Solo consultas: la ruta asíncrona la corre con run_sync() y arma el DataFrame en el threadpool.
+
+    Parameters:
+    - total_states / last_updated_at / last_id: Fingerprint of the incident's tracking states
+      (services.analysis.tracking_states_fingerprint_query()).
+
+    Returns:
+    - None when the table is not up to date for the incident (or has nothing for the view),
+      or when the materialized tables do not exist yet; the caller then computes from the
+      tracking states.
+    """
+    try:
+        # Savepoint: a failed read must not abort the transaction the fallback runs in
+        with db.begin_nested():
+            rows = _materialized_rows(db, incident_id, view, total_states, last_updated_at, last_id)
+    except (ProgrammingError, OperationalError) as error:
+        if QUERY_CANCELED in (getattr(error.orig, "pgcode", None), getattr(error.orig, "sqlstate", None)):
+            raise  # Out of time budget: query_deadline() answers 504
+        logger.warning("Materialized incident durations unavailable (%s); computing from tracking states",
+                       str(error.orig).splitlines()[0] if error.orig else error)
+        return None
+    return rows or None
+
+
+def materialized_status_frame(rows: Sequence[Tuple[int, float, int]]) -> "pd.DataFrame":
+    """El mismo DataFrame que services.analysis.status_time_frame(), a partir de materialized_status_rows()."""
+    status_ids, seconds, first_seen_ns = zip(*rows)
+    import pandas as pd
+
+    status_time = pd.DataFrame({
+        "status_id": np.array(status_ids, dtype=np.int64),
+        "time_spent": np.array(seconds, dtype=np.float64),
+        "created_at": pd.to_datetime(np.array(first_seen_ns, dtype=np.int64))
+    })
+    total_time = status_time['time_spent'].sum()
+    status_time['percentage'] = (status_time['time_spent'] / total_time) * 100
+    status_time['time_spent_minutes'] = status_time['time_spent'] / 60
+    return status_time.sort_values(by='created_at', ascending=True).reset_index(drop=True)
+
+
+def materialized_status_time(
+    db: Session,
+    incident_id: int,
+    view: str,
+    total_states: int,
+    last_updated_at: datetime,
+    last_id: int
+) -> Optional["pd.DataFrame"]:
+    """
+    El mismo DataFrame que services.analysis.status_time_frame(), leído de la tabla materializada.
+
+    Returns:
+    - None in the cases of materialized_status_rows().
+    """
+    rows = materialized_status_rows(db, incident_id, view, total_states, last_updated_at, last_id)
+    return None if rows is None else materialized_status_frame(rows)
+
+
+def _materialized_rows(
+    db: Session, incident_id: int, view: str, total_states: int, last_updated_at: datetime, last_id: int
+) -> list:
+    # Empty when the materialized tables are behind the incident's fingerprint
+    watermark = db.get(AnalysisWatermark, WATERMARK_NAME)
+    if watermark is None or watermark.last_id is None or watermark.last_id < last_id:
+        return []
+    tail = db.get(IncidentTimelineTail, (incident_id, "full"))
+    if tail is None or tail.state_count != total_states:
+        return []
+    if tail.last_updated_ns is None or tail.last_updated_ns != _epoch_ns(last_updated_at):
+        # A state was edited after the incident was materialized
+        return []
+    return db.execute(
+        select(IncidentStatusDuration.status_id, IncidentStatusDuration.seconds, IncidentStatusDuration.first_seen_ns)
+        .where(IncidentStatusDuration.incident_id == incident_id, IncidentStatusDuration.view == view)
+    ).all()
+
+
+if __name__ == "__main__":
+    print(materialize(full="--full" in sys.argv[1:]))
@@ -0,0 +1,178 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models.security_incident import SecurityIncident
+from services.attention_time import attention_seconds_sql, parse_attention_seconds
+from services.columnar import fetch_columns
+
+"""
+Ranking de policías por tiempo de atención (conteo, promedio, p50 y p90) en una sola pasada.
+
+En Postgres es una sola consulta agrupada por police_id con percentile_cont(...) WITHIN
+GROUP, ordenada y limitada (top-k) en la base de datos. En otras bases de datos se leen
+solo (police_id, segundos) como arreglos y se calcula con un kernel segmentado de NumPy:
+un lexsort por (policía, segundos) y los percentiles por interpolación lineal dentro de
+cada segmento, igual que percentile_cont y numpy.percentile. En ningún caso se recorre
+policía por policía.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+SORT_COLUMNS = ("p50", "p90", "mean", "count")
+
+
+def _incident_filters(
+    zone_id: Optional[int],
+    vector_id: Optional[int],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime]
+) -> list:
+    filters = [SecurityIncident.police_id.isnot(None)]
+    if zone_id is not None:
+        filters.append(SecurityIncident.zone_id == zone_id)
+    if vector_id is not None:
+        filters.append(SecurityIncident.vector_id == vector_id)
+    if date_from is not None:
+        filters.append(SecurityIncident.created_at >= date_from)
+    if date_to is not None:
+        filters.append(SecurityIncident.created_at < date_to)
+    return filters
+
+
+def _leaderboard_sql(db: Session, filters: list, sort_by: str, descending: bool, limit: int, min_incidents: int):
+    seconds = attention_seconds_sql()
+    valid = func.count(seconds)
+    columns = {
+        "count": valid.label("valid_incidents"),
+        "mean": func.avg(seconds).label("mean_seconds"),
+        "p50": func.percentile_cont(0.5).within_group(seconds).label("p50_seconds"),
+        "p90": func.percentile_cont(0.9).within_group(seconds).label("p90_seconds"),
+    }
+    sort_column = columns[sort_by]
+    stmt = select(
+        SecurityIncident.police_id,
+        func.count().label("total_incidents"),
+        columns["count"], columns["mean"], columns["p50"], columns["p90"],
+        func.count().over().label("total_officers")
+    ).where(*filters)\
+     .group_by(SecurityIncident.police_id)\
+     .having(valid >= min_incidents)\
+     .order_by(sort_column.desc() if descending else sort_column.asc(), SecurityIncident.police_id)\
+     .limit(limit)
+    rows = db.execute(stmt).mappings().all()
+    total_officers = rows[0]["total_officers"] if rows else 0
+    return [
+        {
+            "police_id": row["police_id"],
+            "total_incidents": row["total_incidents"],
+            "valid_incidents": row["valid_incidents"],
+            "mean_seconds": float(row["mean_seconds"]),
+            "p50_seconds": float(row["p50_seconds"]),
+            "p90_seconds": float(row["p90_seconds"]),
+        }
+        for row in rows
+    ], total_officers
+
+
+def segmented_percentiles(police_ids: np.ndarray, seconds: np.ndarray, quantiles) -> Dict[str, np.ndarray]:
+    """
+    Conteo, promedio y percentiles por policía de arreglos alineados (police_id, segundos).
+
+    Parameters:
+    - police_ids: int64 array.
+    - seconds: float64 array (NaN = invalid attention time, ignored).
+    - quantiles: Quantiles in 0..1, interpolated linearly like percentile_cont.
+
+    Returns:
+    - Dict of arrays, one entry per officer with valid data: police_id, count, mean and q<quantile>.
+    """
+    valid = ~np.isnan(seconds)
+    police_ids, seconds = police_ids[valid], seconds[valid]
+    if not len(police_ids):
+        empty = np.empty(0)
+        return {"police_id": np.empty(0, dtype=np.int64), "count": np.empty(0, dtype=np.int64), "mean": empty,
+                **{f"q{q}": empty for q in quantiles}}
+
+    order = np.lexsort((seconds, police_ids))
+    police_ids, seconds = police_ids[order], seconds[order]
+    starts = np.concatenate(([0], np.flatnonzero(police_ids[1:] != police_ids[:-1]) + 1))
+    counts = np.diff(np.append(starts, len(police_ids)))
+
+    result = {
+        "police_id": police_ids[starts],
+        "count": counts,
+        "mean": np.add.reduceat(seconds, starts) / counts,
+    }
+    for q in quantiles:
+        position = starts + q * (counts - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        result[f"q{q}"] = seconds[lower] + (seconds[upper] - seconds[lower]) * (position - lower)
+    return result
+
+
+def _leaderboard_numpy(db: Session, filters: list, sort_by: str, descending: bool, limit: int, min_incidents: int):
+    stmt = select(SecurityIncident.police_id, SecurityIncident.atention_time).where(*filters)
+    columns = fetch_columns(db, stmt, {"police_id": ("int64", None), "attention_time": ("object", None)})
+    seconds = parse_attention_seconds(columns["attention_time"])
+
+    officers, totals = np.unique(columns["police_id"], return_counts=True)
+    stats = segmented_percentiles(columns["police_id"], seconds, (0.5, 0.9))
+    keep = stats["count"] >= min_incidents
+    stats = {name: values[keep] for name, values in stats.items()}
+    total_incidents = totals[np.searchsorted(officers, stats["police_id"])]
+
+    key = {"p50": stats["q0.5"], "p90": stats["q0.9"], "mean": stats["mean"], "count": stats["count"]}[sort_by]
+    # Same order as the SQL path: by the metric, then by police_id
+    ranking = np.lexsort((stats["police_id"], -key if descending else key))[:limit]
+    return [
+        {
+            "police_id": int(stats["police_id"][i]),
+            "total_incidents": int(total_incidents[i]),
+            "valid_incidents": int(stats["count"][i]),
+            "mean_seconds": float(stats["mean"][i]),
+            "p50_seconds": float(stats["q0.5"][i]),
+            "p90_seconds": float(stats["q0.9"][i]),
+        }
+        for i in ranking
+    ], int(len(stats["police_id"]))
+
+
+def police_leaderboard(
+    db: Session,
+    zone_id: Optional[int] = None,
+    vector_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    sort_by: str = "p90",
+    descending: bool = True,
+    limit: int = 20,
+    min_incidents: int = 1,
+    method: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Ranking de policías por tiempo de atención de sus incidentes que cumplen el filtro.
+
+    Parameters:
+    - zone_id / vector_id: Only incidents of this zone / vector.
+    - date_from / date_to: Incident created_at range (inclusive start, exclusive end).
+    - sort_by: "p50", "p90", "mean" or "count" (valid incidents).
+    - descending: Slowest (or busiest) first.
+    - limit: Top-k officers returned.
+    - min_incidents: Officers with fewer valid attention times are left out.
+    - method: "sql" or "numpy"; defaults to SQL on Postgres and NumPy elsewhere.
+
+    Returns:
+    - Dict with the ranked officers and total_officers (officers that qualified before top-k).
+    """
+    if method is None:
+        method = "sql" if db.get_bind().dialect.name == "postgresql" else "numpy"
+    filters = _incident_filters(zone_id, vector_id, date_from, date_to)
+    compute = _leaderboard_sql if method == "sql" else _leaderboard_numpy
+    officers, total_officers = compute(db, filters, sort_by, descending, limit, min_incidents)
+    ranked: List[Dict[str, Any]] = [{"rank": rank, **officer} for rank, officer in enumerate(officers, 1)]
+    return {"sort_by": sort_by, "total_officers": total_officers, "officers": ranked}
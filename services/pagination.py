@@ -0,0 +1,72 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, tuple_
+
+"""
+Paginación por llave (keyset / cursor) sobre (created_at, id).
+
+En lugar de OFFSET, cada página pide los renglones que van después del último que vio el
+cliente: WHERE (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC.
+Con un índice sobre (filtro, created_at, id) cada página cuesta lo mismo sin importar la
+profundidad, y las páginas no se recorren cuando llegan incidentes nuevos.
+
+El cursor es opaco para el cliente (base64 de [created_at, id]); la siguiente página se
+regresa en el header X-Next-Cursor y el cuerpo sigue siendo la lista de siempre.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Cursor opaco que apunta al renglón (created_at, id)."""
+    raw = json.dumps([created_at.isoformat(), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Regresa (created_at, id) de un cursor.
+
+    Raises:
+    - 400 Bad Request: If the cursor was not produced by encode_cursor().
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def keyset_page(stmt: Select, model, cursor: Optional[str], limit: int, descending: bool = True) -> Select:
+    """
+    Ordena stmt por (created_at, id) y lo limita a la página que sigue al cursor.
+
+    Se pide un renglón de más (limit + 1) para saber si hay otra página; next_cursor() lo descarta.
+    """
+    key = tuple_(model.created_at, model.id)
+    if cursor is not None:
+        created_at, id = decode_cursor(cursor)
+        stmt = stmt.where(key < tuple_(created_at, id) if descending else key > tuple_(created_at, id))
+    if descending:
+        stmt = stmt.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        stmt = stmt.order_by(model.created_at.asc(), model.id.asc())
+    return stmt.limit(limit + 1)
+
+
+def next_cursor(rows: Sequence, limit: int, response: Response) -> list:
+    """
+    Recorta la página a limit renglones y, si hay más, pone el cursor de la siguiente en X-Next-Cursor.
+    """
+    rows = list(rows)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows
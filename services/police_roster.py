@@ -0,0 +1,233 @@
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from config.db import SessionLocal
+from models.security_police import SecurityPolice
+from models.security_zone import SecurityZone
+from schemas.security_police import SecurityPoliceResponse
+from settings import settings
+
+"""
+Roster en memoria de los policías (security_police) con el nombre de su zona, para
+GET /security_police/{id} y la consulta por lotes GET /security_police?ids=...&zone_id=...
+
+La primera consulta carga todos los policías y zonas. Después, cada
+POLICE_ROSTER_REFRESH_SECONDS, solo se leen los renglones con updated_at mayor o igual a la
+última marca vista (de security_police y de security_zone), así que las búsquedas
+repetidas se responden de memoria sin llegar a Postgres. Los borrados no dejan rastro en
+updated_at: se reflejan con la recarga completa cada POLICE_ROSTER_RELOAD_SECONDS o al
+invalidar el roster.
+
+Los registros publicados no se modifican: cada refresco arma un dict nuevo y lo sustituye,
+así las búsquedas leen sin tomar el lock.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+# Columns of the response that come straight from security_police (zone_name is joined in memory)
+POLICE_FIELDS = tuple(name for name in SecurityPoliceResponse.model_fields if name != "zone_name")
+
+
+class PoliceRoster:
+    """
+    Registros de policías por id, con la forma de SecurityPoliceResponse.
+
+    Parameters:
+    - refresh_seconds: Seconds between incremental refreshes (rows changed since the watermark).
+    - reload_seconds: Seconds between full reloads, which drop deleted officers.
+
+    Counters:
+    - hits: Lookups served from memory.
+    - refreshes: Incremental refreshes run.
+    - reloads: Full loads run.
+    """
+
+    # An unknown id re-checks the watermark at most this often (officers created since the last refresh)
+    MISS_RECHECK_SECONDS = 1.0
+
+    def __init__(self, refresh_seconds: float, reload_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.reload_seconds = reload_seconds
+        self.hits = 0
+        self.refreshes = 0
+        self.reloads = 0
+        self.version = 0
+        self._records: Optional[Dict[int, Dict[str, Any]]] = None
+        self._zone_of: Dict[int, Optional[int]] = {}
+        self._by_zone: Dict[Optional[int], List[int]] = {}
+        self._zone_names: Dict[int, Optional[str]] = {}
+        self._police_watermark = None
+        self._zone_watermark = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _police_rows(db: Session, since=None):
+        query = select(*(SecurityPolice.__table__.columns[name] for name in POLICE_FIELDS), SecurityPolice.zone_id)
+        if since is not None:
+            query = query.where(SecurityPolice.updated_at >= since)
+        return db.execute(query).all()
+
+    @staticmethod
+    def _zone_rows(db: Session, since=None):
+        query = select(SecurityZone.id, SecurityZone.name, SecurityZone.updated_at)
+        if since is not None:
+            query = query.where(SecurityZone.updated_at >= since)
+        return db.execute(query).all()
+
+    def _record(self, row, zone_names: Dict[int, Optional[str]]) -> Dict[str, Any]:
+        # Keys in SecurityPoliceResponse order, so the batch and by-id responses serialize alike
+        values = dict(zip(POLICE_FIELDS, row))
+        values["zone_name"] = zone_names.get(row.zone_id)
+        return {name: values[name] for name in SecurityPoliceResponse.model_fields}
+
+    def _publish(self, records: Dict[int, Dict[str, Any]], zone_of: Dict[int, Optional[int]], zone_names) -> None:
+        by_zone: Dict[Optional[int], List[int]] = {}
+        for police_id in sorted(zone_of):
+            by_zone.setdefault(zone_of[police_id], []).append(police_id)
+        self._records, self._zone_of, self._by_zone, self._zone_names = records, zone_of, by_zone, zone_names
+        self.version += 1
+
+    def _reload(self, db: Session, now: float) -> None:
+        zones = self._zone_rows(db)
+        rows = self._police_rows(db)
+        zone_names = {zone_id: name for zone_id, name, _ in zones}
+        records = {row.id: self._record(row, zone_names) for row in rows}
+        zone_of = {row.id: row.zone_id for row in rows}
+        self._zone_watermark = max((updated_at for _, _, updated_at in zones), default=None)
+        self._police_watermark = max((row.updated_at for row in rows), default=None)
+        self._publish(records, zone_of, zone_names)
+        self.reloads += 1
+        self._loaded_at = self._checked_at = now
+
+    def _refresh(self, db: Session, now: float) -> None:
+        zones = self._zone_rows(db, self._zone_watermark)
+        rows = self._police_rows(db, self._police_watermark)
+        self.refreshes += 1
+        self._checked_at = now
+
+        zone_names = self._zone_names
+        renamed = {zone_id for zone_id, name, _ in zones if zone_names.get(zone_id) != name}
+        changed = [row for row in rows if self._records.get(row.id) != self._record(row, zone_names)
+                   or self._zone_of.get(row.id) != row.zone_id]
+        # Every row read is at or after the previous watermark
+        if zones:
+            self._zone_watermark = max(updated_at for _, _, updated_at in zones)
+        if rows:
+            self._police_watermark = max(row.updated_at for row in rows)
+        if not renamed and not changed:
+            return
+
+        # Copy on write: readers keep using the previous dicts until the new ones are published
+        records, zone_of = dict(self._records), dict(self._zone_of)
+        if renamed:
+            zone_names = dict(zone_names)
+            zone_names.update({zone_id: name for zone_id, name, _ in zones})
+            for police_id, zone_id in zone_of.items():
+                if zone_id in renamed:
+                    records[police_id] = {**records[police_id], "zone_name": zone_names.get(zone_id)}
+        for row in changed:
+            records[row.id] = self._record(row, zone_names)
+            zone_of[row.id] = row.zone_id
+        self._publish(records, zone_of, zone_names)
+
+    def _ensure_fresh(self, db: Optional[Session], max_age: float) -> Dict[int, Dict[str, Any]]:
+        now = time.monotonic()
+        records = self._records
+        if records is not None and now - self._loaded_at < self.reload_seconds and now - self._checked_at < max_age:
+            return records
+        with self._lock:
+            now = time.monotonic()
+            if self._records is not None and now - self._loaded_at < self.reload_seconds and now - self._checked_at < max_age:
+                return self._records
+            session = db if db is not None else SessionLocal()
+            try:
+                if self._records is None or now - self._loaded_at >= self.reload_seconds:
+                    self._reload(session, now)
+                else:
+                    self._refresh(session, now)
+            finally:
+                if db is None:
+                    session.close()
+            return self._records
+
+    def get(self, police_id: int, db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+        """
+        Regresa el registro del policía (forma de SecurityPoliceResponse) o None si no existe.
+
+        Callers must not mutate the returned dict.
+        """
+        found, _ = self.get_many([police_id], db=db)
+        return found[0] if found else None
+
+    def get_many(
+        self, police_ids: Optional[Iterable[int]] = None, zone_id: Optional[int] = None, db: Optional[Session] = None
+    ) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """
+        Busca varios policías a la vez.
+
+        Parameters:
+        - police_ids: Officers to return, in this order (duplicates are returned once). None
+          returns every officer of zone_id (of the whole roster without zone_id), by id.
+        - zone_id: Only officers assigned to this zone.
+        - db: Optional session to reuse if the roster has to be refreshed.
+
+        Returns:
+        - (records, missing_ids): The officers found and the requested ids that do not exist.
+          Ids of officers in another zone are not returned and are not missing.
+        """
+        records = self._ensure_fresh(db, self.refresh_seconds)
+        if police_ids is None:
+            self.hits += 1
+            if zone_id is None:
+                return [records[police_id] for police_id in sorted(records)], []
+            return [records[police_id] for police_id in self._by_zone.get(zone_id, [])], []
+
+        police_ids = list(dict.fromkeys(police_ids))
+        if any(police_id not in records for police_id in police_ids):
+            # Officers created since the last refresh: check the watermark again (rate limited)
+            records = self._ensure_fresh(db, min(self.refresh_seconds, self.MISS_RECHECK_SECONDS))
+        else:
+            self.hits += 1
+        zone_of = self._zone_of
+        found = [records[police_id] for police_id in police_ids
+                 if police_id in records and (zone_id is None or zone_of.get(police_id) == zone_id)]
+        missing = [police_id for police_id in police_ids if police_id not in records]
+        return found, missing
+
+    def invalidate(self) -> None:
+        """Descarta el roster; la siguiente consulta lo vuelve a cargar completo."""
+        with self._lock:
+            self._records = None
+            self._loaded_at = self._checked_at = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            loaded = self._records is not None
+            return {
+                "hits": self.hits,
+                "refreshes": self.refreshes,
+                "reloads": self.reloads,
+                "version": self.version,
+                "size": len(self._records) if loaded else 0,
+                "zones": len(self._zone_names) if loaded else 0,
+                "police_watermark": self._police_watermark if loaded else None,
+                "zone_watermark": self._zone_watermark if loaded else None,
+                "age_seconds": now - self._loaded_at if loaded else None,
+                "checked_seconds_ago": now - self._checked_at if loaded else None,
+                "refresh_seconds": self.refresh_seconds,
+                "reload_seconds": self.reload_seconds,
+            }
+
+
+# Shared instance used by the security_police routes
+police_roster = PoliceRoster(
+    refresh_seconds=settings.POLICE_ROSTER_REFRESH_SECONDS,
+    reload_seconds=settings.POLICE_ROSTER_RELOAD_SECONDS
+)
@@ -0,0 +1,259 @@
+import math
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.orm import Session
+
+from config.db import SessionLocal
+from models.police_summary import AnalysisWatermark, PoliceAttentionSummary, PoliceIncidentLedger
+from models.security_incident import SecurityIncident
+from services.attention_time import attention_seconds_sql, parse_attention_seconds
+from services.columnar import fetch_columns
+from services.quantiles import LogHistogram, SketchDelta
+from services import attention_sketches
+from services.watermarks import lock_watermark
+from settings import settings
+
+"""
+Resumen de tiempos de atención por policía, mantenido de forma incremental.
+
+En lugar de recorrer todos los incidentes de un policía en cada consulta, se guardan por
+(police_id, vector_id) el número de incidentes, los que tienen atention_time válido, la
+suma de segundos y un histograma logarítmico (services/quantiles.py) para la mediana y
+otros cuantiles. GET /security_police/{id}/summary solo lee esos renglones.
+
+refresh() procesa, por bloques, los incidentes con (updated_at, id) posterior a la marca
+guardada en analysis_watermark. Cada incidente deja en analysis_police_incident_ledger lo
+que aportó (policía, vector y segundos); si vuelve a cambiar, primero se resta esa
+aportación y luego se suma la nueva, así que un incidente reasignado o corregido se mueve
+de un resumen a otro sin recalcular nada más. Volver a procesar un incidente sin cambios no
+altera nada, por eso cada refresco repasa SUMMARY_REFRESH_OVERLAP_SECONDS hacia atrás de la
+marca para alcanzar transacciones que hicieron commit tarde. Cada bloque se confirma por
+separado junto con la marca.
+
+El mismo recorrido mantiene los histogramas por zona, vector y día de
+services/attention_sketches.py.
+
+Los incidentes borrados no dejan rastro en updated_at: para ellos hay que reconstruir
+con refresh(full=True).
+
+Se ejecuta desde cron con:
+
+    python -m services.police_summary [--full]
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+WATERMARK_NAME = "police_attention_summary"
+
+# vector_id of the officer-wide summary row and of incidents without vector
+ALL_VECTORS = -1
+NO_VECTOR = 0
+
+CHANGED_INCIDENT_SPECS = {
+    "incident_id": ("int64", None),
+    "updated_at": ("object", None),
+    "created_at": ("object", None),
+    "police_id": ("int64", -1),
+    "zone_id": ("int64", 0),
+    "vector_id": ("int64", NO_VECTOR),
+    "attention_time_seconds": ("float64", None),
+}
+
+
+def _changed_incidents(db: Session, after: Optional[Tuple[datetime, int]], limit: int) -> Dict[str, Any]:
+    """Siguiente bloque de incidentes ordenados por (updated_at, id) después de after."""
+    in_database = db.get_bind().dialect.name == "postgresql"
+    stmt = select(
+        SecurityIncident.id.label("incident_id"),
+        SecurityIncident.updated_at,
+        SecurityIncident.created_at,
+        SecurityIncident.police_id,
+        SecurityIncident.zone_id,
+        SecurityIncident.vector_id,
+        (attention_seconds_sql() if in_database else SecurityIncident.atention_time).label("attention_time_seconds")
+    ).order_by(SecurityIncident.updated_at, SecurityIncident.id).limit(limit)
+    if after is not None:
+        stmt = stmt.where(tuple_(SecurityIncident.updated_at, SecurityIncident.id) > tuple_(*after))
+    if in_database:
+        return fetch_columns(db, stmt, CHANGED_INCIDENT_SPECS)
+    columns = fetch_columns(db, stmt, {**CHANGED_INCIDENT_SPECS, "attention_time_seconds": ("object", None)})
+    columns["attention_time_seconds"] = parse_attention_seconds(columns["attention_time_seconds"])
+    return columns
+
+
+def _apply_batch(db: Session, columns: Dict[str, Any], now: datetime) -> int:
+    """Aplica un bloque de incidentes al ledger y a los resúmenes; regresa cuántos cambiaron."""
+    incident_ids = columns["incident_id"].tolist()
+    ledger = {
+        entry.incident_id: entry
+        for entry in db.scalars(select(PoliceIncidentLedger).where(PoliceIncidentLedger.incident_id.in_(incident_ids)))
+    }
+
+    deltas: Dict[Tuple[int, int], SketchDelta] = defaultdict(SketchDelta)
+
+    def contribute(police_id: Optional[int], vector_id: int, seconds: Optional[float], sign: int) -> None:
+        if police_id is None:
+            return
+        deltas[(police_id, ALL_VECTORS)].add(seconds, sign)
+        deltas[(police_id, vector_id)].add(seconds, sign)
+
+    changed = 0
+    for incident_id, updated_at, police_id, vector_id, seconds in zip(
+        incident_ids,
+        columns["updated_at"],
+        columns["police_id"].tolist(),
+        columns["vector_id"].tolist(),
+        columns["attention_time_seconds"].tolist()
+    ):
+        police_id = None if police_id == -1 else police_id
+        seconds = None if math.isnan(seconds) else seconds
+        entry = ledger.get(incident_id)
+        if entry is not None:
+            if (entry.police_id, entry.vector_id, entry.attention_seconds) == (police_id, vector_id, seconds):
+                entry.updated_at = updated_at
+                continue
+            contribute(entry.police_id, entry.vector_id, entry.attention_seconds, -1)
+        else:
+            entry = PoliceIncidentLedger(incident_id=incident_id)
+            db.add(entry)
+        entry.updated_at = updated_at
+        entry.police_id = police_id
+        entry.vector_id = vector_id
+        entry.attention_seconds = seconds
+        contribute(police_id, vector_id, seconds, 1)
+        changed += 1
+
+    if not deltas:
+        return changed
+
+    summaries = {
+        (summary.police_id, summary.vector_id): summary
+        for summary in db.scalars(
+            select(PoliceAttentionSummary)
+            .where(tuple_(PoliceAttentionSummary.police_id, PoliceAttentionSummary.vector_id).in_(list(deltas)))
+        )
+    }
+    for (police_id, vector_id), delta in deltas.items():
+        summary = summaries.get((police_id, vector_id))
+        if summary is None:
+            summary = PoliceAttentionSummary(
+                police_id=police_id, vector_id=vector_id, total_incidents=0, valid_incidents=0, sum_seconds=0.0
+            )
+            db.add(summary)
+        delta.apply_to(summary, now)
+    return changed
+
+
+def refresh(db: Optional[Session] = None, full: bool = False, wait: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Lleva los resúmenes al día con los incidentes modificados desde la última marca.
+
+    Parameters:
+    - db: Optional session; a new one is opened otherwise.
+    - full: Drop every summary and rebuild from scratch (needed after incidents are deleted).
+    - wait: Wait for a refresh already running; with False return None instead.
+
+    Returns:
+    - Dict with the incidents read and changed, the number of batches and the new watermark.
+    """
+    session = db if db is not None else SessionLocal()
+    try:
+        watermark = lock_watermark(session, WATERMARK_NAME, wait=wait)
+        if watermark is None:
+            return None
+        if full:
+            session.execute(delete(PoliceAttentionSummary))
+            session.execute(delete(PoliceIncidentLedger))
+            attention_sketches.reset(session)
+            watermark.updated_at, watermark.last_id = None, None
+
+        after = None
+        if watermark.updated_at is not None:
+            after = (watermark.updated_at - timedelta(seconds=settings.SUMMARY_REFRESH_OVERLAP_SECONDS), 0)
+        read, changed, batches = 0, 0, 0
+        while True:
+            columns = _changed_incidents(session, after, settings.SUMMARY_REFRESH_BATCH_SIZE)
+            if not len(columns["incident_id"]):
+                break
+            now = datetime.now(timezone.utc)
+            changed += _apply_batch(session, columns, now)
+            attention_sketches.apply_batch(session, columns, now)
+            read += len(columns["incident_id"])
+            batches += 1
+            after = (columns["updated_at"][-1], int(columns["incident_id"][-1]))
+            if watermark.updated_at is None or after[0] >= watermark.updated_at:
+                watermark.updated_at, watermark.last_id = after
+            # Commit each batch: a long first build does not run in one transaction, and a
+            # failure resumes from the last batch (the ledger makes replaying it harmless)
+            watermark.refreshed_at = datetime.now(timezone.utc)
+            session.commit()
+            if len(columns["incident_id"]) < settings.SUMMARY_REFRESH_BATCH_SIZE:
+                break
+            watermark = lock_watermark(session, WATERMARK_NAME)
+        watermark.refreshed_at = datetime.now(timezone.utc)
+        session.commit()
+        return {
+            "incidents_read": read,
+            "incidents_changed": changed,
+            "batches": batches,
+            "watermark": watermark.updated_at,
+            "refreshed_at": watermark.refreshed_at
+        }
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        if db is None:
+            session.close()
+
+
+def _vector_summary(summary: PoliceAttentionSummary) -> Dict[str, Any]:
+    sketch = LogHistogram.from_dict(summary.sketch)
+    return {
+        "total_incidents": summary.total_incidents,
+        "valid_incidents": summary.valid_incidents,
+        "average_seconds": summary.sum_seconds / summary.valid_incidents if summary.valid_incidents else None,
+        "median_seconds": sketch.quantile(0.5),
+        "p90_seconds": sketch.quantile(0.9)
+    }
+
+
+def last_refreshed_at(db: Session) -> Optional[datetime]:
+    """Cuándo terminó el último refresco (de estos resúmenes y de services/attention_sketches.py)."""
+    watermark = db.get(AnalysisWatermark, WATERMARK_NAME)
+    return watermark.refreshed_at if watermark else None
+
+
+def police_summary(db: Session, police_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Resumen de tiempos de atención de un policía leído de la tabla de resúmenes, o None.
+
+    Reads one row per vector of the officer; the cost does not depend on the number of incidents.
+    """
+    rows = db.scalars(
+        select(PoliceAttentionSummary).where(PoliceAttentionSummary.police_id == police_id)
+    ).all()
+    overall = next((row for row in rows if row.vector_id == ALL_VECTORS), None)
+    if overall is None or not overall.total_incidents:
+        return None
+    vectors = [
+        {"vector_id": None if row.vector_id == NO_VECTOR else row.vector_id, **_vector_summary(row)}
+        for row in rows
+        if row.vector_id != ALL_VECTORS and row.total_incidents
+    ]
+    vectors.sort(key=lambda vector: -(vector["average_seconds"] or 0))
+    return {
+        "police_id": police_id,
+        **_vector_summary(overall),
+        "relative_accuracy": LogHistogram.from_dict(overall.sketch).relative_accuracy,
+        "refreshed_at": last_refreshed_at(db),
+        "vectors": vectors
+    }
+
+
+if __name__ == "__main__":
+    print(refresh(full="--full" in sys.argv[1:]))
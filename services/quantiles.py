@@ -0,0 +1,209 @@
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+"""
+Histograma logarítmico para cuantiles aproximados (estilo DDSketch).
+
+Cada valor positivo x cae en la cubeta k = ceil(log_gamma(x)), con
+gamma = (1 + alpha) / (1 - alpha); el valor que se reporta para la cubeta tiene un error
+relativo de a lo más alpha (relative_accuracy) respecto a cualquier valor que haya caído
+en ella. Por eso un cuantil estimado está dentro de ±alpha (relativo) del cuantil real de
+rango equivalente, sin importar cuántos valores se hayan agregado.
+
+A diferencia de una lista ordenada, el histograma:
+- ocupa memoria proporcional al rango de los valores (log), no a su número;
+- admite restar valores (remove), que es lo que necesita el resumen incremental cuando un
+  incidente cambia de policía o de tiempo de atención;
+- se puede combinar con otro del mismo alpha (merge) sumando cubetas.
+
+Los valores <= MIN_VALUE (incluido 0) se cuentan en una cubeta de ceros.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Values at or below this are counted as zero
+MIN_VALUE = 1e-9
+
+
+class LogHistogram:
+    """
+    Histograma de cubetas logarítmicas con error relativo acotado.
+
+    Parameters:
+    - relative_accuracy: alpha, the maximum relative error of a reported quantile.
+    - bins: Bucket index -> count, as stored by to_dict().
+    - zero_count: Number of values <= MIN_VALUE.
+    """
+
+    def __init__(
+        self,
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+        bins: Optional[Dict[int, int]] = None,
+        zero_count: int = 0
+    ):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = dict(bins or {})
+        self.zero_count = zero_count
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+
+    def key(self, value: float) -> int:
+        """Índice de la cubeta de un valor positivo."""
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def value(self, key: int) -> float:
+        """Valor representativo de una cubeta (error relativo <= alpha para todo su rango)."""
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, weight: int = 1) -> None:
+        """Agrega un valor (weight negativo lo resta). NaN se ignora."""
+        if value != value:
+            return
+        if value <= MIN_VALUE:
+            self.zero_count += weight
+            return
+        key = self.key(value)
+        count = self.bins.get(key, 0) + weight
+        if count:
+            self.bins[key] = count
+        else:
+            self.bins.pop(key, None)
+
+    def remove(self, value: float) -> None:
+        self.add(value, -1)
+
+    def add_many(self, values: Iterable[float]) -> None:
+        """Agrega muchos valores de una vez (vectorizado con NumPy)."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        positive = values[values > MIN_VALUE]
+        self.zero_count += int(len(values) - len(positive))
+        if not len(positive):
+            return
+        keys, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def merge(self, other: "LogHistogram") -> None:
+        """Suma las cubetas de otro histograma con la misma relative_accuracy."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge histograms with different relative accuracy")
+        self.zero_count += other.zero_count
+        for key, count in other.bins.items():
+            total = self.bins.get(key, 0) + count
+            if total:
+                self.bins[key] = total
+            else:
+                self.bins.pop(key, None)
+
+    def _value_at_rank(self, rank: int) -> float:
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return self.value(key)
+        return self.value(max(self.bins))
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Cuantil q (0..1) aproximado, o None si el histograma está vacío.
+
+        Interpolates linearly between the ranks around q * (count - 1), like numpy/pandas,
+        so quantile(0.5) of an even count is the mean of the two middle values.
+        """
+        count = self.count
+        if count <= 0:
+            return None
+        rank = q * (count - 1)
+        lower, upper = math.floor(rank), math.ceil(rank)
+        lower_value = self._value_at_rank(lower)
+        if upper == lower:
+            return lower_value
+        return lower_value + (self._value_at_rank(upper) - lower_value) * (rank - lower)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Forma serializable a JSON (las llaves de cubeta como texto)."""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "bins": {str(key): count for key, count in sorted(self.bins.items())}
+        }
+
+    @classmethod
+    def merged(cls, sketches: Iterable[Optional[Dict[str, Any]]]) -> "LogHistogram":
+        """
+        Combina muchos histogramas guardados (to_dict()) en uno, sumando cubetas con NumPy.
+
+        All of them must share the same relative_accuracy.
+        """
+        relative_accuracy, zero_count = None, 0
+        keys, counts = [], []
+        for data in sketches:
+            if not data:
+                continue
+            if relative_accuracy is None:
+                relative_accuracy = data["relative_accuracy"]
+            elif data["relative_accuracy"] != relative_accuracy:
+                raise ValueError("Cannot merge histograms with different relative accuracy")
+            zero_count += data["zero_count"]
+            keys.extend(data["bins"].keys())
+            counts.extend(data["bins"].values())
+        histogram = cls(relative_accuracy or DEFAULT_RELATIVE_ACCURACY, zero_count=zero_count)
+        if keys:
+            unique_keys, inverse = np.unique(np.array(keys, dtype=np.int64), return_inverse=True)
+            totals = np.bincount(inverse, weights=np.array(counts, dtype=np.int64)).astype(np.int64)
+            histogram.bins = {key: count for key, count in zip(unique_keys.tolist(), totals.tolist()) if count}
+        return histogram
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "LogHistogram":
+        if not data:
+            return cls()
+        return cls(
+            relative_accuracy=data["relative_accuracy"],
+            bins={int(key): count for key, count in data["bins"].items()},
+            zero_count=data["zero_count"]
+        )
+
+
+class SketchDelta:
+    """
+    Cambios pendientes (conteos, suma y valores) de un renglón de resumen con histograma.
+
+    The summary row must have total_incidents, valid_incidents, sum_seconds, sketch and updated_at.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.valid = 0
+        self.sum_seconds = 0.0
+        self.values: List[Tuple[float, int]] = []
+
+    def add(self, seconds: Optional[float], sign: int) -> None:
+        self.total += sign
+        if seconds is not None:
+            self.valid += sign
+            self.sum_seconds += sign * seconds
+            self.values.append((seconds, sign))
+
+    def apply_to(self, summary, now) -> None:
+        sketch = LogHistogram.from_dict(summary.sketch)
+        for seconds, sign in self.values:
+            sketch.add(seconds, sign)
+        summary.total_incidents += self.total
+        summary.valid_incidents += self.valid
+        summary.sum_seconds += self.sum_seconds
+        summary.sketch = sketch.to_dict()
+        summary.updated_at = now
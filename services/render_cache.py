@@ -0,0 +1,252 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from fastapi.responses import Response
+
+from settings import settings
+
+"""
+Cache direccionada por contenido para las gráficas (PNG y SVG) de los análisis.
+
+La llave de cada gráfica es un hash (sha256) de la "huella" de los datos que la
+generan: tipo de gráfica, ID analizado, número de renglones y último updated_at.
+Si los datos no cambian, la llave tampoco, así que la imagen ya generada se sirve
+tal cual con un ETag fuerte y los clientes que mandan If-None-Match reciben 304.
+Los formatos de datos (JSON, Vega-Lite, ver services/chart_formats.py) no se guardan,
+pero usan la misma llave como ETag para responder 304.
+
+Las imágenes se renderizan en memoria (services/render_pool.py regresa los bytes) y se
+guardan en un LRU en memoria acotado por RENDER_CACHE_MAX_BYTES y RENDER_CACHE_MAX_ENTRIES,
+así que servir una gráfica no toca el sistema de archivos y funciona en contenedores de
+solo lectura. Con RENDER_CACHE_PERSIST=true además se escriben en RENDER_CACHE_DIR
+(LRU acotado por RENDER_CACHE_DISK_MAX_BYTES) para conservarlas entre reinicios y
+compartirlas entre workers; si escribir falla, la cache sigue funcionando solo en memoria.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+logger = logging.getLogger(__name__)
+
+# Bump when the chart code changes so old renders are not served anymore
+CHART_VERSION = "1"
+
+_KEY_FILENAME = re.compile(r"^[0-9a-f]{64}\.(png|svg)$")
+
+# Chart formats stored by the cache, and their media types
+IMAGE_MEDIA_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+
+class RenderCache:
+    """
+    LRU en memoria de imágenes nombradas por su llave y formato, con copia opcional en disco.
+
+    Parameters:
+    - max_bytes: Total size of the images kept in memory.
+    - max_entries: Maximum number of images kept (in memory and on disk).
+    - directory: Where to persist the images; None keeps them only in memory.
+    - disk_max_bytes: Total size allowed on disk before evicting the least recently used files.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int, directory: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self.disk_max_bytes = disk_max_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_errors = 0
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        if self.directory is not None:
+            self._scan()
+
+    def _scan(self) -> None:
+        # Rebuild the disk index from a previous run, oldest access first
+        if not self.directory.is_dir():
+            return
+        files = [p for p in self.directory.iterdir() if _KEY_FILENAME.match(p.name)]
+        for path in sorted(files, key=lambda p: p.stat().st_mtime):
+            size = path.stat().st_size
+            self._disk[path.name] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    @staticmethod
+    def key(variant: str, *parts: Any) -> str:
+        """
+        Calcula la llave de una gráfica a partir del tipo de gráfica y la huella de sus datos.
+        """
+        fingerprint = "|".join([CHART_VERSION, variant, *map(str, parts)])
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _name(key: str, chart_format: str) -> str:
+        return f"{key}.{chart_format}"
+
+    def get(self, key: str, chart_format: str = "png") -> Optional[bytes]:
+        """Regresa la imagen guardada (de memoria o, si se persiste, de disco) o None."""
+        name = self._name(key, chart_format)
+        with self._lock:
+            content = self._memory.get(name)
+            if content is not None:
+                self._memory.move_to_end(name)
+                self.hits += 1
+                return content
+            on_disk = name in self._disk
+            if not on_disk:
+                self.misses += 1
+                return None
+
+        try:
+            content = (self.directory / name).read_bytes()
+        except OSError:
+            # Removed behind our back; forget it and render again
+            with self._lock:
+                self._disk_bytes -= self._disk.pop(name, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            if name in self._disk:
+                self._disk.move_to_end(name)
+            self.disk_hits += 1
+            self._remember(name, content)
+        return content
+
+    def put(self, key: str, content: bytes, chart_format: str = "png") -> None:
+        """
+        Guarda una imagen recién renderizada (y la escribe en disco si la cache se persiste).
+        """
+        name = self._name(key, chart_format)
+        with self._lock:
+            self._remember(name, content)
+        if self.directory is not None:
+            self._persist(name, content)
+
+    def _remember(self, name: str, content: bytes) -> None:
+        # Caller holds the lock. Never evict the most recent entry.
+        previous = self._memory.pop(name, None)
+        self._memory_bytes += len(content) - (len(previous) if previous is not None else 0)
+        self._memory[name] = content
+        while len(self._memory) > 1 and (
+            self._memory_bytes > self.max_bytes or len(self._memory) > self.max_entries
+        ):
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+            self.evictions += 1
+
+    def _persist(self, name: str, content: bytes) -> None:
+        # Written to a unique temporary file and published atomically
+        path = self.directory / name
+        staged = self.directory / f"{name}-{uuid.uuid4().hex}.partial"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            staged.write_bytes(content)
+            os.replace(staged, path)
+        except OSError:
+            logger.warning("Could not persist chart %s in %s", name, self.directory, exc_info=True)
+            with self._lock:
+                self.disk_errors += 1
+            try:
+                os.remove(staged)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._disk_bytes += len(content) - self._disk.pop(name, 0)
+            self._disk[name] = len(content)
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        # Caller holds the lock. Never evict the most recent entry.
+        while len(self._disk) > 1 and (
+            self._disk_bytes > self.disk_max_bytes or len(self._disk) > self.max_entries
+        ):
+            old_name, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self.directory / old_name)
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        """Vacía la memoria (las imágenes persistidas en disco se conservan)."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "total_bytes": self._memory_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "persisted": self.directory is not None,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "disk_errors": self.disk_errors,
+            }
+
+    def etag(self, key: str) -> str:
+        return f'"{key}"'
+
+    def headers(self, key: str) -> dict:
+        # The format can come from the Accept header, so caches must key on it too
+        return {"ETag": self.etag(key), "Cache-Control": "no-cache", "Vary": "Accept"}
+
+    def response(self, key: str, if_none_match: Optional[str] = None, chart_format: str = "png") -> Optional[Response]:
+        """
+        Regresa la respuesta para una llave ya renderizada, o None si hay que renderizarla.
+
+        Returns:
+        - 304 Not Modified if the client's If-None-Match already names this render.
+        - The cached image with its ETag if present.
+        - None on a cache miss, and always for formats that are not stored (JSON, Vega-Lite).
+        """
+        if if_none_match and _etag_matches(if_none_match, self.etag(key)):
+            return Response(status_code=304, headers=self.headers(key))
+        if chart_format not in IMAGE_MEDIA_TYPES:
+            return None
+        content = self.get(key, chart_format)
+        if content is None:
+            return None
+        return self.image_response(key, content, chart_format)
+
+    def image_response(self, key: str, content: bytes, chart_format: str = "png") -> Response:
+        """Respuesta con la imagen desde memoria (Content-Length exacto, sin leer archivos)."""
+        return Response(content=content, media_type=IMAGE_MEDIA_TYPES[chart_format], headers=self.headers(key))
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+# Shared instance used by every analysis route
+render_cache = RenderCache(
+    max_bytes=settings.RENDER_CACHE_MAX_BYTES,
+    max_entries=settings.RENDER_CACHE_MAX_ENTRIES,
+    directory=settings.RENDER_CACHE_DIR if settings.RENDER_CACHE_PERSIST else None,
+    disk_max_bytes=settings.RENDER_CACHE_DISK_MAX_BYTES,
+)
@@ -0,0 +1,132 @@
+import asyncio
+import io
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from settings import settings
+
+"""
+Pool de procesos para renderizar las gráficas de los análisis.
+
+Renderizar con Matplotlib retiene el GIL por cientos de milisegundos, así que las
+gráficas se generan en un ProcessPoolExecutor acotado (RENDER_POOL_WORKERS procesos,
+como máximo RENDER_POOL_MAX_PENDING trabajos en vuelo). Las gráficas se piden por
+nombre (ver services/charts.py) para que el proceso de la API no tenga que importar
+Matplotlib, y se renderizan en memoria: el worker regresa los bytes de la imagen, sin
+escribir archivos.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(settings.RENDER_POOL_MAX_PENDING)
+
+
+def _init_worker() -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _render_in_worker(chart: str, payload: Dict[str, Any], chart_format: str) -> bytes:
+    from services.charts import CHARTS
+    buffer = io.BytesIO()
+    CHARTS[chart](payload, buffer, chart_format)
+    return buffer.getvalue()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.RENDER_POOL_WORKERS,
+                # spawn: workers never inherit the parent's threads, DB connections or pyplot state
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def _submit(chart: str, payload: Dict[str, Any], chart_format: str) -> Future:
+    # Caller already holds a _pending slot; it is freed when the worker is done,
+    # not when the request gives up waiting
+    try:
+        future = _get_executor().submit(_render_in_worker, chart, payload, chart_format)
+    except BrokenProcessPool:
+        _pending.release()
+        shutdown()
+        raise HTTPException(status_code=503, detail="Chart render pool crashed, try again later")
+    except BaseException:
+        _pending.release()
+        raise
+    future.add_done_callback(lambda _: _pending.release())
+    return future
+
+
+def _render_failed(error: BaseException) -> Optional[HTTPException]:
+    if isinstance(error, BrokenProcessPool):
+        shutdown()
+        return HTTPException(status_code=503, detail="Chart render pool crashed, try again later")
+    if isinstance(error, (FutureTimeoutError, asyncio.TimeoutError)):
+        return HTTPException(status_code=504, detail="Chart rendering timed out")
+    return None
+
+
+def render(chart: str, payload: Dict[str, Any], chart_format: str = "png") -> bytes:
+    """
+    Renderiza una gráfica en el pool de procesos y regresa la imagen.
+
+    Parameters:
+    - chart: Name of the chart in services.charts.CHARTS.
+    - payload: Precomputed data for the chart (must be picklable).
+    - chart_format: "png" or "svg".
+
+    Raises:
+    - 503 Service Unavailable: If the render queue is full or the pool died.
+    - 504 Gateway Timeout: If the render takes longer than RENDER_TIMEOUT_SECONDS.
+    """
+    if not _pending.acquire(timeout=settings.RENDER_QUEUE_TIMEOUT_SECONDS):
+        raise HTTPException(status_code=503, detail="Chart render queue is full, try again later")
+    future = _submit(chart, payload, chart_format)
+    try:
+        return future.result(timeout=settings.RENDER_TIMEOUT_SECONDS)
+    except BaseException as error:
+        http_error = _render_failed(error)
+        if http_error is not None:
+            raise http_error
+        raise
+
+
+async def render_async(chart: str, payload: Dict[str, Any], chart_format: str = "png") -> bytes:
+    """
+    Igual que render(), pero espera el resultado sin bloquear el event loop ni ocupar un hilo.
+    """
+    if not _pending.acquire(blocking=False):
+        # Queue is full: wait for a slot in a worker thread, never in the event loop
+        acquired = await run_in_threadpool(_pending.acquire, True, settings.RENDER_QUEUE_TIMEOUT_SECONDS)
+        if not acquired:
+            raise HTTPException(status_code=503, detail="Chart render queue is full, try again later")
+    future = _submit(chart, payload, chart_format)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=settings.RENDER_TIMEOUT_SECONDS)
+    except BaseException as error:
+        http_error = _render_failed(error)
+        if http_error is not None:
+            raise http_error
+        raise
+
+
+def shutdown(wait: bool = False) -> None:
+    """Detiene el pool (wait=True espera a que terminen los workers); el siguiente render crea uno nuevo."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,218 @@
+import gzip
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl
+
+import orjson
+from fastapi.responses import ORJSONResponse, Response
+from sqlalchemy.engine import Row
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from settings import settings
+
+"""
+Codificación de las respuestas JSON: orjson compacto, indentado solo con ?pretty=1, y
+compresión gzip/brotli negociada con Accept-Encoding para respuestas grandes.
+
+CompactORJSONResponse es la clase de respuesta por defecto de la app. Escribe las llaves
+que no son texto (por ejemplo los status_id de /status_incidents) tal cual con
+OPT_NON_STR_KEYS, así que las rutas pueden regresar el dict directamente sin pasar por
+Pydantic.
+
+Para las listas grandes, RowsJSONResponse codifica Rows de Core (seleccionados con
+schema_columns()) directo a JSON, sin crear objetos ORM ni validar renglón por renglón con
+el response_model, que se conserva solo para la documentación de OpenAPI. RecordsJSONResponse
+hace lo mismo con dicts que ya tienen la forma del response_model (roster de policías).
+
+ResponseEncodingMiddleware lee ?pretty de la petición (la respuesta lo consulta en un
+ContextVar) y comprime las respuestas JSON completas de al menos
+RESPONSE_COMPRESSION_MIN_BYTES. Las respuestas en streaming (exportaciones) y las que no
+son JSON (PNG, SVG) pasan sin cambios. Brotli se usa solo si el paquete brotli está
+instalado; si no, gzip.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+_pretty: ContextVar[bool] = ContextVar("pretty_json", default=False)
+
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+# Datetimes as Pydantic writes them: UTC as "Z", other offsets as "+hh:mm"
+ROW_OPTIONS = JSON_OPTIONS | orjson.OPT_UTC_Z
+
+
+def _is_json(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type == "application/json" or (media_type.startswith("application/") and media_type.endswith("+json"))
+
+
+class CompactORJSONResponse(ORJSONResponse):
+    """
+    Respuesta JSON con orjson: compacta por defecto, indentada si la petición trae ?pretty=1.
+    """
+
+    def render(self, content: Any) -> bytes:
+        option = (JSON_OPTIONS | orjson.OPT_INDENT_2) if _pretty.get() else JSON_OPTIONS
+        return orjson.dumps(content, option=option)
+
+
+@lru_cache(maxsize=None)
+def schema_columns(model, schema) -> Tuple[Any, ...]:
+    """
+    Columnas de la tabla del modelo con los nombres de los campos del schema, en su orden.
+
+    Selecting them with Core gives Rows whose JSON matches the schema's response.
+    """
+    columns = model.__table__.columns
+    return tuple(columns[name] for name in schema.model_fields)
+
+
+class RowsJSONResponse(Response):
+    """
+    Lista de Rows de Core codificada directo con orjson, sin validación de Pydantic.
+
+    Only for trusted rows selected with schema_columns(); returning it from a route skips the
+    response_model.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Sequence[Row]) -> bytes:
+        if not content:
+            return b"[]"
+        keys = content[0]._fields
+        option = (ROW_OPTIONS | orjson.OPT_INDENT_2) if _pretty.get() else ROW_OPTIONS
+        return orjson.dumps([dict(zip(keys, row)) for row in content], option=option)
+
+
+class RecordsJSONResponse(CompactORJSONResponse):
+    """
+    Lista de dicts con la forma del response_model, con los datetimes como los escribe Pydantic.
+    """
+
+    def render(self, content: Sequence[Dict[str, Any]]) -> bytes:
+        option = (ROW_OPTIONS | orjson.OPT_INDENT_2) if _pretty.get() else ROW_OPTIONS
+        return orjson.dumps(content, option=option)
+
+
+@lru_cache(maxsize=None)
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Elige "br" o "gzip" según Accept-Encoding (por q, y br sobre gzip al empatar), o None.
+    """
+    accepted = {}
+    for entry in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    wildcard = accepted.get("*", 0.0)
+    candidates = []
+    if _brotli() is not None:
+        candidates.append((accepted.get("br", wildcard), 1, "br"))
+    candidates.append((accepted.get("gzip", wildcard), 0, "gzip"))
+    quality, _, coding = max(candidates)
+    return coding if quality > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return _brotli().compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL, mtime=0)
+
+
+class ResponseEncodingMiddleware:
+    """
+    Middleware ASGI para ?pretty=1 y la compresión de respuestas JSON grandes.
+
+    Parameters:
+    - minimum_size: Smallest body (bytes) worth compressing.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = settings.RESPONSE_COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        query = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        token = _pretty.set(query.get("pretty", "").lower() in ("1", "true", "yes"))
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = choose_encoding(accept_encoding) if accept_encoding else None
+        try:
+            if encoding is None:
+                await self.app(scope, receive, send)
+            else:
+                await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size))
+        finally:
+            _pretty.reset(token)
+
+
+class _CompressingSend:
+    """send() que retiene el inicio de la respuesta hasta saber si el cuerpo se comprime."""
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=message["headers"])
+            if "content-encoding" in headers or not _is_json(headers.get("content-type", "")):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                self.start = message
+            return
+        if message["type"] != "http.response.body" or self.start is None:
+            await self.send(message)
+            return
+
+        start, self.start = self.start, None
+        self.passthrough = True
+        body = message.get("body", b"")
+        headers = MutableHeaders(raw=start["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        if message.get("more_body", False) or len(body) < self.minimum_size:
+            # Streaming or small: send as is
+            start["headers"] = headers.raw
+            await self.send(start)
+            await self.send(message)
+            return
+        body = compress(body, self.encoding)
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(body))
+        if "etag" in headers and not headers["etag"].startswith("W/"):
+            # Same resource, different bytes: the strong ETag becomes weak
+            headers["ETag"] = "W/" + headers["etag"]
+        start["headers"] = headers.raw
+        await self.send(start)
+        await self.send({"type": "http.response.body", "body": body, "more_body": False})
@@ -0,0 +1,99 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from config.db import SessionLocal
+from models.security_statusincident import SecurityStatusIncident
+from settings import settings
+
+"""
+Registro en memoria del catálogo de status de incidentes (security_statusincident).
+
+Sustituye la llamada HTTP a la propia API (GET /status_incidents) que hacían los
+análisis de tracking states: el catálogo se carga de la base de datos la primera vez
+que se usa y se vuelve a cargar cuando vence su TTL o cuando se invalida explícitamente.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+
+class StatusRegistry:
+    """
+    Tabla de búsqueda status_id -> name compartida por todo el proceso.
+
+    Parameters:
+    - ttl_seconds: Seconds a loaded mapping is considered fresh.
+
+    Counters:
+    - hits: Lookups served from memory.
+    - misses: Lookups that had to (re)load the catalog from the database.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+        self._mapping: Optional[Dict[int, str]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, now: float) -> bool:
+        return self._mapping is not None and (now - self._loaded_at) < self.ttl_seconds
+
+    def _load(self, db: Optional[Session]) -> Dict[int, str]:
+        session = db if db is not None else SessionLocal()
+        try:
+            rows = session.query(SecurityStatusIncident.id, SecurityStatusIncident.name).all()
+        finally:
+            if db is None:
+                session.close()
+        return {status_id: name for status_id, name in rows}
+
+    def get_mapping(self, db: Optional[Session] = None) -> Dict[int, str]:
+        """
+        Regresa el mapping status_id -> name, cargándolo de la base de datos si hace falta.
+
+        Parameters:
+        - db: Optional session to reuse for the load; a new one is opened otherwise.
+
+        Returns:
+        - Dict[int, str]: The cached mapping. Callers must not mutate it.
+        """
+        with self._lock:
+            if self._is_fresh(time.monotonic()):
+                self.hits += 1
+                return self._mapping
+
+            self.misses += 1
+            mapping = self._load(db)
+            # An empty catalog is not cached so the next request retries the load
+            if mapping:
+                self._mapping = mapping
+                self._loaded_at = time.monotonic()
+                self.version += 1
+            return mapping
+
+    def invalidate(self) -> None:
+        """Descarta el mapping cargado; la siguiente consulta lo vuelve a leer de la base de datos."""
+        with self._lock:
+            self._mapping = None
+            self._loaded_at = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            age = time.monotonic() - self._loaded_at if self._mapping is not None else None
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "version": self.version,
+                "size": len(self._mapping) if self._mapping is not None else 0,
+                "age_seconds": age,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+# Shared instance used by every router
+status_registry = StatusRegistry(ttl_seconds=settings.STATUS_REGISTRY_TTL_SECONDS)
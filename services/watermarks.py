@@ -0,0 +1,30 @@
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from models.police_summary import AnalysisWatermark
+
+"""
+Marcas de avance (analysis_watermark) de los procesos incrementales de análisis.
+
+Autor: Ricardo Hernández Ramón <ricardohernandez@garage.one>
+"""
+
+
+def lock_watermark(db: Session, name: str, wait: bool = True) -> Optional[AnalysisWatermark]:
+    """
+    Toma con FOR UPDATE la marca name (creándola si hace falta), así solo un proceso la avanza a la vez.
+
+    Parameters:
+    - wait: Wait for another holder of the lock; with False returns None if it is taken
+      (background jobs of several workers just skip their turn).
+    """
+    lock = True if wait else {"skip_locked": True}
+    watermark = db.get(AnalysisWatermark, name, with_for_update=lock)
+    if watermark is None:
+        if db.get(AnalysisWatermark, name) is not None:
+            return None
+        db.add(AnalysisWatermark(name=name))
+        db.commit()
+        watermark = db.get(AnalysisWatermark, name, with_for_update=lock)
+    return watermark
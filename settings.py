@@ -35,8 +35,75 @@ class Settings(BaseSettings):
         encoded_password = urllib.parse.quote_plus(self.POSTGRES_PASSWORD)
         return f"postgresql://{encoded_user}:{encoded_password}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        """DATABASE_URL for the asyncpg driver (async routes)"""
+        return self.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+    # Serve lookup and analysis endpoints with async def handlers over an AsyncSession.
+    # The sync routes keep answering every other endpoint during the migration.
+    ASYNC_ROUTES: bool = os.getenv("ASYNC_ROUTES", "false").lower() in ("1", "true", "yes")
+
+    # Create missing tables when the app starts (config.db.init_db); otherwise run
+    # `python -m config.db` once per deployment
+    CREATE_SCHEMA_ON_STARTUP: bool = os.getenv("CREATE_SCHEMA_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
 
     API_URL: str = os.getenv("API_URL", "http://localhost:8000/api")
 
+    # Status catalog registry (services/status_registry.py)
+    STATUS_REGISTRY_TTL_SECONDS: int = int(os.getenv("STATUS_REGISTRY_TTL_SECONDS", "300"))
+
+    # Officer roster cache (services/police_roster.py) and GET /security_police?ids=...
+    POLICE_ROSTER_REFRESH_SECONDS: int = int(os.getenv("POLICE_ROSTER_REFRESH_SECONDS", "30"))
+    POLICE_ROSTER_RELOAD_SECONDS: int = int(os.getenv("POLICE_ROSTER_RELOAD_SECONDS", "3600"))  # Drops deleted officers
+    POLICE_BATCH_MAX_IDS: int = int(os.getenv("POLICE_BATCH_MAX_IDS", "1000"))
+
+    # Query time budgets in milliseconds, enforced as Postgres statement_timeout (services/deadlines.py)
+    QUERY_BUDGET_POLICE_ANALYSIS_MS: int = int(os.getenv("QUERY_BUDGET_POLICE_ANALYSIS_MS", "15000"))
+    QUERY_BUDGET_INCIDENT_ANALYSIS_MS: int = int(os.getenv("QUERY_BUDGET_INCIDENT_ANALYSIS_MS", "5000"))
+    QUERY_BUDGET_FLEET_DWELL_MS: int = int(os.getenv("QUERY_BUDGET_FLEET_DWELL_MS", "30000"))
+    QUERY_BUDGET_LEADERBOARD_MS: int = int(os.getenv("QUERY_BUDGET_LEADERBOARD_MS", "30000"))
+
+    # JSON response compression (services/responses.py)
+    RESPONSE_COMPRESSION_MIN_BYTES: int = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+    RESPONSE_GZIP_LEVEL: int = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+    RESPONSE_BROTLI_QUALITY: int = int(os.getenv("RESPONSE_BROTLI_QUALITY", "5"))
+
+    # Rows per server-side cursor fetch in the export endpoints (services/export.py)
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+    # Incremental per-officer attention summary (services/police_summary.py)
+    SUMMARY_REFRESH_BATCH_SIZE: int = int(os.getenv("SUMMARY_REFRESH_BATCH_SIZE", "5000"))
+    SUMMARY_REFRESH_OVERLAP_SECONDS: int = int(os.getenv("SUMMARY_REFRESH_OVERLAP_SECONDS", "60"))
+    POLICE_SUMMARY_REFRESH_SECONDS: int = int(os.getenv("POLICE_SUMMARY_REFRESH_SECONDS", "300"))  # 0 = no background job
+
+    # Materialized per-incident status durations (services/incident_durations.py)
+    INCIDENT_DURATIONS_BATCH_SIZE: int = int(os.getenv("INCIDENT_DURATIONS_BATCH_SIZE", "20000"))
+    INCIDENT_DURATIONS_REFRESH_SECONDS: int = int(os.getenv("INCIDENT_DURATIONS_REFRESH_SECONDS", "30"))  # 0 = no background job
+
+    # Persisted atention_time seconds column, empty to parse atention_time (services/attention_time.py)
+    ATTENTION_SECONDS_COLUMN: str = os.getenv("ATTENTION_SECONDS_COLUMN", "")
+
+    # Rendered analysis charts cache (services/render_cache.py): in memory, on disk only if persisted
+    RENDER_CACHE_MAX_BYTES: int = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    RENDER_CACHE_MAX_ENTRIES: int = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", "2000"))
+    RENDER_CACHE_PERSIST: bool = os.getenv("RENDER_CACHE_PERSIST", "false").lower() in ("1", "true", "yes")
+    RENDER_CACHE_DIR: str = os.getenv("RENDER_CACHE_DIR", "./analysis/render_cache")
+    RENDER_CACHE_DISK_MAX_BYTES: int = int(os.getenv("RENDER_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+
+    # Police chart views and image size caps (services/analysis.py, services/chart_formats.py)
+    POLICE_CHART_MAX_BARS: int = int(os.getenv("POLICE_CHART_MAX_BARS", "200"))  # Above: histogram/ECDF view
+    POLICE_CHART_HISTOGRAM_BINS: int = int(os.getenv("POLICE_CHART_HISTOGRAM_BINS", "60"))
+    CHART_MAX_DPI: int = int(os.getenv("CHART_MAX_DPI", "300"))
+    CHART_MAX_INCHES: float = float(os.getenv("CHART_MAX_INCHES", "24"))
+    CHART_MAX_PIXELS: int = int(os.getenv("CHART_MAX_PIXELS", str(4800 * 3000)))  # 16x10 in at 300 dpi
+
+    # Chart rendering process pool (services/render_pool.py)
+    RENDER_POOL_WORKERS: int = int(os.getenv("RENDER_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+    RENDER_POOL_MAX_PENDING: int = int(os.getenv("RENDER_POOL_MAX_PENDING", "32"))
+    RENDER_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("RENDER_QUEUE_TIMEOUT_SECONDS", "5"))
+    RENDER_TIMEOUT_SECONDS: float = float(os.getenv("RENDER_TIMEOUT_SECONDS", "60"))
+
 # Instantiate settings
 settings = Settings()
\ No newline at end of file